@@ -1,4 +1,6 @@
-import { pgTable, text, timestamp, integer, jsonb, uuid } from "drizzle-orm/pg-core";
+import { pgTable, text, timestamp, integer, jsonb, uuid, index, customType, doublePrecision, primaryKey } from "drizzle-orm/pg-core";
+
+const bytea = customType<{ data: Buffer }>({ dataType: () => "bytea" });
 
 export const orders = pgTable("orders", {
   id: uuid("id").primaryKey(),
@@ -13,15 +15,80 @@ export const payments = pgTable("payments", {
   orderId: uuid("order_id").notNull().references(() => orders.id, { onDelete: "cascade" }),
   status: text("status").notNull().default("pending"),
   amount: integer("amount").notNull().default(0),
+  // Lease held by the activity attempt currently charging a pending payment
+  claimedUntil: timestamp("claimed_until", { withTimezone: true }),
   createdAt: timestamp("created_at", { withTimezone: true }).defaultNow().notNull(),
 });
 
-export const events = pgTable("events", {
-  id: uuid("id").primaryKey(),
-  orderId: uuid("order_id").notNull().references(() => orders.id, { onDelete: "cascade" }),
-  type: text("type").notNull(),
-  payloadJson: jsonb("payload_json"),
-  ts: timestamp("ts", { withTimezone: true }).defaultNow().notNull(),
+// Partitioned by month on ts at runtime by trellis_common.partitions, which Drizzle cannot express;
+// the key and index match the partitioned table, whose primary key must include ts
+export const events = pgTable(
+  "events",
+  {
+    id: uuid("id").notNull(),
+    orderId: uuid("order_id").notNull().references(() => orders.id, { onDelete: "cascade" }),
+    type: text("type").notNull(),
+    payloadJson: jsonb("payload_json"),
+    ts: timestamp("ts", { withTimezone: true }).defaultNow().notNull(),
+  },
+  (t) => [
+    primaryKey({ name: "events_pkey", columns: [t.id, t.ts] }),
+    index("events_timeline_idx").on(t.orderId, t.ts, t.id),
+  ],
+);
+
+// Claim-check payloads (trellis_common.claim_check), keyed by the sha256 of the stored bytes
+export const payloadBlobs = pgTable("payload_blobs", {
+  key: text("key").primaryKey(),
+  data: bytea("data").notNull(),
+  size: integer("size").notNull(),
+  // Refreshed whenever the same payload is stored again
+  storedAt: timestamp("stored_at", { withTimezone: true }).defaultNow().notNull(),
 });
 
+// Order starts deferred by API admission control until order-tq has capacity
+export const pendingStarts = pgTable(
+  "pending_starts",
+  {
+    orderId: uuid("order_id").primaryKey(),
+    paymentId: uuid("payment_id").notNull(),
+    // Shard routing key when the start named a tenant (trellis_common.sharding)
+    tenant: text("tenant"),
+    enqueuedAt: timestamp("enqueued_at", { withTimezone: true }).defaultNow().notNull(),
+    // Lease held by the API process currently starting this order
+    claimedUntil: timestamp("claimed_until", { withTimezone: true }),
+  },
+  (t) => [index("pending_starts_enqueued_idx").on(t.enqueuedAt)],
+);
+
+// Activity latency percentiles each worker publishes for adaptive timeouts (trellis_common.latency)
+export const activityLatency = pgTable(
+  "activity_latency",
+  {
+    activity: text("activity").notNull(),
+    workerId: text("worker_id").notNull(),
+    p50Ms: doublePrecision("p50_ms").notNull(),
+    p95Ms: doublePrecision("p95_ms").notNull(),
+    p99Ms: doublePrecision("p99_ms").notNull(),
+    samples: integer("samples").notNull(),
+    updatedAt: timestamp("updated_at", { withTimezone: true }).defaultNow().notNull(),
+  },
+  (t) => [primaryKey({ columns: [t.activity, t.workerId] })],
+);
 
+// Steps whose writes have committed, so a hedged or retried attempt of the same step writes nothing (trellis_common.db.UnitOfWork.claim_step)
+export const stepCompletions = pgTable(
+  "step_completions",
+  {
+    orderId: uuid("order_id").notNull(),
+    runId: text("run_id").notNull(),
+    step: text("step").notNull(),
+    completedAt: timestamp("completed_at", { withTimezone: true }).defaultNow().notNull(),
+  },
+  // Named explicitly: UnitOfWork.commit matches the constraint name to tell a duplicate step from other conflicts
+  (t) => [
+    primaryKey({ name: "step_completions_pkey", columns: [t.orderId, t.runId, t.step] }),
+    // Retention deletes by age (trellis_common.partitions)
+    index("step_completions_completed_idx").on(t.completedAt),
+  ],
+);
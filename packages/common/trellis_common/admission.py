@@ -0,0 +1,220 @@
+"""Admission control for order starts.
+
+A token bucket caps how fast the API starts workflows (ADMISSION_RATE per
+second, bursting to ADMISSION_BURST; 0 leaves it unlimited). A sampler task
+describes the workflow and activity queues of every `order-tq` shard every
+ADMISSION_SAMPLE_INTERVAL seconds. Worker saturation shows up first as an
+activity backlog, so the larger of the two totals is what counts. The stage
+is overloaded while that backlog exceeds ADMISSION_MAX_BACKLOG tasks, or
+while the oldest task of either kind on any shard has waited longer than
+ADMISSION_MAX_SCHEDULE_TO_START seconds. 0 disables either check.
+
+A start that is not admitted is either rejected (HTTP 429 with Retry-After) or,
+with ADMISSION_OVERLOAD=defer, written to `pending_starts` and started later by
+`drain_pending_starts` at no more than ADMISSION_DRAIN_RATE per second, and only
+while the queue is healthy.
+"""
+
+import asyncio
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, NamedTuple, Optional, Sequence
+
+import structlog
+from temporalio import client
+from temporalio.api.enums.v1 import TaskQueueType
+from temporalio.api.taskqueue.v1 import TaskQueue
+from temporalio.api.workflowservice.v1 import DescribeTaskQueueRequest
+
+from . import db
+
+
+logger = structlog.get_logger()
+
+REJECT = "reject"
+DEFER = "defer"
+
+
+@dataclass(frozen=True)
+class AdmissionConfig:
+    rate: float = 0.0
+    burst: float = 50.0
+    max_backlog: int = 0
+    max_schedule_to_start: float = 0.0
+    sample_interval: float = 2.0
+    overload: str = REJECT
+    drain_rate: float = 20.0
+    # How long a drainer holds claimed pending starts before another may take them
+    drain_lease: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "AdmissionConfig":
+        defaults = cls()
+        values = {}
+        for field, value in vars(defaults).items():
+            raw = os.getenv(f"ADMISSION_{field.upper()}")
+            if raw is not None:
+                values[field] = type(value)(raw)
+        cfg = cls(**values)
+        if cfg.overload not in (REJECT, DEFER):
+            raise ValueError(f"ADMISSION_OVERLOAD must be {REJECT!r} or {DEFER!r}, got {cfg.overload!r}")
+        return cfg
+
+    @property
+    def samples_queue(self) -> bool:
+        return self.max_backlog > 0 or self.max_schedule_to_start > 0
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`; `take` spends one or says how long until one is free."""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated = clock()
+
+    def take(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class QueueSample(NamedTuple):
+    backlog: int
+    # Age of the oldest queued task: a lower bound on the schedule-to-start latency of the next one
+    backlog_age: float
+
+
+def overloaded(sample: Optional[QueueSample], cfg: AdmissionConfig) -> bool:
+    if sample is None:
+        return False
+    if cfg.max_backlog > 0 and sample.backlog > cfg.max_backlog:
+        return True
+    return cfg.max_schedule_to_start > 0 and sample.backlog_age > cfg.max_schedule_to_start
+
+
+SAMPLED_TYPES = (TaskQueueType.TASK_QUEUE_TYPE_WORKFLOW, TaskQueueType.TASK_QUEUE_TYPE_ACTIVITY)
+
+
+async def sample_task_queue(
+    c: client.Client, task_queue: str, queue_type: TaskQueueType.ValueType = TaskQueueType.TASK_QUEUE_TYPE_WORKFLOW
+) -> QueueSample:
+    resp = await c.workflow_service.describe_task_queue(
+        DescribeTaskQueueRequest(
+            namespace=c.namespace,
+            task_queue=TaskQueue(name=task_queue),
+            task_queue_type=queue_type,
+            report_stats=True,
+        )
+    )
+    age = resp.stats.approximate_backlog_age
+    return QueueSample(resp.stats.approximate_backlog_count, age.seconds + age.nanos / 1e9)
+
+
+def combine(samples_by_type: Sequence[Sequence[QueueSample]]) -> QueueSample:
+    """Backlogs summed across shards per queue type, then the larger type; the oldest task anywhere."""
+    return QueueSample(
+        max(sum(s.backlog for s in samples) for samples in samples_by_type),
+        max(s.backlog_age for samples in samples_by_type for s in samples),
+    )
+
+
+class Admission:
+    """Decides whether a start may go ahead now; `check` returns 0, or the seconds the caller should wait."""
+
+    def __init__(self, cfg: AdmissionConfig, task_queues: Sequence[str] = ("order-tq",)) -> None:
+        self.cfg = cfg
+        self.task_queues = list(task_queues)
+        self.bucket = TokenBucket(cfg.rate, cfg.burst)
+        self.sample: Optional[QueueSample] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def overloaded(self) -> bool:
+        return overloaded(self.sample, self.cfg)
+
+    def check(self) -> float:
+        # An overloaded queue is only re-checked on the next sample, so that is the earliest useful retry
+        if self.overloaded:
+            return self.cfg.sample_interval
+        return self.bucket.take()
+
+    def retry_after(self, wait: float) -> str:
+        return str(max(1, math.ceil(wait)))
+
+    def start(self, get_client: Callable[[], Awaitable[client.Client]]) -> None:
+        if self.cfg.samples_queue and self._task is None:
+            self._task = asyncio.create_task(self._sample(get_client), name="admission-sampler")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sample(self, get_client: Callable[[], Awaitable[client.Client]]) -> None:
+        while True:
+            try:
+                c = await get_client()
+                sample = combine(
+                    await asyncio.gather(
+                        *(
+                            asyncio.gather(*(sample_task_queue(c, q, t) for q in self.task_queues))
+                            for t in SAMPLED_TYPES
+                        )
+                    )
+                )
+                if overloaded(sample, self.cfg) != self.overloaded:
+                    logger.info("admission.overload_changed", overloaded=overloaded(sample, self.cfg), **sample._asdict())
+                self.sample = sample
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Admit on stale data rather than shed load because the sampler is down
+                logger.warning("admission.sample_failed", task_queues=self.task_queues, error=str(e))
+                self.sample = None
+            await asyncio.sleep(self.cfg.sample_interval)
+
+
+async def drain_pending_starts(
+    admission: Admission, start: Callable[[str, str, Optional[str]], Awaitable[None]]
+) -> None:
+    """Start deferred orders from `pending_starts` at ADMISSION_DRAIN_RATE while the queue is healthy.
+
+    `start` must treat an already started workflow as success, since a claim can
+    outlive a start that succeeded after its lease expired.
+    """
+    cfg = admission.cfg
+    interval = 1.0
+    batch = max(1, int(cfg.drain_rate * interval))
+    while True:
+        try:
+            rows = [] if admission.overloaded else await db.claim_pending_starts(batch, cfg.drain_lease)
+            started = []
+            for order_id, payment_id, tenant in rows:
+                try:
+                    await start(order_id, payment_id, tenant)
+                    started.append(order_id)
+                except Exception as e:
+                    logger.warning("admission.drain_start_failed", order_id=order_id, error=str(e))
+            if started:
+                await db.delete_pending_starts(started)
+                logger.info("admission.drained", started=len(started), claimed=len(rows))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("admission.drain_failed", error=str(e))
+        await asyncio.sleep(interval)
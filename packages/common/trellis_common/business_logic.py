@@ -1,61 +1,62 @@
-import asyncio
-import random
-from typing import Dict, Any
+from typing import Any, Optional
 import uuid
 
+from .faults import get_injector
+from .models import Order, OrderItem, PaymentResult
 
-async def flaky_call() -> None:
-    """Either raise an error or sleep long enough to trigger an activity timeout."""
-    rand_num = random.random()
-    if rand_num < 0.33:
-        raise RuntimeError("Forced failure for testing")
-    if rand_num < 0.67:
-        await asyncio.sleep(300)  # Expect the activity layer to time out before this completes
 
+async def flaky_call(step: Optional[str] = None, key: Optional[str] = None) -> None:
+    """Either raise an error or sleep long enough to trigger an activity timeout.
 
-async def order_received(order_id: str) -> Dict[str, Any]:
-    await flaky_call()
+    What actually happens is decided by the active fault profile (see `trellis_common.faults`);
+    `step` selects per-step overrides and `key` (the order id) seeds reproducible profiles.
+    """
+    await get_injector().inject(step, key)
+
+
+async def order_received(order_id: str) -> Order:
+    await flaky_call("order_received", order_id)
     # TODO: Implement DB write: insert new order record
     # Ensure UUID form in payloads
     try:
         order_uuid = str(uuid.UUID(order_id))
     except ValueError:
         order_uuid = str(uuid.uuid4())
-    return {"order_id": order_uuid, "items": [{"sku": "ABC", "qty": 1}]}
+    return Order(order_id=order_uuid, items=[OrderItem(sku="ABC", qty=1)])
 
 
-async def order_validated(order: Dict[str, Any]) -> bool:
-    await flaky_call()
+async def order_validated(order: Order) -> bool:
+    await flaky_call("order_validated", order.order_id)
     # TODO: Implement DB read/write: fetch order, update validation status
-    if not order.get("items"):
+    if not order.items:
         raise ValueError("No items to validate")
     return True
 
 
-async def payment_charged(order: Dict[str, Any], payment_id: str, db: Any | None = None) -> Dict[str, Any]:
+async def payment_charged(order: Order, payment_id: str, db: Any | None = None) -> PaymentResult:
     """Charge payment after simulating an error/timeout first.
     You must implement your own idempotency logic in the activity or here.
     """
-    await flaky_call()
+    await flaky_call("payment_charged", order.order_id)
     # TODO: Implement DB read/write: check payment record, insert/update payment status
-    amount = sum(i.get("qty", 1) for i in order.get("items", []))
-    return {"status": "charged", "amount": amount, "payment_id": str(payment_id)}
+    amount = sum(i.qty for i in order.items)
+    return PaymentResult(payment_id=str(payment_id), amount=amount)
 
 
-async def order_shipped(order: Dict[str, Any]) -> str:
-    await flaky_call()
+async def order_shipped(order: Order) -> str:
+    await flaky_call("order_shipped", order.order_id)
     # TODO: Implement DB write: update order status to shipped
     return "Shipped"
 
 
-async def package_prepared(order: Dict[str, Any]) -> str:
-    await flaky_call()
+async def package_prepared(order: Order) -> str:
+    await flaky_call("package_prepared", order.order_id)
     # TODO: Implement DB write: mark package prepared in DB
     return "Package ready"
 
 
-async def carrier_dispatched(order: Dict[str, Any]) -> str:
-    await flaky_call()
+async def carrier_dispatched(order: Order) -> str:
+    await flaky_call("carrier_dispatched", order.order_id)
     # TODO: Implement DB write: record carrier dispatch status
     return "Dispatched"
 
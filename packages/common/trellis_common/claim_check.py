@@ -0,0 +1,155 @@
+"""Claim-check storage for large Temporal payloads.
+
+Payloads of at least CLAIM_CHECK_MIN_BYTES (default 256 KiB) are stored
+outside the history, and the event keeps only a reference holding the
+payload's sha256. The same order passed to ValidateOrder, ChargePayment and
+ShippingWorkflow is therefore stored once. CLAIM_CHECK_STORE picks the backend:
+`postgres` (the `payload_blobs` table), `filesystem` (files under
+CLAIM_CHECK_DIR, meant for tests and single-host setups) or `none` (default).
+
+Drivers plug into the SDK's external storage hook, which runs after the payload
+codec, so blobs are stored already compressed when compression is on. Each
+process keeps the last CLAIM_CHECK_CACHE_ENTRIES (128) resolved blobs, so
+activities on the worker that stored or already fetched a payload skip the
+round trip. Processes without the same store configured cannot resolve
+references, so set it on the API and every worker before lowering the threshold.
+"""
+
+import asyncio
+import hashlib
+import os
+from pathlib import Path
+from typing import Optional, Sequence
+
+from temporalio.api.common.v1 import Payload
+from temporalio.converter import (
+    ExternalStorage,
+    StorageDriver,
+    StorageDriverClaim,
+    StorageDriverRetrieveContext,
+    StorageDriverStoreContext,
+)
+
+from . import db
+from .cache import LRUCache
+
+
+STORES = ("none", "postgres", "filesystem")
+
+
+def content_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobDriver(StorageDriver):
+    """Content-addressed driver with a per-process LRU of resolved blobs.
+
+    Subclasses implement `_put` and `_get` for their backend.
+    """
+
+    def __init__(self, cache_entries: int = 128) -> None:
+        self.cache = LRUCache(cache_entries)
+
+    async def _put(self, blobs: dict[str, bytes]) -> None:
+        raise NotImplementedError
+
+    async def _get(self, keys: list[str]) -> dict[str, bytes]:
+        raise NotImplementedError
+
+    async def store(self, context: StorageDriverStoreContext, payloads: Sequence[Payload]) -> list[StorageDriverClaim]:
+        blobs: dict[str, bytes] = {}
+        claims = []
+        for payload in payloads:
+            data = payload.SerializeToString()
+            key = content_key(data)
+            blobs[key] = data
+            claims.append(StorageDriverClaim({"key": key}))
+        await self._put(blobs)
+        for key, data in blobs.items():
+            self.cache.set(key, data)
+        return claims
+
+    async def retrieve(self, context: StorageDriverRetrieveContext, claims: Sequence[StorageDriverClaim]) -> list[Payload]:
+        keys = [claim.claim_data["key"] for claim in claims]
+        found = {key: data for key in keys if (data := self.cache.get(key)) is not None}
+        missing = sorted(set(keys) - found.keys())
+        if missing:
+            fetched = await self._get(missing)
+            lost = set(missing) - fetched.keys()
+            if lost:
+                raise RuntimeError(f"claim-check blobs not found in {self.name()} store: {sorted(lost)}")
+            for key, data in fetched.items():
+                self.cache.set(key, data)
+            found.update(fetched)
+        return [Payload.FromString(found[key]) for key in keys]
+
+
+class PostgresBlobDriver(BlobDriver):
+    """Blobs in the `payload_blobs` table, through the shared connection pool."""
+
+    def name(self) -> str:
+        return "postgres"
+
+    async def _put(self, blobs: dict[str, bytes]) -> None:
+        await db.store_blobs(blobs)
+
+    async def _get(self, keys: list[str]) -> dict[str, bytes]:
+        return await db.fetch_blobs(keys)
+
+
+class FilesystemBlobDriver(BlobDriver):
+    """One file per blob under `root`, fanned out by the first two hex digits of the key."""
+
+    def __init__(self, root: str | Path, cache_entries: int = 128) -> None:
+        super().__init__(cache_entries)
+        self.root = Path(root)
+
+    def name(self) -> str:
+        return "filesystem"
+
+    def path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def _write(self, blobs: dict[str, bytes]) -> None:
+        for key, data in blobs.items():
+            path = self.path(key)
+            if path.exists():
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Written aside and renamed so readers never see a partial blob
+            tmp = path.with_name(f"{key}.{os.getpid()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+
+    def _read(self, keys: list[str]) -> dict[str, bytes]:
+        found = {}
+        for key in keys:
+            try:
+                found[key] = self.path(key).read_bytes()
+            except FileNotFoundError:
+                continue
+        return found
+
+    async def _put(self, blobs: dict[str, bytes]) -> None:
+        await asyncio.to_thread(self._write, blobs)
+
+    async def _get(self, keys: list[str]) -> dict[str, bytes]:
+        return await asyncio.to_thread(self._read, keys)
+
+
+def external_storage() -> Optional[ExternalStorage]:
+    """The claim-check store configured by CLAIM_CHECK_*, or None when it is off."""
+    store = os.getenv("CLAIM_CHECK_STORE", "none")
+    if store not in STORES:
+        raise ValueError(f"unknown CLAIM_CHECK_STORE {store!r}; use none, postgres or filesystem")
+    if store == "none":
+        return None
+    cache_entries = int(os.getenv("CLAIM_CHECK_CACHE_ENTRIES", "128"))
+    if store == "postgres":
+        driver: BlobDriver = PostgresBlobDriver(cache_entries)
+    else:
+        driver = FilesystemBlobDriver(os.getenv("CLAIM_CHECK_DIR", "claim-check-blobs"), cache_entries)
+    return ExternalStorage(
+        drivers=[driver],
+        payload_size_threshold=int(os.getenv("CLAIM_CHECK_MIN_BYTES", str(256 * 1024))),
+    )
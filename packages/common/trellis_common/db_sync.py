@@ -0,0 +1,51 @@
+"""Blocking compatibility shim over the SQL in `trellis_common.db`.
+
+Each call opens its own connection. Activities should use the pooled async API
+in `trellis_common.db`; this module is kept for scripts and ad-hoc tooling.
+"""
+
+from typing import Optional
+import uuid
+
+import psycopg
+
+from .db import (
+    GET_PAYMENT_STATUS_SQL,
+    INSERT_EVENT_SQL,
+    UPDATE_ORDER_STATE_SQL,
+    UPSERT_ORDER_SQL,
+    UPSERT_PAYMENT_SQL,
+    database_url,
+    to_json,
+)
+
+
+def get_connection() -> psycopg.Connection:
+    return psycopg.connect(database_url())
+
+
+def upsert_order(order_id: str, state: str, address_json: Optional[dict] = None) -> None:
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(UPSERT_ORDER_SQL, (order_id, state, to_json(address_json)))
+
+
+def update_order_state(order_id: str, state: str) -> None:
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(UPDATE_ORDER_STATE_SQL, (state, order_id))
+
+
+def upsert_payment(payment_id: str, order_id: str, status: str, amount: int) -> None:
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(UPSERT_PAYMENT_SQL, (payment_id, order_id, status, amount))
+
+
+def get_payment_status(payment_id: str) -> Optional[str]:
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(GET_PAYMENT_STATUS_SQL, (payment_id,))
+        row = cur.fetchone()
+        return row[0] if row else None
+
+
+def insert_event(order_id: str, event_type: str, payload: Optional[dict] = None) -> None:
+    with get_connection() as conn, conn.cursor() as cur:
+        cur.execute(INSERT_EVENT_SQL, (str(uuid.uuid4()), order_id, event_type, to_json(payload)))
@@ -0,0 +1,116 @@
+import asyncio
+from typing import Awaitable, Callable, Sequence
+
+import structlog
+
+
+logger = structlog.get_logger()
+
+EventRow = tuple
+Writer = Callable[[Sequence[EventRow]], Awaitable[None]]
+
+_STOP: EventRow = ()
+
+
+class EventSink:
+    """Write-behind buffer that group-commits event rows.
+
+    `put` enqueues onto a bounded queue and blocks once it is full, so a slow
+    database pushes back on the activities producing events. A background task
+    hands batches to `writer` whenever `batch_size` rows are waiting or
+    `flush_interval` seconds have passed since the first row of a batch.
+    """
+
+    def __init__(
+        self,
+        writer: Writer,
+        batch_size: int = 500,
+        flush_interval: float = 0.25,
+        max_queue: int = 10000,
+        retry_delay: float = 1.0,
+    ) -> None:
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+        self.queue: asyncio.Queue[EventRow] = asyncio.Queue(maxsize=max_queue)
+        self.flushed = 0
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._stopping
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(), name="event-sink")
+
+    async def put(self, row: EventRow) -> None:
+        await self.queue.put(row)
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Flush everything queued so far, then stop the background task."""
+        if self._task is None:
+            return
+        self._stopping = True
+        await self.queue.put(_STOP)
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.error("event_sink.dropped", rows=self.queue.qsize())
+        self._task = None
+        # Rows that raced in behind the stop marker
+        leftover = [row for row in self._drain(self.queue.qsize()) if row != _STOP]
+        if leftover:
+            try:
+                await self._write(leftover)
+            except Exception as err:
+                logger.error("event_sink.dropped", rows=len(leftover), error=str(err))
+
+    def _drain(self, limit: int) -> list[EventRow]:
+        rows: list[EventRow] = []
+        while len(rows) < limit:
+            try:
+                rows.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return rows
+
+    async def _next_batch(self) -> tuple[list[EventRow], bool]:
+        rows = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while _STOP not in rows and len(rows) < self.batch_size:
+            rows.extend(self._drain(self.batch_size - len(rows)))
+            remaining = deadline - loop.time()
+            if _STOP in rows or len(rows) >= self.batch_size or remaining <= 0:
+                break
+            try:
+                rows.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        if _STOP in rows:
+            # Anything drained after the marker goes back to stop() via the queue
+            idx = rows.index(_STOP)
+            for row in rows[idx + 1:]:
+                self.queue.put_nowait(row)
+            return rows[:idx], True
+        return rows, False
+
+    async def _write(self, rows: list[EventRow]) -> None:
+        await self.writer(rows)
+        self.flushed += len(rows)
+
+    async def _run(self) -> None:
+        done = False
+        while not done:
+            rows, done = await self._next_batch()
+            while rows:
+                try:
+                    await self._write(rows)
+                    break
+                except Exception as err:
+                    logger.warning("event_sink.flush_failed", rows=len(rows), error=str(err))
+                    await asyncio.sleep(self.retry_delay)
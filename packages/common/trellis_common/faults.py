@@ -0,0 +1,169 @@
+"""Configurable fault injection for the simulated business calls.
+
+The active profile comes from FAULT_PROFILE (default `legacy`, the original
+33% failure / 33% 300-second hang). Profile fields can be overridden with
+FAULT_FAILURE_RATE, FAULT_HANG_RATE, FAULT_HANG_SECONDS, FAULT_LATENCY_MS
+(e.g. "p50=20,p95=120,p99=400,max=1000") and FAULT_SEEDED, and per step with
+FAULT_OVERRIDES, a JSON object such as
+{"payment_charged": {"profile": "off"}, "carrier_dispatched": {"failure_rate": 0.5}}.
+
+Seeded profiles draw from a generator keyed on FAULT_SEED, the step, the order
+id, the activity id and the attempt. A run is reproducible, while retries and
+hedged attempts still get a fresh draw.
+"""
+
+import asyncio
+import json
+import os
+import random
+from collections import Counter
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Optional
+
+from opentelemetry import trace
+from temporalio import activity
+
+
+@dataclass(frozen=True)
+class FaultProfile:
+    failure_rate: float = 0.0
+    hang_rate: float = 0.0
+    hang_seconds: float = 0.0
+    # Quantile -> milliseconds, e.g. {0.5: 20, 0.95: 120, 0.99: 400, 1.0: 1000}
+    latency_ms: Dict[float, float] = field(default_factory=dict)
+    seeded: bool = False
+
+
+PROFILES: Dict[str, FaultProfile] = {
+    "off": FaultProfile(),
+    "legacy": FaultProfile(failure_rate=0.33, hang_rate=0.34, hang_seconds=300),
+    "seeded-chaos": FaultProfile(failure_rate=0.1, hang_rate=0.05, hang_seconds=30, seeded=True),
+    "latency": FaultProfile(latency_ms={0.5: 20, 0.95: 120, 0.99: 400, 1.0: 1000}, seeded=True),
+}
+
+QUANTILE_NAMES = {"p50": 0.5, "p90": 0.9, "p95": 0.95, "p99": 0.99, "p999": 0.999, "max": 1.0}
+
+
+def parse_latency(spec: str) -> Dict[float, float]:
+    """Parse "p50=20,p99=400" into {0.5: 20.0, 0.99: 400.0}."""
+    points: Dict[float, float] = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, ms = part.partition("=")
+        if name not in QUANTILE_NAMES:
+            raise ValueError(f"unknown latency quantile {name!r}; use one of {sorted(QUANTILE_NAMES)}")
+        points[QUANTILE_NAMES[name]] = float(ms)
+    return points
+
+
+def _apply(profile: FaultProfile, overrides: Dict[str, Any]) -> FaultProfile:
+    if "profile" in overrides:
+        profile = PROFILES[overrides["profile"]]
+    fields: Dict[str, Any] = {}
+    for name in ("failure_rate", "hang_rate", "hang_seconds"):
+        if overrides.get(name) is not None:
+            fields[name] = float(overrides[name])
+    if overrides.get("latency_ms") is not None:
+        latency = overrides["latency_ms"]
+        fields["latency_ms"] = parse_latency(latency) if isinstance(latency, str) else {
+            QUANTILE_NAMES.get(k, k): float(v) for k, v in latency.items()
+        }
+    if overrides.get("seeded") is not None:
+        seeded = overrides["seeded"]
+        fields["seeded"] = seeded if isinstance(seeded, bool) else str(seeded).lower() in ("1", "true", "yes")
+    return replace(profile, **fields)
+
+
+def sample_latency(points: Dict[float, float], u: float) -> float:
+    """Inverse CDF through the configured quantiles, linear between them and from 0 ms at q=0."""
+    prev_q, prev_ms = 0.0, 0.0
+    for q, ms in sorted(points.items()):
+        if u <= q:
+            return prev_ms + (ms - prev_ms) * (u - prev_q) / (q - prev_q)
+        prev_q, prev_ms = q, ms
+    return prev_ms
+
+
+class FaultInjector:
+    def __init__(
+        self,
+        default: FaultProfile,
+        steps: Optional[Dict[str, FaultProfile]] = None,
+        seed: int = 0,
+    ) -> None:
+        self.default = default
+        self.steps = steps or {}
+        self.seed = seed
+        self.counts: Counter = Counter()
+
+    @classmethod
+    def from_env(cls) -> "FaultInjector":
+        name = os.getenv("FAULT_PROFILE", "legacy")
+        if name not in PROFILES:
+            raise ValueError(f"unknown FAULT_PROFILE {name!r}; use one of {sorted(PROFILES)}")
+        default = _apply(PROFILES[name], {
+            "failure_rate": os.getenv("FAULT_FAILURE_RATE"),
+            "hang_rate": os.getenv("FAULT_HANG_RATE"),
+            "hang_seconds": os.getenv("FAULT_HANG_SECONDS"),
+            "latency_ms": os.getenv("FAULT_LATENCY_MS"),
+            "seeded": os.getenv("FAULT_SEEDED"),
+        })
+        overrides = json.loads(os.getenv("FAULT_OVERRIDES", "{}"))
+        steps = {step: _apply(default, cfg) for step, cfg in overrides.items()}
+        return cls(default, steps, seed=int(os.getenv("FAULT_SEED", "0")))
+
+    def profile_for(self, step: Optional[str]) -> FaultProfile:
+        return self.steps.get(step or "", self.default)
+
+    def rng_for(self, profile: FaultProfile, step: Optional[str], key: Optional[str]) -> random.Random:
+        if not profile.seeded or key is None:
+            return random.Random()
+        if not activity.in_activity():
+            return random.Random(f"{self.seed}:{step}:{key}:1")
+        info = activity.info()
+        # The activity id tells a hedge apart from the primary, which shares its attempt number
+        return random.Random(f"{self.seed}:{step}:{key}:{info.activity_id}:{info.attempt}")
+
+    async def inject(self, step: Optional[str] = None, key: Optional[str] = None) -> None:
+        profile = self.profile_for(step)
+        rng = self.rng_for(profile, step, key)
+        label = step or "unknown"
+        self.counts[(label, "call")] += 1
+        roll = rng.random()
+        if roll < profile.failure_rate:
+            self.counts[(label, "failure")] += 1
+            trace.get_current_span().add_event("fault.failure", {"step": label})
+            raise RuntimeError("Forced failure for testing")
+        if roll < profile.failure_rate + profile.hang_rate:
+            self.counts[(label, "hang")] += 1
+            trace.get_current_span().add_event("fault.hang", {"step": label, "seconds": profile.hang_seconds})
+            # Expect the activity layer to time out before this completes
+            await asyncio.sleep(profile.hang_seconds)
+        if profile.latency_ms:
+            delay_ms = sample_latency(profile.latency_ms, rng.random())
+            self.counts[(label, "delayed")] += 1
+            trace.get_current_span().add_event("fault.delay", {"step": label, "ms": delay_ms})
+            await asyncio.sleep(delay_ms / 1000)
+
+
+_injector: Optional[FaultInjector] = None
+
+
+def get_injector() -> FaultInjector:
+    global _injector
+    if _injector is None:
+        _injector = FaultInjector.from_env()
+    return _injector
+
+
+def configure(injector: Optional[FaultInjector]) -> None:
+    """Install an injector explicitly; None re-reads the environment on next use."""
+    global _injector
+    _injector = injector
+
+
+def fault_counts() -> Dict[str, Dict[str, int]]:
+    """Injected faults so far, per step and kind ("call", "failure", "hang", "delayed")."""
+    counts: Dict[str, Dict[str, int]] = {}
+    for (step, kind), n in get_injector().counts.items():
+        counts.setdefault(step, {})[kind] = n
+    return counts
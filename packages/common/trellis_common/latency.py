@@ -0,0 +1,173 @@
+"""Adaptive activity timeouts from the latency workers observe.
+
+With ADAPTIVE_TIMEOUTS=1, workers keep the durations of their last
+ADAPTIVE_TIMEOUT_WINDOW (500) successful attempts per activity. Every
+ADAPTIVE_TIMEOUT_PUBLISH_INTERVAL (15) seconds they upsert p50/p95/p99 into
+`activity_latency`.
+
+The API reads the rows published in the last ADAPTIVE_TIMEOUT_MAX_AGE (120)
+seconds. For each activity with at least ADAPTIVE_TIMEOUT_MIN_SAMPLES (50)
+samples, new workflows get a start-to-close timeout of the slowest worker's
+p99 times ADAPTIVE_TIMEOUT_MULTIPLIER (2), but never less than
+ADAPTIVE_TIMEOUT_MIN_SECONDS (0.5). The adaptive timeout only ever shortens
+the configured one. The overall schedule-to-close window is unchanged, so a
+hung attempt is cut short and retried inside it instead of using up the whole
+window. Hedged steps (HEDGE_STEPS) hedge after the slowest worker's p95, but
+never sooner than ADAPTIVE_TIMEOUT_HEDGE_MIN_SECONDS (0.05). Without fresh
+data, workflows keep their configured timeouts and hedge delay.
+"""
+
+import asyncio
+import os
+import socket
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Deque, Dict, NamedTuple, Optional
+
+import structlog
+
+from .models import StepConfig, WorkflowConfig
+
+
+logger = structlog.get_logger()
+
+
+def adaptive_enabled() -> bool:
+    return os.getenv("ADAPTIVE_TIMEOUTS", "").lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
+class TimeoutBounds:
+    multiplier: float = 2.0
+    min_seconds: float = 0.5
+    min_samples: int = 50
+    max_age: float = 120.0
+    refresh_interval: float = 15.0
+    hedge_min_seconds: float = 0.05
+
+    @classmethod
+    def from_env(cls) -> "TimeoutBounds":
+        defaults = cls()
+        values = {}
+        for field, value in vars(defaults).items():
+            raw = os.getenv(f"ADAPTIVE_TIMEOUT_{field.upper()}")
+            if raw is not None:
+                values[field] = type(value)(raw)
+        return cls(**values)
+
+
+class LatencyStats(NamedTuple):
+    p50: float
+    p95: float
+    p99: float
+    samples: int
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LatencyWindow:
+    """The last `size` successful attempt durations per activity, in seconds."""
+
+    def __init__(self, size: int = 500) -> None:
+        self.size = size
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, activity: str, seconds: float) -> None:
+        samples = self._samples.get(activity)
+        if samples is None:
+            samples = self._samples[activity] = deque(maxlen=self.size)
+        samples.append(seconds)
+
+    def stats(self) -> Dict[str, LatencyStats]:
+        result = {}
+        for activity, samples in self._samples.items():
+            ordered = sorted(samples)
+            if ordered:
+                result[activity] = LatencyStats(
+                    percentile(ordered, 0.50), percentile(ordered, 0.95), percentile(ordered, 0.99), len(ordered)
+                )
+        return result
+
+
+# Fed by ActivityMetricsInterceptor in every worker process
+window = LatencyWindow(int(os.getenv("ADAPTIVE_TIMEOUT_WINDOW", "500")))
+
+
+def adapt_config(base: Optional[WorkflowConfig], stats: Dict[str, LatencyStats], bounds: TimeoutBounds) -> Optional[WorkflowConfig]:
+    """`base` with start-to-close timeouts and hedge delays derived from `stats`; `base` itself when nothing qualifies."""
+    config = base or WorkflowConfig()
+    steps = dict(config.steps)
+    for activity, s in stats.items():
+        if s.samples < bounds.min_samples:
+            continue
+        step = steps.get(activity, StepConfig())
+        timeout = max(bounds.min_seconds, s.p99 * bounds.multiplier)
+        step = replace(step, adaptive_start_to_close_seconds=round(timeout, 3))
+        if step.hedge_after_seconds is not None:
+            step = replace(step, hedge_after_seconds=round(max(bounds.hedge_min_seconds, s.p95), 3))
+        steps[activity] = step
+    if steps == config.steps:
+        return base
+    return replace(config, steps=steps)
+
+
+async def publish(interval: float) -> None:
+    """Upsert this process's window into activity_latency every `interval` seconds."""
+    from . import db
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    while True:
+        await asyncio.sleep(interval)
+        stats = window.stats()
+        if not stats:
+            continue
+        try:
+            await db.publish_activity_latency(worker_id, stats)
+        except Exception as e:
+            logger.warning("latency.publish_failed", error=str(e))
+
+
+class AdaptiveTimeouts:
+    """Keeps `config` (the workflow config for new starts) in line with published latency."""
+
+    def __init__(self, base: Optional[WorkflowConfig], bounds: TimeoutBounds) -> None:
+        self.base = base
+        self.bounds = bounds
+        self.config = base
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh(), name="adaptive-timeouts")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh(self) -> None:
+        from . import db
+
+        while True:
+            try:
+                stats = {name: LatencyStats(*s) for name, s in (await db.recent_activity_latency(self.bounds.max_age)).items()}
+                config = adapt_config(self.base, stats, self.bounds)
+                if config != self.config:
+                    logger.info(
+                        "latency.timeouts_adapted",
+                        timeouts={name: step.adaptive_start_to_close_seconds for name, step in (config or WorkflowConfig()).steps.items()},
+                    )
+                self.config = config
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Fall back to the configured timeouts rather than keep acting on stale numbers
+                logger.warning("latency.refresh_failed", error=str(e))
+                self.config = self.base
+            await asyncio.sleep(self.bounds.refresh_interval)
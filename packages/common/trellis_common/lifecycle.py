@@ -0,0 +1,19 @@
+import asyncio
+import signal
+
+
+def shutdown_event() -> asyncio.Event:
+    """Return an event that is set on SIGINT/SIGTERM.
+
+    Workers wait on it instead of sleeping forever so the Temporal worker can
+    drain and buffered writes can be flushed before the process exits.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows event loops have no signal handler support; Ctrl+C still raises KeyboardInterrupt
+            pass
+    return stop
@@ -0,0 +1,177 @@
+"""In-memory stand-in for the parts of `trellis_common.db` the activities use.
+
+For benchmarks and tests that run the real activities without Postgres:
+
+    with memory_db.use() as mem:
+        ...  # activities now read and write mem.orders / mem.payments / mem.events
+
+Writes queued on a unit of work are applied together when it exits cleanly,
+`claim_payment` keeps the ledger's semantics (already charged, or held by
+an unexpired lease) and a claimed step commits once, so idempotency paths
+behave as they do against the DB.
+"""
+
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+from . import db
+
+
+class MemoryDB:
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self.clock = clock
+        self.orders: dict[str, dict[str, Any]] = {}
+        # payment_id -> {"order_id", "status", "amount", "claimed_until"}
+        self.payments: dict[str, dict[str, Any]] = {}
+        self.events: list[tuple] = []
+        # (order_id, run_id, step) claimed by a committed unit of work
+        self.completed_steps: set[tuple[str, str, str]] = set()
+
+    def upsert_order_now(self, order_id: str, state: str, address_json: Optional[dict] = None) -> None:
+        order = self.orders.setdefault(order_id, {"address_json": None})
+        order["state"] = state
+        if address_json is not None:
+            order["address_json"] = address_json
+        order["updated_at"] = self.clock()
+
+    def update_order_address_now(self, order_id: str, address_json: dict) -> bool:
+        if order_id not in self.orders:
+            return False
+        self.orders[order_id]["address_json"] = address_json
+        self.orders[order_id]["updated_at"] = self.clock()
+        return True
+
+    def update_order_state_now(self, order_id: str, state: str) -> None:
+        if order_id in self.orders:
+            self.orders[order_id]["state"] = state
+            self.orders[order_id]["updated_at"] = self.clock()
+
+    def insert_event_now(self, order_id: str, event_type: str, payload: Optional[dict] = None) -> None:
+        self.events.append((str(uuid.uuid4()), order_id, event_type, payload, self.clock()))
+
+    def complete_payment_now(self, payment_id: str, amount: int) -> None:
+        payment = self.payments.get(payment_id)
+        if payment is not None:
+            payment.update(status="charged", amount=amount, claimed_until=None)
+
+    async def upsert_order(self, order_id: str, state: str, address_json: Optional[dict] = None) -> None:
+        self.upsert_order_now(order_id, state, address_json)
+
+    async def update_order_state(self, order_id: str, state: str) -> None:
+        self.update_order_state_now(order_id, state)
+
+    async def update_order_address(self, order_id: str, address_json: dict) -> bool:
+        return self.update_order_address_now(order_id, address_json)
+
+    async def get_order(self, order_id: str) -> Optional[dict]:
+        order = self.orders.get(order_id)
+        return dict(order) if order is not None else None
+
+    async def get_payment_status(self, payment_id: str) -> Optional[str]:
+        payment = self.payments.get(payment_id)
+        return payment["status"] if payment is not None else None
+
+    async def claim_payment(self, payment_id: str, order_id: str, lease_seconds: float) -> db.PaymentClaim:
+        now = self.clock()
+        prior = self.payments.get(payment_id)
+        if prior is None:
+            self.payments[payment_id] = {"order_id": order_id, "status": "pending", "amount": 0, "claimed_until": now + lease_seconds}
+            return db.PaymentClaim(None, None, True)
+        claimable = prior["status"] != "charged" and (prior["claimed_until"] is None or prior["claimed_until"] < now)
+        if claimable:
+            prior["claimed_until"] = now + lease_seconds
+        return db.PaymentClaim(prior["status"], prior["amount"], claimable)
+
+    async def complete_payment(self, payment_id: str, amount: int) -> None:
+        self.complete_payment_now(payment_id, amount)
+
+    async def release_payment(self, payment_id: str) -> None:
+        payment = self.payments.get(payment_id)
+        if payment is not None and payment["status"] != "charged":
+            payment["claimed_until"] = None
+
+    async def insert_event(
+        self, order_id: str, event_type: str, payload: Optional[dict] = None, durability: Optional[str] = None
+    ) -> None:
+        self.insert_event_now(order_id, event_type, payload)
+
+    @asynccontextmanager
+    async def unit_of_work(self) -> AsyncIterator["MemoryUnitOfWork"]:
+        uow = MemoryUnitOfWork(self)
+        yield uow
+        uow.commit()
+
+
+class MemoryUnitOfWork:
+    """Same methods as `db.UnitOfWork`; queued writes apply to the MemoryDB on commit."""
+
+    def __init__(self, mem: MemoryDB) -> None:
+        self.mem = mem
+        self.writes: list[Callable[[], None]] = []
+        self.steps: list[tuple[str, str, str]] = []
+
+    def claim_step(self, order_id: str, run_id: str, step: str) -> None:
+        self.steps.append((order_id, run_id, step))
+
+    def upsert_order(self, order_id: str, state: str, address_json: Optional[dict] = None) -> None:
+        self.writes.append(lambda: self.mem.upsert_order_now(order_id, state, address_json))
+
+    def update_order_state(self, order_id: str, state: str) -> None:
+        self.writes.append(lambda: self.mem.update_order_state_now(order_id, state))
+
+    def update_order_address(self, order_id: str, address_json: dict) -> None:
+        self.writes.append(lambda: self.mem.update_order_address_now(order_id, address_json))
+
+    def complete_payment(self, payment_id: str, amount: int) -> None:
+        self.writes.append(lambda: self.mem.complete_payment_now(payment_id, amount))
+
+    def upsert_payment(self, payment_id: str, order_id: str, status: str, amount: int) -> None:
+        def write() -> None:
+            payment = self.mem.payments.setdefault(payment_id, {"order_id": order_id, "claimed_until": None})
+            payment.update(status=status, amount=amount)
+
+        self.writes.append(write)
+
+    def insert_event(
+        self, order_id: str, event_type: str, payload: Optional[dict] = None, durability: Optional[str] = None
+    ) -> None:
+        self.writes.append(lambda: self.mem.insert_event_now(order_id, event_type, payload))
+
+    def commit(self) -> None:
+        if any(step in self.mem.completed_steps for step in self.steps):
+            raise db.StepAlreadyCompleted(f"already completed: {self.steps}")
+        self.mem.completed_steps.update(self.steps)
+        for write in self.writes:
+            write()
+        self.writes.clear()
+
+
+# The db functions activities call, replaced while a MemoryDB is in use
+PATCHED = (
+    "upsert_order",
+    "update_order_state",
+    "update_order_address",
+    "get_order",
+    "get_payment_status",
+    "claim_payment",
+    "complete_payment",
+    "release_payment",
+    "insert_event",
+    "unit_of_work",
+)
+
+
+@contextmanager
+def use(mem: Optional[MemoryDB] = None) -> Iterator[MemoryDB]:
+    """Route this process's `trellis_common.db` calls to `mem` (a new MemoryDB by default) inside the block."""
+    mem = mem or MemoryDB()
+    saved = {name: getattr(db, name) for name in PATCHED}
+    for name in PATCHED:
+        setattr(db, name, getattr(mem, name))
+    try:
+        yield mem
+    finally:
+        for name, fn in saved.items():
+            setattr(db, name, fn)
@@ -0,0 +1,191 @@
+"""Prometheus metrics shared by the API and workers.
+
+Activity timings come from `ActivityMetricsInterceptor`; DB time is collected
+by `observe_db` around every statement and attributed to the running activity
+through a context variable, so business-logic time is total minus DB time.
+Pool, event sink and fault-injection numbers are read at scrape time.
+"""
+
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+from prometheus_client import REGISTRY, Counter, Histogram, start_http_server
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from temporalio import activity, client
+from temporalio.runtime import PrometheusConfig, Runtime, TelemetryConfig
+from temporalio.worker import (
+    ActivityInboundInterceptor,
+    ExecuteActivityInput,
+    Interceptor,
+)
+
+from . import latency
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "trellis_http_request_duration_seconds",
+    "API request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+TEMPORAL_CLIENT_SECONDS = Histogram(
+    "trellis_temporal_client_duration_seconds",
+    "Temporal client call latency",
+    ["operation", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+ACTIVITY_SECONDS = Histogram(
+    "trellis_activity_duration_seconds",
+    "Activity attempt time split into total, business logic and DB",
+    ["activity", "phase"],
+    buckets=LATENCY_BUCKETS,
+)
+ACTIVITY_ATTEMPTS = Counter(
+    "trellis_activity_attempts_total",
+    "Activity attempts by outcome",
+    ["activity", "outcome"],
+)
+ACTIVITY_RETRIES = Counter(
+    "trellis_activity_retries_total",
+    "Activity attempts after the first",
+    ["activity"],
+)
+DB_QUERY_SECONDS = Histogram(
+    "trellis_db_query_duration_seconds",
+    "Time spent per DB operation, including pool acquire",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# Seconds of DB time accumulated by the current activity attempt
+_db_seconds: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("trellis_db_seconds", default=None)
+
+
+@contextmanager
+def observe_db(operation: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        DB_QUERY_SECONDS.labels(operation).observe(elapsed)
+        acc = _db_seconds.get()
+        if acc is not None:
+            acc[0] += elapsed
+
+
+class _ActivityMetricsInbound(ActivityInboundInterceptor):
+    async def execute_activity(self, input: ExecuteActivityInput) -> Any:
+        info = activity.info()
+        name = info.activity_type
+        if info.attempt > 1:
+            ACTIVITY_RETRIES.labels(name).inc()
+        acc = [0.0]
+        token = _db_seconds.set(acc)
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await self.next.execute_activity(input)
+            outcome = "success"
+            return result
+        finally:
+            _db_seconds.reset(token)
+            total = time.perf_counter() - started
+            if outcome == "success":
+                latency.window.record(name, total)
+            ACTIVITY_ATTEMPTS.labels(name, outcome).inc()
+            ACTIVITY_SECONDS.labels(name, "total").observe(total)
+            ACTIVITY_SECONDS.labels(name, "db").observe(acc[0])
+            ACTIVITY_SECONDS.labels(name, "business").observe(max(0.0, total - acc[0]))
+
+
+class ActivityMetricsInterceptor(Interceptor):
+    """Worker interceptor recording per-activity timings, outcomes and retries."""
+
+    def intercept_activity(self, next: ActivityInboundInterceptor) -> ActivityInboundInterceptor:
+        return _ActivityMetricsInbound(next)
+
+
+class _ClientMetricsOutbound(client.OutboundInterceptor):
+    async def _timed(self, operation: str, call: Any) -> Any:
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await call
+            outcome = "success"
+            return result
+        finally:
+            TEMPORAL_CLIENT_SECONDS.labels(operation, outcome).observe(time.perf_counter() - started)
+
+    async def start_workflow(self, input: client.StartWorkflowInput) -> client.WorkflowHandle[Any, Any]:
+        return await self._timed("start_workflow", self.next.start_workflow(input))
+
+    async def query_workflow(self, input: client.QueryWorkflowInput) -> Any:
+        return await self._timed("query_workflow", self.next.query_workflow(input))
+
+    async def signal_workflow(self, input: client.SignalWorkflowInput) -> None:
+        return await self._timed("signal_workflow", self.next.signal_workflow(input))
+
+
+class ClientMetricsInterceptor(client.Interceptor):
+    """Client interceptor timing workflow start, query and signal calls."""
+
+    def intercept_client(self, next: client.OutboundInterceptor) -> client.OutboundInterceptor:
+        return _ClientMetricsOutbound(next)
+
+
+class _RuntimeCollector:
+    """Pool, event sink and fault-injection numbers, read when Prometheus scrapes."""
+
+    def describe(self) -> list:
+        # Skip the collect() the registry would otherwise run at import time
+        return []
+
+    def collect(self) -> Iterator[Any]:
+        from . import db, faults
+
+        pool = db._pool
+        if pool is not None:
+            stats = pool.get_stats()
+            gauges = GaugeMetricFamily("trellis_db_pool", "Connection pool gauges", labels=["stat"])
+            for stat in ("pool_min", "pool_max", "pool_size", "pool_available", "requests_waiting"):
+                gauges.add_metric([stat], stats.get(stat, 0))
+            yield gauges
+            counters = CounterMetricFamily("trellis_db_pool_events", "Connection pool counters", labels=["stat"])
+            for stat in ("requests_num", "requests_queued", "requests_wait_ms", "requests_errors", "connections_num", "connections_errors", "connections_lost"):
+                counters.add_metric([stat], stats.get(stat, 0))
+            yield counters
+        sink = db._event_sink
+        if sink is not None:
+            yield GaugeMetricFamily("trellis_event_sink_queue_depth", "Events waiting to be flushed", value=sink.queue.qsize())
+            yield CounterMetricFamily("trellis_event_sink_flushed", "Events flushed by the sink", value=sink.flushed)
+        if faults._injector is not None:
+            injected = CounterMetricFamily("trellis_faults", "Fault injector outcomes", labels=["step", "kind"])
+            for (step, kind), n in faults._injector.counts.items():
+                injected.add_metric([step, kind], n)
+            yield injected
+
+
+REGISTRY.register(_RuntimeCollector())
+
+
+def start_metrics_server() -> Optional[int]:
+    """Serve this process's metrics on METRICS_PORT, if set."""
+    port = os.getenv("METRICS_PORT")
+    if not port:
+        return None
+    start_http_server(int(port))
+    return int(port)
+
+
+def temporal_runtime() -> Optional[Runtime]:
+    """Runtime exporting Temporal SDK metrics on TEMPORAL_METRICS_PORT, if set."""
+    port = os.getenv("TEMPORAL_METRICS_PORT")
+    if not port:
+        return None
+    return Runtime(telemetry=TelemetryConfig(metrics=PrometheusConfig(bind_address=f"0.0.0.0:{port}")))
@@ -0,0 +1,146 @@
+"""Typed payloads passed between the API, workflows and activities.
+
+They serialize to the same JSON objects as the dicts they replace, so histories
+recorded before the switch still decode into them (unknown keys are ignored).
+Slotted dataclasses keep per-instance memory down and attribute access fast;
+orjson encodes them natively, and `from_dict` rebuilds them without the SDK's
+per-instance type-hint walk.
+"""
+
+from dataclasses import dataclass, field, fields
+from typing import Any, Optional
+
+
+@dataclass(slots=True)
+class OrderItem:
+    sku: str
+    qty: int = 1
+    # Items from different warehouses ship separately
+    warehouse: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, value: dict[str, Any]) -> "OrderItem":
+        return cls(sku=value["sku"], qty=value.get("qty", 1), warehouse=value.get("warehouse"))
+
+
+@dataclass(slots=True)
+class Address:
+    street: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    postal_code: Optional[str] = None
+    country: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, value: dict[str, Any]) -> "Address":
+        return cls(
+            street=value.get("street"),
+            city=value.get("city"),
+            state=value.get("state"),
+            postal_code=value.get("postal_code"),
+            country=value.get("country"),
+        )
+
+    @classmethod
+    def parse(cls, value: Any) -> "Address":
+        """`from_dict` for untrusted input: ValueError on unknown keys or non-string values instead of dropping them."""
+        if not isinstance(value, dict):
+            raise ValueError("address must be an object")
+        known = {f.name for f in fields(cls)}
+        unknown = sorted(set(value) - known)
+        if unknown:
+            raise ValueError(f"unknown address fields {unknown}; expected {sorted(known)}")
+        invalid = sorted(k for k, v in value.items() if v is not None and not isinstance(v, str))
+        if invalid:
+            raise ValueError(f"address fields must be strings: {invalid}")
+        return cls.from_dict(value)
+
+
+@dataclass(slots=True)
+class Order:
+    order_id: str
+    items: list[OrderItem] = field(default_factory=list)
+    address: Optional[Address] = None
+
+    @classmethod
+    def from_dict(cls, value: dict[str, Any]) -> "Order":
+        address = value.get("address")
+        return cls(
+            order_id=value["order_id"],
+            items=[OrderItem.from_dict(i) for i in value.get("items") or ()],
+            address=Address.from_dict(address) if address is not None else None,
+        )
+
+
+@dataclass(slots=True)
+class PaymentResult:
+    payment_id: str
+    amount: int
+    status: str = "charged"
+    # True when the charge had already been made by an earlier attempt
+    idempotent: bool = False
+
+    @classmethod
+    def from_dict(cls, value: dict[str, Any]) -> "PaymentResult":
+        return cls(
+            payment_id=value["payment_id"],
+            amount=value["amount"],
+            status=value.get("status", "charged"),
+            idempotent=value.get("idempotent", False),
+        )
+
+
+@dataclass(slots=True)
+class StepConfig:
+    """How a workflow runs one activity step."""
+
+    # Run as a local activity on the workflow's worker instead of scheduling it on the task queue
+    local: bool = False
+    # A local run that has not finished within this many seconds falls back to a regular activity
+    local_max_seconds: float = 2.0
+    # Overrides for the timeouts and retry policy the workflow code passes; None keeps the workflow's value
+    start_to_close_seconds: Optional[float] = None
+    schedule_to_close_seconds: Optional[float] = None
+    maximum_attempts: Optional[int] = None
+    initial_interval_seconds: Optional[float] = None
+    backoff_coefficient: Optional[float] = None
+    # Set from observed latency (trellis_common.latency); only ever shortens the start-to-close timeout
+    adaptive_start_to_close_seconds: Optional[float] = None
+    # Start a second attempt when the first has not finished after this many seconds; None never hedges
+    hedge_after_seconds: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, value: dict[str, Any]) -> "StepConfig":
+        return cls(
+            local=value.get("local", False),
+            local_max_seconds=value.get("local_max_seconds", 2.0),
+            start_to_close_seconds=value.get("start_to_close_seconds"),
+            schedule_to_close_seconds=value.get("schedule_to_close_seconds"),
+            maximum_attempts=value.get("maximum_attempts"),
+            initial_interval_seconds=value.get("initial_interval_seconds"),
+            backoff_coefficient=value.get("backoff_coefficient"),
+            adaptive_start_to_close_seconds=value.get("adaptive_start_to_close_seconds"),
+            hedge_after_seconds=value.get("hedge_after_seconds"),
+        )
+
+
+@dataclass(slots=True)
+class WorkflowConfig:
+    """Execution options passed in workflow input, since workflow code cannot read the environment."""
+
+    steps: dict[str, StepConfig] = field(default_factory=dict)
+    # Split each warehouse's items into shipments of at most this many items; 0 keeps one per warehouse
+    shipment_chunk_size: int = 0
+    # Shipments ShippingWorkflow prepares and dispatches at once
+    max_parallel_shipments: int = 4
+
+    def step(self, activity: str) -> StepConfig:
+        return self.steps.get(activity) or StepConfig()
+
+    @classmethod
+    def from_dict(cls, value: dict[str, Any]) -> "WorkflowConfig":
+        return cls(
+            steps={name: StepConfig.from_dict(step) for name, step in (value.get("steps") or {}).items()},
+            shipment_chunk_size=value.get("shipment_chunk_size", 0),
+            max_parallel_shipments=value.get("max_parallel_shipments", 4),
+        )
@@ -0,0 +1,251 @@
+"""Time partitioning and retention for the events table (and step_completions).
+
+Drizzle cannot declare partitioned tables, so the plain `events` table it
+creates is converted on the first run. The existing table is attached as the
+partition holding everything before the next period, and later rows land in
+range partitions on `ts` of EVENTS_PARTITION_INTERVAL (`day` or `month`,
+default month). Every partition carries the (order_id, ts, id) index that
+timeline reads use, and a default partition catches rows if maintenance falls
+behind.
+
+Each run creates the current and next EVENTS_PARTITIONS_AHEAD (3) periods.
+It also detaches partitions whose range ended more than EVENTS_RETENTION_DAYS
+ago (unset keeps everything), or drops them when EVENTS_EXPIRED_ACTION=drop.
+Detached tables are left for archiving.
+
+Each run also deletes `step_completions` rows (the claims hedged steps make)
+older than STEP_COMPLETIONS_RETENTION_HOURS (24). A claim only has to outlive
+the two attempts racing for it.
+
+    python -m trellis_common.partitions               # once, e.g. from cron
+    python -m trellis_common.partitions --every 3600  # as a long-running job
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, NamedTuple, Optional
+
+import structlog
+from psycopg import AsyncConnection, sql
+
+from . import db
+from .lifecycle import shutdown_event
+
+
+logger = structlog.get_logger()
+
+# Serializes maintenance runs across processes
+LOCK_KEY = 7_362_514_001
+
+INTERVALS = ("day", "month")
+
+
+class Partition(NamedTuple):
+    name: str
+    # None for MINVALUE/MAXVALUE bounds and for the default partition
+    start: Optional[datetime]
+    end: Optional[datetime]
+    default: bool = False
+
+
+def period_start(ts: datetime, interval: str) -> datetime:
+    ts = ts.astimezone(timezone.utc)
+    day = datetime(ts.year, ts.month, ts.day, tzinfo=timezone.utc)
+    return day if interval == "day" else day.replace(day=1)
+
+
+def next_period(start: datetime, interval: str) -> datetime:
+    if interval == "day":
+        return start + timedelta(days=1)
+    return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+
+
+def partition_name(start: datetime) -> str:
+    return f"events_p{start:%Y%m%d}"
+
+
+def upcoming_periods(now: datetime, interval: str, ahead: int) -> list[tuple[datetime, datetime]]:
+    """The current period and the `ahead` following ones, as [start, end) ranges."""
+    periods = []
+    start = period_start(now, interval)
+    for _ in range(ahead + 1):
+        end = next_period(start, interval)
+        periods.append((start, end))
+        start = end
+    return periods
+
+
+_BOUND = re.compile(r"FOR VALUES FROM \((?:'([^']+)'|MINVALUE)\) TO \((?:'([^']+)'|MAXVALUE)\)")
+
+
+def parse_bound(name: str, bound: str) -> Partition:
+    if bound == "DEFAULT":
+        return Partition(name, None, None, default=True)
+    match = _BOUND.fullmatch(bound)
+    if match is None:
+        raise ValueError(f"unexpected partition bound for {name}: {bound}")
+    start, end = (datetime.fromisoformat(v) if v else None for v in match.groups())
+    return Partition(name, start, end)
+
+
+def overlaps(p: Partition, start: datetime, end: datetime) -> bool:
+    if p.default:
+        return False
+    return (p.start is None or p.start < end) and (p.end is None or start < p.end)
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    cur = await conn.execute("SELECT relkind FROM pg_class WHERE oid = 'events'::regclass")
+    row = await cur.fetchone()
+    return row is not None and row[0] == "p"
+
+
+async def list_partitions(conn: AsyncConnection) -> list[Partition]:
+    cur = await conn.execute(
+        """
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'events'::regclass
+        ORDER BY c.relname
+        """
+    )
+    return [parse_bound(name, bound) for name, bound in await cur.fetchall()]
+
+
+async def convert_to_partitioned(conn: AsyncConnection, interval: str, now: datetime) -> str:
+    """Swap the plain events table for a partitioned one, keeping its rows as the first partition."""
+    cutoff = next_period(period_start(now, interval), interval)
+    legacy = f"events_until_{cutoff:%Y%m%d}"
+    async with conn.transaction():
+        cur = await conn.execute("SELECT conname FROM pg_constraint WHERE conrelid = 'events'::regclass AND contype = 'p'")
+        pkey = await cur.fetchone()
+        await conn.execute(sql.SQL("ALTER TABLE events RENAME TO {}").format(sql.Identifier(legacy)))
+        if pkey is not None:
+            # Replaced by the parent's (id, ts) key, which ATTACH builds on this partition
+            await conn.execute(sql.SQL("ALTER TABLE {} DROP CONSTRAINT {}").format(sql.Identifier(legacy), sql.Identifier(pkey[0])))
+        await conn.execute(
+            sql.SQL("CREATE TABLE events (LIKE {} INCLUDING DEFAULTS) PARTITION BY RANGE (ts)").format(sql.Identifier(legacy))
+        )
+        # The partition key has to be part of the primary key
+        await conn.execute("ALTER TABLE events ADD PRIMARY KEY (id, ts)")
+        await conn.execute("ALTER TABLE events ADD FOREIGN KEY (order_id) REFERENCES orders(id) ON DELETE CASCADE")
+        await conn.execute("CREATE INDEX events_timeline_idx ON events (order_id, ts, id)")
+        await conn.execute(
+            sql.SQL("ALTER TABLE events ATTACH PARTITION {} FOR VALUES FROM (MINVALUE) TO ({})").format(
+                sql.Identifier(legacy), sql.Literal(cutoff)
+            )
+        )
+        await conn.execute("CREATE TABLE events_default PARTITION OF events DEFAULT")
+    return legacy
+
+
+async def create_partitions(conn: AsyncConnection, interval: str, ahead: int, now: datetime) -> list[str]:
+    existing = await list_partitions(conn)
+    created = []
+    for start, end in upcoming_periods(now, interval, ahead):
+        if any(overlaps(p, start, end) for p in existing):
+            continue
+        name = partition_name(start)
+        await conn.execute(
+            sql.SQL("CREATE TABLE {} PARTITION OF events FOR VALUES FROM ({}) TO ({})").format(
+                sql.Identifier(name), sql.Literal(start), sql.Literal(end)
+            )
+        )
+        existing.append(Partition(name, start, end))
+        created.append(name)
+    return created
+
+
+async def expire_partitions(conn: AsyncConnection, retention: timedelta, action: str, now: datetime) -> list[str]:
+    expired = []
+    for p in await list_partitions(conn):
+        if p.end is None or p.end > now - retention:
+            continue
+        statement = "DROP TABLE {}" if action == "drop" else "ALTER TABLE events DETACH PARTITION {}"
+        await conn.execute(sql.SQL(statement).format(sql.Identifier(p.name)))
+        expired.append(p.name)
+    return expired
+
+
+async def expire_step_completions(conn: AsyncConnection, retention: timedelta, now: datetime) -> int:
+    cur = await conn.execute(db.EXPIRE_STEP_COMPLETIONS_SQL, (now - retention,))
+    return cur.rowcount
+
+
+def maintenance_settings() -> dict[str, Any]:
+    interval = os.getenv("EVENTS_PARTITION_INTERVAL", "month")
+    if interval not in INTERVALS:
+        raise ValueError(f"unknown EVENTS_PARTITION_INTERVAL {interval!r}; use day or month")
+    action = os.getenv("EVENTS_EXPIRED_ACTION", "detach")
+    if action not in ("detach", "drop"):
+        raise ValueError(f"unknown EVENTS_EXPIRED_ACTION {action!r}; use detach or drop")
+    retention = os.getenv("EVENTS_RETENTION_DAYS")
+    return {
+        "interval": interval,
+        "ahead": int(os.getenv("EVENTS_PARTITIONS_AHEAD", "3")),
+        "retention": timedelta(days=float(retention)) if retention else None,
+        "action": action,
+        "step_retention": timedelta(hours=float(os.getenv("STEP_COMPLETIONS_RETENTION_HOURS", "24"))),
+    }
+
+
+async def run_maintenance(now: Optional[datetime] = None) -> dict[str, Any]:
+    """Convert, create and expire partitions once; a run already in progress elsewhere is skipped."""
+    settings = maintenance_settings()
+    now = now or datetime.now(timezone.utc)
+    summary: dict[str, Any] = {"converted": None, "created": [], "expired": [], "steps_expired": 0, "skipped": False}
+    pool = await db.get_pool()
+    async with pool.connection() as conn:
+        await conn.set_autocommit(True)
+        try:
+            # Bounds are printed in the session time zone; parse them as UTC
+            await conn.execute("SET TIME ZONE 'UTC'")
+            cur = await conn.execute("SELECT pg_try_advisory_lock(%s)", (LOCK_KEY,))
+            if not (await cur.fetchone())[0]:
+                summary["skipped"] = True
+                return summary
+            try:
+                if not await is_partitioned(conn):
+                    summary["converted"] = await convert_to_partitioned(conn, settings["interval"], now)
+                summary["created"] = await create_partitions(conn, settings["interval"], settings["ahead"], now)
+                if settings["retention"] is not None:
+                    summary["expired"] = await expire_partitions(conn, settings["retention"], settings["action"], now)
+                summary["steps_expired"] = await expire_step_completions(conn, settings["step_retention"], now)
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,))
+        finally:
+            await conn.execute("RESET TIME ZONE")
+            await conn.set_autocommit(False)
+    logger.info("events.partitions.maintained", **summary)
+    return summary
+
+
+async def main(argv: list[str]) -> None:
+    p = argparse.ArgumentParser(description="Create and expire events partitions")
+    p.add_argument("--every", type=float, default=None, help="repeat every N seconds instead of running once")
+    args = p.parse_args(argv)
+    await db.init_pool()
+    try:
+        if args.every is None:
+            await run_maintenance()
+            return
+        stop = shutdown_event()
+        while not stop.is_set():
+            try:
+                await run_maintenance()
+            except Exception as e:
+                logger.error("events.partitions.failed", error=str(e))
+            try:
+                await asyncio.wait_for(stop.wait(), args.every)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await db.close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
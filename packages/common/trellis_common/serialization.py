@@ -0,0 +1,182 @@
+"""Fast JSON for Temporal payloads, JSONB columns and API bodies.
+
+orjson replaces the stdlib encoder everywhere a payload is serialized. It
+encodes dataclasses (including the slotted ones in `models`), UUIDs and
+datetimes natively, so values no longer go through `dataclasses.asdict` first.
+
+The Temporal converter keeps the `json/plain` encoding and sorts dict keys like
+the SDK's default converter (dataclass fields stay in declaration order), so
+existing histories replay and older processes can still read new payloads, and
+vice versa. Payloads of at least PAYLOAD_COMPRESSION_MIN_BYTES (default 1024)
+can also be compressed with PAYLOAD_COMPRESSION=zlib or zstd (needs the
+`zstandard` package; default none).
+Compressed payloads are unreadable to processes without the codec, so enable
+compression only once the API and every worker run this code; decoding always
+understands both formats, so it can be turned off again at any time.
+"""
+
+import collections.abc
+import os
+import types
+import zlib
+from typing import Any, Callable, Optional, Sequence, Union, get_args, get_origin
+
+import orjson
+from temporalio.api.common.v1 import Payload
+from temporalio.converter import (
+    CompositePayloadConverter,
+    DataConverter,
+    DefaultPayloadConverter,
+    EncodingPayloadConverter,
+    JSONPlainPayloadConverter,
+    PayloadCodec,
+    value_to_type,
+)
+
+
+COMPRESSIONS = ("none", "zlib", "zstd")
+
+
+def _default(value: Any) -> Any:
+    # Sets, generators and other iterables, as the SDK's AdvancedJSONEncoder does
+    if isinstance(value, collections.abc.Iterable):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(value: Any, default: Callable[[Any], Any] = _default) -> bytes:
+    return orjson.dumps(value, default=default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def dumps_str(value: Any) -> str:
+    return dumps(value).decode()
+
+
+loads = orjson.loads
+
+
+def _from_dict(type_hint: Any) -> Optional[Callable[[dict], Any]]:
+    """The `from_dict` of a model hint, looking through Optional[...]."""
+    if get_origin(type_hint) in (Union, types.UnionType):
+        args = [a for a in get_args(type_hint) if a is not type(None)]
+        type_hint = args[0] if len(args) == 1 else None
+    return getattr(type_hint, "from_dict", None)
+
+
+class FastJSONPayloadConverter(EncodingPayloadConverter):
+    """`json/plain` payloads written with orjson.
+
+    Type hints with a `from_dict` classmethod (the `models`) are rebuilt with
+    it; any other hint goes through the SDK's `value_to_type`.
+    """
+
+    encoding = "json/plain"
+
+    def to_payload(self, value: Any) -> Optional[Payload]:
+        data = orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS)
+        return Payload(metadata={"encoding": b"json/plain"}, data=data)
+
+    def from_payload(self, payload: Payload, type_hint: Optional[type] = None) -> Any:
+        try:
+            value = orjson.loads(payload.data)
+        except orjson.JSONDecodeError as err:
+            raise RuntimeError("Failed parsing") from err
+        if not type_hint:
+            return value
+        from_dict = _from_dict(type_hint)
+        if from_dict is not None and isinstance(value, dict):
+            return from_dict(value)
+        return value_to_type(type_hint, value, [])
+
+
+class PayloadConverter(CompositePayloadConverter):
+    """The SDK's default converter chain with the JSON step swapped for `FastJSONPayloadConverter`."""
+
+    def __init__(self) -> None:
+        super().__init__(
+            *(
+                FastJSONPayloadConverter() if isinstance(c, JSONPlainPayloadConverter) else c
+                for c in DefaultPayloadConverter.default_encoding_payload_converters
+            )
+        )
+
+
+def _zstd() -> Any:
+    # Imported lazily so zlib and uncompressed setups work without the package
+    try:
+        import zstandard
+    except ImportError as err:
+        raise RuntimeError("zstd payload compression needs the zstandard package") from err
+    return zstandard
+
+
+class CompressionCodec(PayloadCodec):
+    """Wrap payloads of at least `min_bytes` in a compressed `binary/<algorithm>` payload."""
+
+    def __init__(self, algorithm: str = "zlib", min_bytes: int = 1024, level: Optional[int] = None) -> None:
+        if algorithm not in ("zlib", "zstd"):
+            raise ValueError(f"unknown payload compression {algorithm!r}; use zlib or zstd")
+        self.algorithm = algorithm
+        self.encoding = f"binary/{algorithm}".encode()
+        self.min_bytes = min_bytes
+        self.level = level
+        if algorithm == "zstd":
+            _zstd()
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.algorithm == "zstd":
+            return _zstd().ZstdCompressor(level=self.level or 3).compress(data)
+        return zlib.compress(data, self.level if self.level is not None else 6)
+
+    async def encode(self, payloads: Sequence[Payload]) -> list[Payload]:
+        out = []
+        for p in payloads:
+            if p.ByteSize() < self.min_bytes:
+                out.append(p)
+                continue
+            compressed = self._compress(p.SerializeToString())
+            # Incompressible payloads are left alone rather than made bigger
+            if len(compressed) >= p.ByteSize():
+                out.append(p)
+            else:
+                out.append(Payload(metadata={"encoding": self.encoding}, data=compressed))
+        return out
+
+    async def decode(self, payloads: Sequence[Payload]) -> list[Payload]:
+        out = []
+        for p in payloads:
+            encoding = p.metadata.get("encoding", b"")
+            if encoding == b"binary/zlib":
+                out.append(Payload.FromString(zlib.decompress(p.data)))
+            elif encoding == b"binary/zstd":
+                out.append(Payload.FromString(_zstd().ZstdDecompressor().decompress(p.data)))
+            else:
+                out.append(p)
+        return out
+
+
+def payload_codec() -> Optional[PayloadCodec]:
+    """The codec configured by PAYLOAD_COMPRESSION*, or None when compression is off."""
+    algorithm = os.getenv("PAYLOAD_COMPRESSION", "none")
+    if algorithm not in COMPRESSIONS:
+        raise ValueError(f"unknown PAYLOAD_COMPRESSION {algorithm!r}; use none, zlib or zstd")
+    if algorithm == "none":
+        return None
+    level = os.getenv("PAYLOAD_COMPRESSION_LEVEL")
+    return CompressionCodec(
+        algorithm,
+        min_bytes=int(os.getenv("PAYLOAD_COMPRESSION_MIN_BYTES", "1024")),
+        level=int(level) if level else None,
+    )
+
+
+def data_converter() -> DataConverter:
+    """Data converter for every Temporal client: orjson payloads, compression and claim-check storage as configured."""
+    # Imported here because claim_check stores blobs through db, which imports this module
+    from .claim_check import external_storage
+
+    return DataConverter(
+        payload_converter_class=PayloadConverter,
+        payload_codec=payload_codec(),
+        external_storage=external_storage(),
+    )
@@ -0,0 +1,93 @@
+"""Hash-sharded task queues for the order and shipping stages.
+
+With TASK_QUEUE_SHARDS=N (default 1) the API starts each order on
+`order-tq-shard-<k>`. k is a stable hash of the order id, or of the tenant when
+the start names one, modulo N. SHARD_PINS (a JSON object such as {"acme": 7})
+puts hot tenants on a shard of their own choosing. With one shard the queues
+keep their plain names, `order-tq` and `shipping-tq`.
+
+Workflows never read the shard count. They derive every queue from the one
+they were started on (`workflow.info().task_queue`): activities stay on it,
+and the shipping child goes to `shipping-tq` with the same shard suffix.
+Changing N therefore only moves new orders, and in-flight workflows finish on
+their original shard. Keep workers polling a shard that leaves the range
+until its workflows have drained.
+
+Workers poll the shards listed in <SERVICE>_TASK_QUEUE_SHARDS, e.g. "0-3,7".
+The default is every shard in range. Sharded workers also keep polling the
+plain queue, where workflows started before sharding was enabled still run.
+"""
+
+import json
+import os
+import zlib
+from typing import Optional
+
+
+ORDER_QUEUE = "order-tq"
+SHIPPING_QUEUE = "shipping-tq"
+SHARD_SEPARATOR = "-shard-"
+
+
+def shard_count() -> int:
+    return max(1, int(os.getenv("TASK_QUEUE_SHARDS", "1")))
+
+
+def shard_pins() -> dict[str, int]:
+    return {key: int(shard) for key, shard in json.loads(os.getenv("SHARD_PINS", "{}")).items()}
+
+
+def shard_for(key: str, shards: int, pins: Optional[dict[str, int]] = None) -> int:
+    """Stable across processes and restarts, unlike hash()."""
+    if pins and key in pins:
+        return pins[key] % shards
+    return zlib.crc32(key.encode()) % shards
+
+
+def queue_name(base: str, shard: Optional[int]) -> str:
+    return base if shard is None else f"{base}{SHARD_SEPARATOR}{shard}"
+
+
+def queue_shard(task_queue: str) -> Optional[int]:
+    """The shard a queue name carries; None for an unsharded queue."""
+    _, sep, shard = task_queue.rpartition(SHARD_SEPARATOR)
+    return int(shard) if sep and shard.isdigit() else None
+
+
+def sibling_queue(task_queue: str, base: str) -> str:
+    """`base` on the same shard as `task_queue`, e.g. order-tq-shard-3 -> shipping-tq-shard-3."""
+    return queue_name(base, queue_shard(task_queue))
+
+
+def route(order_id: str, tenant: Optional[str] = None, base: str = ORDER_QUEUE) -> str:
+    """The queue a new workflow for `order_id` starts on."""
+    shards = shard_count()
+    if shards == 1:
+        return base
+    return queue_name(base, shard_for(tenant or order_id, shards, shard_pins()))
+
+
+def parse_shards(spec: str, shards: int) -> list[int]:
+    """"all", or comma-separated shard numbers and inclusive ranges ("0-3,7")."""
+    if spec.strip() in ("", "all"):
+        return list(range(shards))
+    selected: set[int] = set()
+    for part in spec.split(","):
+        first, _, last = part.strip().partition("-")
+        selected.update(range(int(first), int(last or first) + 1))
+    return sorted(selected)
+
+
+def worker_queues(service: str, base: str) -> list[str]:
+    """Queues a worker of `service` (ORDER/SHIPPING) polls."""
+    spec = os.getenv(f"{service.upper()}_TASK_QUEUE_SHARDS")
+    shards = shard_count()
+    if spec is None and shards == 1:
+        return [base]
+    # The base queue too, so workflows started before sharding was turned on still finish
+    return [base] + [queue_name(base, shard) for shard in parse_shards(spec or "all", shards)]
+
+
+def all_queues(base: str) -> list[str]:
+    shards = shard_count()
+    return [base] if shards == 1 else [queue_name(base, shard) for shard in range(shards)]
@@ -0,0 +1,36 @@
+"""Split an order into shipments that ShippingWorkflow handles independently.
+
+Pure functions of the order, so workflow code can call them.
+"""
+
+from typing import NamedTuple
+
+from .models import Order, OrderItem
+
+
+DEFAULT_WAREHOUSE = "default"
+
+
+class ShipmentGroup(NamedTuple):
+    group_id: str
+    warehouse: str
+    items: list[OrderItem]
+
+
+def shipment_groups(items: list[OrderItem], chunk_size: int = 0) -> list[ShipmentGroup]:
+    """Group items by warehouse, in first-seen order, then split each into chunks of `chunk_size` (0: no split)."""
+    by_warehouse: dict[str, list[OrderItem]] = {}
+    for item in items:
+        by_warehouse.setdefault(item.warehouse or DEFAULT_WAREHOUSE, []).append(item)
+    groups = []
+    for warehouse, wh_items in by_warehouse.items():
+        size = chunk_size if chunk_size > 0 else len(wh_items)
+        for n, start in enumerate(range(0, len(wh_items), size), 1):
+            groups.append(ShipmentGroup(f"{warehouse}-{n}", warehouse, wh_items[start : start + size]))
+    # An order without items still ships once, as before the split
+    return groups or [ShipmentGroup(f"{DEFAULT_WAREHOUSE}-1", DEFAULT_WAREHOUSE, [])]
+
+
+def shipment_order(order: Order, items: list[OrderItem]) -> Order:
+    """The order restricted to `items`, as passed to the shipping activities."""
+    return Order(order_id=order.order_id, items=items, address=order.address)
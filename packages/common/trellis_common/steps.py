@@ -0,0 +1,190 @@
+"""Run workflow steps as regular or local activities.
+
+Local activities run on the worker that is executing the workflow task, with no
+task-queue round trip. Their result goes into one marker event instead of the
+three events a regular activity records (scheduled, started, completed). That
+suits short DB-only steps such as ValidateOrder or PreparePackage.
+
+Which steps run locally is a `WorkflowConfig` passed in the workflow input.
+`workflow_config()` builds it on the client side from these settings:
+- LOCAL_ACTIVITY_STEPS: comma-separated activity names (default none);
+- LOCAL_ACTIVITY_MAX_SECONDS (2);
+- the shipment split (SHIPMENT_CHUNK_SIZE, SHIPMENT_MAX_PARALLEL);
+- ACTIVITY_OPTIONS: per-activity timeouts and retry policy as JSON, e.g.
+  {"ChargePayment": {"start_to_close_seconds": 1, "maximum_attempts": 3}};
+- HEDGE_STEPS: comma-separated activity names to hedge (default none), after
+  HEDGE_AFTER_SECONDS (1).
+
+Timeouts and retry policy come from the workflow call unless the step config
+overrides them. A local step keeps its retry policy and timeouts, capped at
+that budget. If it times out within the budget it runs again as a regular
+activity with the full options. Any other failure is raised as it would be for
+a regular activity.
+
+A hedged step that has not finished after `hedge_after_seconds` gets a second,
+identical activity. The first to succeed wins and the other is cancelled. Only
+the activities in HEDGEABLE may be hedged. They take a trailing `hedged` flag,
+which run_step sets only when hedging, and then claim their step in
+`step_completions`, so the slower attempt never writes twice. ChargePayment
+is left out because the payment lease already blocks a second attempt, and
+DispatchCarrier because a carrier booking is not idempotent. Local steps are
+never hedged. The `trellis_activity_hedges` workflow metric counts hedges by
+activity and outcome: primary_won, hedge_won or both_failed.
+"""
+
+import asyncio
+import json
+import os
+from dataclasses import fields, replace
+from datetime import timedelta
+from typing import Any, Callable, Optional
+
+from temporalio import workflow
+from temporalio.common import RetryPolicy
+from temporalio.exceptions import ActivityError, TimeoutError
+
+from .models import StepConfig, WorkflowConfig
+
+
+HEDGEABLE = frozenset({"ReceiveOrder", "ValidateOrder", "PreparePackage"})
+
+
+def workflow_config() -> Optional[WorkflowConfig]:
+    """Config for new workflows from the environment; None when nothing differs from the defaults."""
+    names = [n.strip() for n in os.getenv("LOCAL_ACTIVITY_STEPS", "").split(",") if n.strip()]
+    budget = float(os.getenv("LOCAL_ACTIVITY_MAX_SECONDS", "2"))
+    steps = activity_options(os.getenv("ACTIVITY_OPTIONS", "{}"))
+    for name in names:
+        steps[name] = replace(steps.get(name, StepConfig()), local=True, local_max_seconds=budget)
+    hedge_after = float(os.getenv("HEDGE_AFTER_SECONDS", "1"))
+    for name in (n.strip() for n in os.getenv("HEDGE_STEPS", "").split(",")):
+        if name:
+            steps[name] = replace(steps.get(name, StepConfig()), hedge_after_seconds=hedge_after)
+    unsafe = sorted(name for name, step in steps.items() if step.hedge_after_seconds is not None and name not in HEDGEABLE)
+    if unsafe:
+        raise ValueError(f"cannot hedge {unsafe}: only {sorted(HEDGEABLE)} are idempotent")
+    config = WorkflowConfig(
+        steps=steps,
+        shipment_chunk_size=int(os.getenv("SHIPMENT_CHUNK_SIZE", "0")),
+        max_parallel_shipments=int(os.getenv("SHIPMENT_MAX_PARALLEL", "4")),
+    )
+    return None if config == WorkflowConfig() else config
+
+
+def activity_options(raw: str) -> dict[str, StepConfig]:
+    """Parse ACTIVITY_OPTIONS, rejecting keys StepConfig does not have."""
+    known = {f.name for f in fields(StepConfig)}
+    steps = {}
+    for name, options in json.loads(raw).items():
+        unknown = set(options) - known
+        if unknown:
+            raise ValueError(f"unknown ACTIVITY_OPTIONS keys for {name}: {sorted(unknown)}")
+        steps[name] = StepConfig.from_dict(options)
+    return steps
+
+
+def step_options(
+    step: StepConfig, schedule_to_close: timedelta, start_to_close: timedelta, retry_policy: RetryPolicy
+) -> tuple[timedelta, timedelta, RetryPolicy]:
+    """The workflow's timeouts and retry policy with `step`'s overrides applied."""
+    if step.start_to_close_seconds is not None:
+        start_to_close = timedelta(seconds=step.start_to_close_seconds)
+    if step.adaptive_start_to_close_seconds is not None:
+        start_to_close = min(start_to_close, timedelta(seconds=step.adaptive_start_to_close_seconds))
+    if step.schedule_to_close_seconds is not None:
+        schedule_to_close = timedelta(seconds=step.schedule_to_close_seconds)
+    # A longer attempt than the overall window could never finish
+    schedule_to_close = max(schedule_to_close, start_to_close)
+    overrides: dict[str, Any] = {}
+    if step.maximum_attempts is not None:
+        overrides["maximum_attempts"] = step.maximum_attempts
+    if step.initial_interval_seconds is not None:
+        overrides["initial_interval"] = timedelta(seconds=step.initial_interval_seconds)
+    if step.backoff_coefficient is not None:
+        overrides["backoff_coefficient"] = step.backoff_coefficient
+    return schedule_to_close, start_to_close, replace(retry_policy, **overrides) if overrides else retry_policy
+
+
+async def run_step(
+    config: Optional[WorkflowConfig],
+    activity: str,
+    *args: Any,
+    task_queue: str,
+    schedule_to_close_timeout: timedelta,
+    start_to_close_timeout: timedelta,
+    retry_policy: RetryPolicy,
+    result_type: Optional[type] = None,
+) -> Any:
+    """Execute `activity` locally when `config` says so, falling back to a regular activity on timeout.
+
+    A regular activity is hedged when its step has `hedge_after_seconds`. Called from workflow code only.
+    """
+    step = config.step(activity) if config is not None else StepConfig()
+    schedule_to_close_timeout, start_to_close_timeout, retry_policy = step_options(
+        step, schedule_to_close_timeout, start_to_close_timeout, retry_policy
+    )
+    if step.local:
+        budget = timedelta(seconds=step.local_max_seconds)
+        try:
+            return await workflow.execute_local_activity(
+                activity,
+                args=list(args),
+                schedule_to_close_timeout=min(schedule_to_close_timeout, budget),
+                start_to_close_timeout=min(start_to_close_timeout, budget),
+                retry_policy=retry_policy,
+                result_type=result_type,
+            )
+        except ActivityError as err:
+            if not isinstance(err.cause, TimeoutError):
+                raise
+            workflow.logger.warning("Local activity %s exceeded %s, running it as a regular activity", activity, budget)
+
+    hedge = step.hedge_after_seconds is not None and not step.local
+    # Hedgeable activities take a trailing `hedged` flag and only claim their step when it is set
+    activity_args = [*args, True] if hedge else list(args)
+
+    def start() -> workflow.ActivityHandle:
+        return workflow.start_activity(
+            activity,
+            args=activity_args,
+            task_queue=task_queue,
+            schedule_to_close_timeout=schedule_to_close_timeout,
+            start_to_close_timeout=start_to_close_timeout,
+            retry_policy=retry_policy,
+            result_type=result_type,
+        )
+
+    if not hedge:
+        return await start()
+    return await hedged(activity, start, timedelta(seconds=step.hedge_after_seconds))
+
+
+async def hedged(activity: str, start: Callable[[], workflow.ActivityHandle], hedge_after: timedelta) -> Any:
+    """Run `start()`, starting it again if the first has not finished after `hedge_after`; the first success wins."""
+    primary = start()
+    await workflow.wait([primary], timeout=hedge_after)
+    if primary.done():
+        return primary.result()
+    hedge = start()
+    hedges = workflow.metric_meter().create_counter(
+        "trellis_activity_hedges", "Hedged activity attempts by which one finished first"
+    )
+    pending = {primary, hedge}
+    while True:
+        done, pending = await workflow.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        # In a fixed order, not set order, so a replay picks the same winner when both finish together
+        for handle in (h for h in (primary, hedge) if h in done):
+            if handle.exception() is None:
+                loser = hedge if handle is primary else primary
+                loser.cancel()
+                try:
+                    # Retrieve the loser's outcome so its cancellation or failure is not left unobserved
+                    await loser
+                except (asyncio.CancelledError, ActivityError):
+                    pass
+                hedges.add(1, {"activity": activity, "outcome": "primary_won" if handle is primary else "hedge_won"})
+                return handle.result()
+        if not pending:
+            hedges.add(1, {"activity": activity, "outcome": "both_failed"})
+            # Raise the failure the primary alone would have raised
+            return primary.result()
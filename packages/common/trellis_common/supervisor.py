@@ -0,0 +1,267 @@
+"""Run several worker processes per task queue and keep them alive.
+
+    python -m trellis_common.supervisor order shipping
+
+A single worker process replays workflows on one event loop, so workflow-task
+CPU is bound to one core. The supervisor starts `<SERVICE>_WORKER_PROCESSES`
+(falling back to `WORKER_PROCESSES`, then the CPU count) copies of each
+service's worker, each with its own Temporal client and DB pool. Crashed
+children are restarted with exponential backoff. SIGTERM/SIGINT is forwarded
+so every child drains, and children still running after
+SUPERVISOR_STOP_TIMEOUT seconds are killed.
+
+When METRICS_PORT is set, children get their own ports from
+SUPERVISOR_CHILD_PORT_BASE and the supervisor serves, on METRICS_PORT,
+/health (per-child state; 503 while any child is down) and /metrics (every
+child's metrics with a `worker` label added).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Mapping, Optional
+from urllib.request import urlopen
+
+import structlog
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Metric, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.parser import text_string_to_metric_families
+
+from .lifecycle import shutdown_event
+
+
+logger = structlog.get_logger()
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+
+SERVICES = {
+    "order": REPO_ROOT / "services" / "order_worker" / "worker.py",
+    "shipping": REPO_ROOT / "services" / "shipping_worker" / "worker.py",
+}
+
+
+@dataclass
+class Child:
+    service: str
+    index: int
+    argv: list[str]
+    env: dict[str, str]
+    metrics_ports: tuple[int, ...] = ()
+    process: Optional[asyncio.subprocess.Process] = None
+    restarts: int = 0
+    started_at: float = 0.0
+    last_exit: Optional[int] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.service}-{self.index}"
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    def send(self, sig: int) -> None:
+        if self.alive:
+            try:
+                self.process.send_signal(sig)
+            except ProcessLookupError:
+                pass
+
+
+def process_count(service: str, env: Mapping[str, str] = os.environ) -> int:
+    service = service.upper()
+    raw = env.get(f"{service}_WORKER_PROCESSES", env.get("WORKER_PROCESSES"))
+    return int(raw) if raw else os.cpu_count() or 1
+
+
+def build_children(
+    services: Iterable[str], env: Mapping[str, str] = os.environ, processes: Optional[int] = None
+) -> list[Child]:
+    """One Child per worker process, with metrics ports assigned when the supervisor serves metrics."""
+    serve_metrics = bool(env.get("METRICS_PORT"))
+    port = int(env.get("SUPERVISOR_CHILD_PORT_BASE", "9200"))
+    children: list[Child] = []
+    for service in services:
+        for index in range(processes or process_count(service, env)):
+            child_env = {k: v for k, v in env.items() if k not in ("METRICS_PORT", "TEMPORAL_METRICS_PORT")}
+            child_env["WORKER_PROCESS_INDEX"] = str(index)
+            ports: tuple[int, ...] = ()
+            if serve_metrics:
+                child_env["METRICS_PORT"] = str(port)
+                ports = (port,)
+                if env.get("TEMPORAL_METRICS_PORT"):
+                    child_env["TEMPORAL_METRICS_PORT"] = str(port + 1)
+                    ports += (port + 1,)
+                port += 2
+            children.append(Child(service, index, [sys.executable, str(SERVICES[service])], child_env, ports))
+    return children
+
+
+def merge_metrics(scrapes: Iterable[tuple[str, str]]) -> list[Metric]:
+    """Merge (worker, exposition text) pairs into one family per metric, labelled by worker."""
+    families: dict[str, Metric] = {}
+    for worker, text in scrapes:
+        for family in text_string_to_metric_families(text):
+            merged = families.get(family.name)
+            if merged is None:
+                merged = families[family.name] = Metric(family.name, family.documentation, family.type, family.unit)
+            for sample in family.samples:
+                merged.add_sample(sample.name, {**sample.labels, "worker": worker}, sample.value, sample.timestamp)
+    return list(families.values())
+
+
+class _ChildrenCollector:
+    def __init__(self, supervisor: "Supervisor", timeout: float = 2.0) -> None:
+        self.supervisor = supervisor
+        self.timeout = timeout
+
+    def describe(self) -> list:
+        return []
+
+    def collect(self) -> Iterator[Metric]:
+        up = GaugeMetricFamily("trellis_worker_up", "Whether the worker process is running", labels=["worker"])
+        restarts = CounterMetricFamily("trellis_worker_restarts", "Worker process restarts", labels=["worker"])
+        scrapes: list[tuple[str, str]] = []
+        for child in self.supervisor.children:
+            up.add_metric([child.name], 1 if child.alive else 0)
+            restarts.add_metric([child.name], child.restarts)
+            for port in child.metrics_ports if child.alive else ():
+                try:
+                    with urlopen(f"http://127.0.0.1:{port}/metrics", timeout=self.timeout) as resp:
+                        scrapes.append((child.name, resp.read().decode()))
+                except OSError:
+                    # Still starting or shutting down; it shows up as missing series, and in /health
+                    continue
+        yield up
+        yield restarts
+        yield from merge_metrics(scrapes)
+
+
+class Supervisor:
+    def __init__(
+        self,
+        children: list[Child],
+        backoff_initial: float = 1.0,
+        backoff_max: float = 30.0,
+        stable_after: float = 60.0,
+        stop_timeout: float = 60.0,
+    ) -> None:
+        self.children = children
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        # A child that ran this long before exiting restarts without accumulated backoff
+        self.stable_after = stable_after
+        self.stop_timeout = stop_timeout
+        self.registry = CollectorRegistry(auto_describe=False)
+        self.registry.register(_ChildrenCollector(self))
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """Keep every child running until `stop` is set, then drain them."""
+        tasks = [asyncio.create_task(self._keep_alive(child, stop), name=child.name) for child in self.children]
+        await stop.wait()
+        for child in self.children:
+            child.send(signal.SIGTERM)
+        _, pending = await asyncio.wait(tasks, timeout=self.stop_timeout)
+        if pending:
+            logger.warning("supervisor.kill", children=sorted(t.get_name() for t in pending))
+            for child in self.children:
+                child.send(signal.SIGKILL if hasattr(signal, "SIGKILL") else signal.SIGTERM)
+            await asyncio.wait(pending)
+
+    async def _keep_alive(self, child: Child, stop: asyncio.Event) -> None:
+        delay = self.backoff_initial
+        while not stop.is_set():
+            child.process = await asyncio.create_subprocess_exec(*child.argv, env=child.env)
+            child.started_at = time.monotonic()
+            if stop.is_set():
+                # Stop arrived while spawning, after the SIGTERM fan-out
+                child.send(signal.SIGTERM)
+            logger.info("supervisor.child.started", child=child.name, pid=child.process.pid)
+            child.last_exit = await child.process.wait()
+            if stop.is_set():
+                logger.info("supervisor.child.stopped", child=child.name, code=child.last_exit)
+                return
+            if time.monotonic() - child.started_at >= self.stable_after:
+                delay = self.backoff_initial
+            child.restarts += 1
+            logger.warning("supervisor.child.exited", child=child.name, code=child.last_exit, restart_in=delay)
+            try:
+                await asyncio.wait_for(stop.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, self.backoff_max)
+
+    def health(self) -> dict:
+        now = time.monotonic()
+        children = [
+            {
+                "worker": child.name,
+                "pid": child.process.pid if child.process else None,
+                "alive": child.alive,
+                "restarts": child.restarts,
+                "uptime_s": round(now - child.started_at, 1) if child.alive else 0.0,
+                "last_exit": child.last_exit,
+            }
+            for child in self.children
+        ]
+        return {"status": "ok" if all(c["alive"] for c in children) else "degraded", "children": children}
+
+    async def serve(self, port: int) -> asyncio.AbstractServer:
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            try:
+                parts = (await reader.readline()).split()
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                path = parts[1].decode() if len(parts) > 1 else "/"
+                if path.startswith("/health"):
+                    health = self.health()
+                    status = "200 OK" if health["status"] == "ok" else "503 Service Unavailable"
+                    body, content_type = json.dumps(health).encode(), "application/json"
+                elif path.startswith("/metrics"):
+                    # Scraping children is blocking I/O; keep it off the loop that watches them
+                    body = await asyncio.to_thread(generate_latest, self.registry)
+                    status, content_type = "200 OK", CONTENT_TYPE_LATEST
+                else:
+                    status, body, content_type = "404 Not Found", b"", "text/plain"
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                    f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+            finally:
+                writer.close()
+
+        return await asyncio.start_server(handle, "0.0.0.0", port)
+
+
+async def main(argv: list[str]) -> None:
+    p = argparse.ArgumentParser(description="Run and supervise worker processes")
+    p.add_argument("services", nargs="+", choices=sorted(SERVICES))
+    p.add_argument("--processes", type=int, default=None, help="processes per service (default: env, then CPU count)")
+    args = p.parse_args(argv)
+
+    supervisor = Supervisor(
+        build_children(args.services, processes=args.processes),
+        stop_timeout=float(os.getenv("SUPERVISOR_STOP_TIMEOUT", "60")),
+    )
+    stop = shutdown_event()
+    port = os.getenv("METRICS_PORT")
+    server = await supervisor.serve(int(port)) if port else None
+    logger.info("supervisor.started", workers=[c.name for c in supervisor.children], port=port)
+    try:
+        await supervisor.run(stop)
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+    logger.info("supervisor.stopped")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from trellis_common import admission as adm
+from trellis_common.admission import Admission, AdmissionConfig, QueueSample, TokenBucket, combine, overloaded
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_bucket_allows_burst_then_reports_wait_until_refill():
+    clock = Clock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock)
+    assert [bucket.take() for _ in range(3)] == [0, 0, 0]
+    assert bucket.take() == pytest.approx(0.5)
+    clock.now = 0.5
+    assert bucket.take() == 0
+
+
+def test_zero_rate_is_unlimited():
+    bucket = TokenBucket(rate=0, burst=1)
+    assert all(bucket.take() == 0 for _ in range(100))
+
+
+def test_activity_backlog_counts_as_much_as_workflow_backlog():
+    workflow = [QueueSample(3, 0.5), QueueSample(4, 1.0)]
+    activity = [QueueSample(40, 2.0), QueueSample(60, 0.1)]
+    assert combine([workflow, activity]) == QueueSample(100, 2.0)
+    assert combine([workflow, [QueueSample(0, 0.0)]]) == QueueSample(7, 1.0)
+
+
+def test_overload_thresholds():
+    cfg = AdmissionConfig(max_backlog=100, max_schedule_to_start=2.0)
+    assert not overloaded(None, cfg)
+    assert not overloaded(QueueSample(100, 2.0), cfg)
+    assert overloaded(QueueSample(101, 0.0), cfg)
+    assert overloaded(QueueSample(0, 2.5), cfg)
+    assert not overloaded(QueueSample(10_000, 60.0), AdmissionConfig())
+
+
+def test_overloaded_queue_defers_until_next_sample():
+    admission = Admission(AdmissionConfig(max_backlog=10, sample_interval=3.0))
+    assert admission.check() == 0
+    admission.sample = QueueSample(11, 0.0)
+    assert admission.check() == 3.0
+    assert admission.retry_after(0.2) == "1"
+
+
+def test_config_from_env(monkeypatch):
+    monkeypatch.setenv("ADMISSION_RATE", "50")
+    monkeypatch.setenv("ADMISSION_OVERLOAD", "defer")
+    cfg = AdmissionConfig.from_env()
+    assert (cfg.rate, cfg.overload, cfg.samples_queue) == (50.0, "defer", False)
+    monkeypatch.setenv("ADMISSION_OVERLOAD", "drop")
+    with pytest.raises(ValueError):
+        AdmissionConfig.from_env()
+
+
+@pytest.mark.asyncio
+async def test_drain_deletes_only_started_orders(monkeypatch):
+    deleted = []
+
+    async def claim(limit, lease):
+        return [("o-1", "p-1", None), ("o-2", "p-2", "acme")]
+
+    async def delete(order_ids):
+        deleted.extend(order_ids)
+        raise asyncio.CancelledError
+
+    async def start(order_id, payment_id, tenant):
+        if order_id == "o-2":
+            raise RuntimeError("unavailable")
+
+    monkeypatch.setattr(adm.db, "claim_pending_starts", claim)
+    monkeypatch.setattr(adm.db, "delete_pending_starts", delete)
+    with pytest.raises(asyncio.CancelledError):
+        await adm.drain_pending_starts(Admission(AdmissionConfig()), start)
+    assert deleted == ["o-1"]
@@ -0,0 +1,42 @@
+import pytest
+from temporalio.converter import DataConverter, ExternalStorage
+
+from trellis_common.claim_check import FilesystemBlobDriver
+from trellis_common.models import Order, OrderItem
+from trellis_common.serialization import PayloadConverter
+
+
+def converter(driver: FilesystemBlobDriver) -> DataConverter:
+    return DataConverter(
+        payload_converter_class=PayloadConverter,
+        external_storage=ExternalStorage(drivers=[driver], payload_size_threshold=1024),
+    )
+
+
+BIG = Order(order_id="o-1", items=[OrderItem(sku=f"SKU-{i:05d}") for i in range(100)])
+
+
+@pytest.mark.asyncio
+async def test_large_payloads_become_one_shared_reference(tmp_path):
+    driver = FilesystemBlobDriver(tmp_path)
+    dc = converter(driver)
+    small, first, second = await dc.encode(["o-1", BIG, BIG])
+    assert small.data == b'"o-1"'
+    # Both references point at the single stored blob
+    assert first == second and first.ByteSize() < 512
+    assert len(list(tmp_path.rglob("*"))) == 2  # one fan-out directory, one blob
+    assert await dc.decode([small, first], [str, Order]) == ["o-1", BIG]
+
+
+@pytest.mark.asyncio
+async def test_resolved_blobs_are_cached_per_process(tmp_path):
+    stored = await converter(FilesystemBlobDriver(tmp_path)).encode([BIG])
+    reader = FilesystemBlobDriver(tmp_path)
+    dc = converter(reader)
+    assert await dc.decode(stored, [Order]) == [BIG]
+    for path in tmp_path.rglob("*"):
+        if path.is_file():
+            path.unlink()
+    assert await dc.decode(stored, [Order]) == [BIG]
+    with pytest.raises(Exception, match="not found"):
+        await converter(FilesystemBlobDriver(tmp_path)).decode(stored, [Order])
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from trellis_common.event_sink import EventSink
+
+
+class RecordingWriter:
+    def __init__(self, fail_times: int = 0) -> None:
+        self.batches: list[list[tuple]] = []
+        self.fail_times = fail_times
+
+    async def __call__(self, rows) -> None:
+        if self.fail_times:
+            self.fail_times -= 1
+            raise RuntimeError("db unavailable")
+        self.batches.append(list(rows))
+
+
+@pytest.mark.asyncio
+async def test_flushes_full_batches_by_size():
+    writer = RecordingWriter()
+    sink = EventSink(writer, batch_size=3, flush_interval=60)
+    sink.start()
+    for i in range(6):
+        await sink.put((i,))
+    await asyncio.sleep(0.05)
+    assert writer.batches == [[(0,), (1,), (2,)], [(3,), (4,), (5,)]]
+    await sink.stop()
+
+
+@pytest.mark.asyncio
+async def test_flushes_partial_batch_after_interval():
+    writer = RecordingWriter()
+    sink = EventSink(writer, batch_size=100, flush_interval=0.05)
+    sink.start()
+    await sink.put((1,))
+    await asyncio.sleep(0.2)
+    assert writer.batches == [[(1,)]]
+    await sink.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_everything_queued():
+    writer = RecordingWriter()
+    sink = EventSink(writer, batch_size=2, flush_interval=60)
+    sink.start()
+    for i in range(5):
+        await sink.put((i,))
+    await sink.stop()
+    assert [row for batch in writer.batches for row in batch] == [(i,) for i in range(5)]
+    assert sink.flushed == 5
+    assert not sink.running
+
+
+@pytest.mark.asyncio
+async def test_put_blocks_when_queue_is_full():
+    writer = RecordingWriter()
+    sink = EventSink(writer, batch_size=10, max_queue=2)
+    await sink.put((1,))
+    await sink.put((2,))
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(sink.put((3,)), 0.05)
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_is_retried():
+    writer = RecordingWriter(fail_times=2)
+    sink = EventSink(writer, batch_size=1, flush_interval=0.01, retry_delay=0.01)
+    sink.start()
+    await sink.put((1,))
+    await sink.stop()
+    assert writer.batches == [[(1,)]]
@@ -0,0 +1,77 @@
+from dataclasses import replace
+
+import pytest
+from temporalio.testing import ActivityEnvironment
+
+from trellis_common.faults import PROFILES, FaultInjector, FaultProfile, parse_latency, sample_latency
+
+
+async def outcome(injector: FaultInjector, step: str, key: str) -> str:
+    try:
+        await injector.inject(step, key)
+    except RuntimeError:
+        return "failure"
+    return "ok"
+
+
+@pytest.mark.asyncio
+async def test_seeded_profile_is_reproducible_per_order():
+    profile = FaultProfile(failure_rate=0.5, seeded=True)
+    first = [await outcome(FaultInjector(profile, seed=7), "order_received", f"o-{i}") for i in range(50)]
+    second = [await outcome(FaultInjector(profile, seed=7), "order_received", f"o-{i}") for i in range(50)]
+    other_seed = [await outcome(FaultInjector(profile, seed=8), "order_received", f"o-{i}") for i in range(50)]
+    assert first == second
+    assert first != other_seed
+    assert {"ok", "failure"} == set(first)
+
+
+@pytest.mark.asyncio
+async def test_seeded_draws_differ_per_activity_id():
+    injector = FaultInjector(FaultProfile(failure_rate=0.5, seeded=True), seed=7)
+    env = ActivityEnvironment()
+
+    async def draws(activity_id: str) -> list[str]:
+        env.info = replace(env.info, activity_id=activity_id)
+        return [await env.run(outcome, injector, "order_received", f"o-{i}") for i in range(50)]
+
+    primary = await draws("1")
+    assert await draws("1") == primary
+    # A hedge runs as another activity with the same attempt number
+    assert await draws("2") != primary
+
+
+@pytest.mark.asyncio
+async def test_step_overrides_and_counters():
+    injector = FaultInjector(
+        FaultProfile(failure_rate=1.0),
+        steps={"payment_charged": PROFILES["off"]},
+    )
+    assert await outcome(injector, "order_received", "o-1") == "failure"
+    assert await outcome(injector, "payment_charged", "o-1") == "ok"
+    assert injector.counts[("order_received", "failure")] == 1
+    assert injector.counts[("payment_charged", "call")] == 1
+    assert injector.counts[("payment_charged", "failure")] == 0
+
+
+def test_from_env_reads_profile_and_overrides(monkeypatch):
+    monkeypatch.setenv("FAULT_PROFILE", "seeded-chaos")
+    monkeypatch.setenv("FAULT_HANG_SECONDS", "2")
+    monkeypatch.setenv("FAULT_OVERRIDES", '{"carrier_dispatched": {"profile": "latency", "latency_ms": "p50=5,max=10"}}')
+    injector = FaultInjector.from_env()
+    assert injector.default.hang_seconds == 2
+    assert injector.default.seeded
+    assert injector.profile_for("carrier_dispatched").latency_ms == {0.5: 5.0, 1.0: 10.0}
+
+
+def test_from_env_rejects_unknown_profile(monkeypatch):
+    monkeypatch.setenv("FAULT_PROFILE", "nope")
+    with pytest.raises(ValueError):
+        FaultInjector.from_env()
+
+
+def test_latency_sampling_follows_quantiles():
+    points = parse_latency("p50=20,p99=400,max=1000")
+    assert sample_latency(points, 0.25) == pytest.approx(10)
+    assert sample_latency(points, 0.5) == pytest.approx(20)
+    assert sample_latency(points, 0.99) == pytest.approx(400)
+    assert sample_latency(points, 1.0) == pytest.approx(1000)
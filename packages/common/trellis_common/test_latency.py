@@ -0,0 +1,38 @@
+from trellis_common.latency import LatencyStats, LatencyWindow, TimeoutBounds, adapt_config
+from trellis_common.models import StepConfig, WorkflowConfig
+
+
+def test_window_keeps_recent_samples_per_activity():
+    window = LatencyWindow(size=100)
+    for i in range(200):
+        window.record("ChargePayment", i / 1000)
+    stats = window.stats()["ChargePayment"]
+    assert stats.samples == 100
+    assert (stats.p50, stats.p99) == (0.15, 0.199)
+
+
+def test_adapted_timeouts_need_enough_samples_and_respect_the_floor():
+    bounds = TimeoutBounds(multiplier=2.0, min_seconds=0.5, min_samples=50)
+    stats = {
+        "ValidateOrder": LatencyStats(0.05, 0.1, 0.4, 500),
+        "ReceiveOrder": LatencyStats(0.01, 0.02, 0.05, 500),
+        "PreparePackage": LatencyStats(0.01, 0.02, 0.05, 10),
+    }
+    base = WorkflowConfig(steps={"ValidateOrder": StepConfig(local=True)})
+    config = adapt_config(base, stats, bounds)
+    assert config.step("ValidateOrder") == StepConfig(local=True, adaptive_start_to_close_seconds=0.8)
+    assert config.step("ReceiveOrder").adaptive_start_to_close_seconds == 0.5
+    assert config.step("PreparePackage") == StepConfig()
+    assert adapt_config(None, {}, bounds) is None
+
+
+def test_hedge_delay_follows_p95_only_for_hedged_steps():
+    bounds = TimeoutBounds(min_samples=50, hedge_min_seconds=0.05)
+    stats = {"ReceiveOrder": LatencyStats(0.01, 0.3, 0.4, 500), "ValidateOrder": LatencyStats(0.01, 0.02, 0.04, 500)}
+    base = WorkflowConfig(
+        steps={"ReceiveOrder": StepConfig(hedge_after_seconds=1.0), "ValidateOrder": StepConfig(hedge_after_seconds=1.0)}
+    )
+    config = adapt_config(base, stats, bounds)
+    assert config.step("ReceiveOrder").hedge_after_seconds == 0.3
+    assert config.step("ValidateOrder").hedge_after_seconds == 0.05
+    assert adapt_config(None, stats, bounds).step("ReceiveOrder").hedge_after_seconds is None
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from trellis_common.partitions import Partition, next_period, overlaps, parse_bound, partition_name, upcoming_periods
+
+
+def utc(*args: int) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_upcoming_monthly_periods_roll_over_the_year():
+    periods = upcoming_periods(utc(2026, 11, 17, 8), "month", ahead=2)
+    assert periods == [
+        (utc(2026, 11, 1), utc(2026, 12, 1)),
+        (utc(2026, 12, 1), utc(2027, 1, 1)),
+        (utc(2027, 1, 1), utc(2027, 2, 1)),
+    ]
+    assert partition_name(periods[-1][0]) == "events_p20270101"
+
+
+def test_daily_periods_are_utc_days():
+    now = datetime(2026, 3, 1, 1, 30, tzinfo=timezone(timedelta(hours=5)))
+    assert upcoming_periods(now, "day", ahead=0) == [(utc(2026, 2, 28), utc(2026, 3, 1))]
+    assert next_period(utc(2026, 2, 28), "day") == utc(2026, 3, 1)
+
+
+def test_parse_bound():
+    assert parse_bound("events_p20261101", "FOR VALUES FROM ('2026-11-01 00:00:00+00') TO ('2026-12-01 00:00:00+00')") == Partition(
+        "events_p20261101", utc(2026, 11, 1), utc(2026, 12, 1)
+    )
+    assert parse_bound("legacy", "FOR VALUES FROM (MINVALUE) TO ('2026-11-01 00:00:00+00')") == Partition("legacy", None, utc(2026, 11, 1))
+    assert parse_bound("events_default", "DEFAULT").default
+    with pytest.raises(ValueError):
+        parse_bound("odd", "FOR VALUES IN (1)")
+
+
+def test_overlaps_skips_periods_already_covered():
+    legacy = Partition("legacy", None, utc(2026, 11, 1))
+    assert overlaps(legacy, utc(2026, 10, 1), utc(2026, 11, 1))
+    assert not overlaps(legacy, utc(2026, 11, 1), utc(2026, 12, 1))
+    assert not overlaps(Partition("events_default", None, None, default=True), utc(2026, 11, 1), utc(2026, 12, 1))
@@ -0,0 +1,44 @@
+import pytest
+from temporalio.converter import DataConverter
+
+from trellis_common.models import Address, Order, OrderItem
+from trellis_common.serialization import CompressionCodec, PayloadConverter, dumps
+
+
+ORDER = Order(order_id="o-1", items=[OrderItem(sku="ABC", qty=2)], address=Address(city="SF"))
+
+
+@pytest.mark.asyncio
+async def test_dict_payloads_match_the_sdk_default():
+    fast = DataConverter(payload_converter_class=PayloadConverter)
+    values = [{"b": 1, "a": [1, 2]}, "x", None, b"raw", {3}]
+    for ours, sdk in zip(await fast.encode(values), await DataConverter.default.encode(values)):
+        assert ours == sdk
+
+
+@pytest.mark.asyncio
+async def test_models_round_trip_and_old_dict_payloads_decode():
+    fast = DataConverter(payload_converter_class=PayloadConverter)
+    assert await fast.decode(await fast.encode([ORDER]), [Order]) == [ORDER]
+    # What histories recorded before the models hold
+    legacy = await DataConverter.default.encode([{"order_id": "o-1", "items": [{"sku": "ABC", "qty": 2}], "address": {"city": "SF", "zip": "x"}}])
+    assert await fast.decode(legacy, [Order]) == [ORDER]
+
+
+@pytest.mark.asyncio
+async def test_compression_only_above_threshold():
+    codec = CompressionCodec("zlib", min_bytes=256)
+    fast = DataConverter(payload_converter_class=PayloadConverter, payload_codec=codec)
+    big = Order(order_id="o-2", items=[OrderItem(sku=f"SKU-{i}") for i in range(50)])
+    small, large = await fast.encode([ORDER, big])
+    assert small.metadata["encoding"] == b"json/plain"
+    assert large.metadata["encoding"] == b"binary/zlib"
+    assert len(large.data) < len(dumps(big))
+    assert await fast.decode([small, large], [Order, Order]) == [ORDER, big]
+
+
+def test_address_parse_rejects_fields_it_would_drop():
+    assert Address.parse({"city": "SF", "postal_code": "94107"}) == Address(city="SF", postal_code="94107")
+    for bad in ({"city": "SF", "zip": "94107"}, {"line2": "Apt 4"}, {"city": 5}, ["SF"]):
+        with pytest.raises(ValueError):
+            Address.parse(bad)
@@ -0,0 +1,36 @@
+from trellis_common.sharding import parse_shards, queue_shard, route, shard_for, sibling_queue, worker_queues
+
+
+def test_single_shard_keeps_plain_queue_names(monkeypatch):
+    monkeypatch.delenv("TASK_QUEUE_SHARDS", raising=False)
+    assert route("o-1") == "order-tq"
+    assert worker_queues("ORDER", "order-tq") == ["order-tq"]
+    assert sibling_queue("order-tq", "shipping-tq") == "shipping-tq"
+
+
+def test_routing_is_stable_and_follows_tenant_pins(monkeypatch):
+    monkeypatch.setenv("TASK_QUEUE_SHARDS", "8")
+    monkeypatch.setenv("SHARD_PINS", '{"acme": 5}')
+    assert route("o-1") == route("o-1") == f"order-tq-shard-{shard_for('o-1', 8)}"
+    assert route("o-1", tenant="acme") == "order-tq-shard-5"
+    assert route("o-2", tenant="other") == route("o-3", tenant="other")
+
+
+def test_children_and_activities_stay_on_the_parent_shard():
+    assert queue_shard("order-tq-shard-3") == 3
+    assert queue_shard("order-tq") is None
+    assert sibling_queue("order-tq-shard-3", "shipping-tq") == "shipping-tq-shard-3"
+
+
+def test_worker_shard_selection(monkeypatch):
+    monkeypatch.setenv("TASK_QUEUE_SHARDS", "4")
+    assert worker_queues("SHIPPING", "shipping-tq") == ["shipping-tq"] + [f"shipping-tq-shard-{i}" for i in range(4)]
+    monkeypatch.setenv("SHIPPING_TASK_QUEUE_SHARDS", "0-1,5")
+    assert worker_queues("SHIPPING", "shipping-tq") == [
+        "shipping-tq",
+        "shipping-tq-shard-0",
+        "shipping-tq-shard-1",
+        "shipping-tq-shard-5",
+    ]
+    assert parse_shards("all", 2) == [0, 1]
+
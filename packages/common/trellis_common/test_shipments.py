@@ -0,0 +1,23 @@
+from trellis_common.models import Address, Order, OrderItem
+from trellis_common.shipments import shipment_groups, shipment_order
+
+
+def test_items_group_by_warehouse_in_first_seen_order():
+    items = [OrderItem("A", warehouse="east"), OrderItem("B"), OrderItem("C", warehouse="east")]
+    groups = shipment_groups(items)
+    assert [(g.group_id, [i.sku for i in g.items]) for g in groups] == [("east-1", ["A", "C"]), ("default-1", ["B"])]
+
+
+def test_chunking_splits_each_warehouse():
+    items = [OrderItem(f"S{i}", warehouse="w") for i in range(5)]
+    assert [len(g.items) for g in shipment_groups(items, chunk_size=2)] == [2, 2, 1]
+    assert [g.group_id for g in shipment_groups(items, chunk_size=2)] == ["w-1", "w-2", "w-3"]
+
+
+def test_empty_order_still_ships_once():
+    assert [g.group_id for g in shipment_groups([])] == ["default-1"]
+
+
+def test_shipment_order_keeps_address():
+    order = Order("o-1", items=[OrderItem("A"), OrderItem("B")], address=Address(city="Oslo"))
+    assert shipment_order(order, order.items[:1]) == Order("o-1", items=[OrderItem("A")], address=Address(city="Oslo"))
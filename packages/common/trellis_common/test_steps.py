@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+import pytest
+from temporalio.common import RetryPolicy
+
+from trellis_common.models import StepConfig, WorkflowConfig
+from trellis_common.steps import step_options, workflow_config
+
+
+def test_workflow_config_from_env(monkeypatch):
+    monkeypatch.delenv("LOCAL_ACTIVITY_STEPS", raising=False)
+    assert workflow_config() is None
+    monkeypatch.setenv("LOCAL_ACTIVITY_STEPS", "ValidateOrder, PreparePackage,")
+    monkeypatch.setenv("LOCAL_ACTIVITY_MAX_SECONDS", "1.5")
+    config = workflow_config()
+    assert config.step("ValidateOrder") == StepConfig(local=True, local_max_seconds=1.5)
+    assert config.step("ChargePayment") == StepConfig()
+    decoded = WorkflowConfig.from_dict({"steps": {"PreparePackage": {"local": True, "local_max_seconds": 1.5}}})
+    assert decoded.step("PreparePackage") == config.step("PreparePackage")
+
+
+def test_activity_options_override_timeouts_and_retries(monkeypatch):
+    monkeypatch.setenv("ACTIVITY_OPTIONS", '{"ChargePayment": {"start_to_close_seconds": 1, "maximum_attempts": 3}}')
+    monkeypatch.setenv("LOCAL_ACTIVITY_STEPS", "ChargePayment")
+    step = workflow_config().step("ChargePayment")
+    assert (step.local, step.start_to_close_seconds, step.maximum_attempts) == (True, 1, 3)
+    monkeypatch.setenv("ACTIVITY_OPTIONS", '{"ChargePayment": {"start_to_close": 1}}')
+    with pytest.raises(ValueError):
+        workflow_config()
+
+
+def test_step_options_apply_overrides_and_adaptive_only_shortens():
+    policy = RetryPolicy(maximum_attempts=1)
+    five, three = timedelta(seconds=5), timedelta(seconds=3)
+    assert step_options(StepConfig(), five, five, policy) == (five, five, policy)
+    schedule, start, retry = step_options(StepConfig(start_to_close_seconds=1, maximum_attempts=3), five, five, policy)
+    assert (schedule, start, retry.maximum_attempts) == (five, timedelta(seconds=1), 3)
+    assert step_options(StepConfig(adaptive_start_to_close_seconds=0.8), three, three, policy)[1] == timedelta(seconds=0.8)
+    assert step_options(StepConfig(adaptive_start_to_close_seconds=9), three, three, policy)[:2] == (three, three)
+
+
+def test_hedge_steps_must_be_idempotent(monkeypatch):
+    monkeypatch.delenv("ACTIVITY_OPTIONS", raising=False)
+    monkeypatch.delenv("LOCAL_ACTIVITY_STEPS", raising=False)
+    monkeypatch.setenv("HEDGE_STEPS", "ReceiveOrder,PreparePackage")
+    monkeypatch.setenv("HEDGE_AFTER_SECONDS", "0.25")
+    config = workflow_config()
+    assert config.step("PreparePackage").hedge_after_seconds == 0.25
+    assert config.step("ValidateOrder").hedge_after_seconds is None
+    monkeypatch.setenv("HEDGE_STEPS", "DispatchCarrier")
+    with pytest.raises(ValueError):
+        workflow_config()
+    monkeypatch.delenv("HEDGE_STEPS")
+    monkeypatch.setenv("ACTIVITY_OPTIONS", '{"ChargePayment": {"hedge_after_seconds": 1}}')
+    with pytest.raises(ValueError):
+        workflow_config()
@@ -0,0 +1,64 @@
+import asyncio
+import sys
+
+import pytest
+
+from trellis_common.supervisor import Child, Supervisor, build_children, merge_metrics
+
+
+def python_child(code: str) -> Child:
+    return Child("test", 0, [sys.executable, "-c", code], {})
+
+
+async def wait_until(predicate, timeout: float = 5.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_restarts_crashed_children_with_backoff():
+    child = python_child("import sys; sys.exit(3)")
+    supervisor = Supervisor([child], backoff_initial=0.01, backoff_max=0.05)
+    stop = asyncio.Event()
+    run = asyncio.create_task(supervisor.run(stop))
+    await wait_until(lambda: child.restarts >= 2)
+    stop.set()
+    await run
+    assert child.last_exit == 3
+    assert supervisor.health()["status"] == "degraded"
+
+
+@pytest.mark.asyncio
+async def test_stop_forwards_sigterm_and_waits_for_children():
+    child = python_child("import time; time.sleep(30)")
+    supervisor = Supervisor([child], stop_timeout=5)
+    stop = asyncio.Event()
+    run = asyncio.create_task(supervisor.run(stop))
+    await wait_until(lambda: child.alive)
+    assert supervisor.health()["status"] == "ok"
+    stop.set()
+    await asyncio.wait_for(run, 5)
+    assert not child.alive
+    assert child.restarts == 0
+
+
+def test_build_children_assigns_processes_and_metrics_ports():
+    env = {"ORDER_WORKER_PROCESSES": "2", "WORKER_PROCESSES": "1", "METRICS_PORT": "9100", "TEMPORAL_METRICS_PORT": "9101"}
+    children = build_children(["order", "shipping"], env)
+    assert [c.name for c in children] == ["order-0", "order-1", "shipping-0"]
+    assert [c.metrics_ports for c in children] == [(9200, 9201), (9202, 9203), (9204, 9205)]
+    assert children[1].env["METRICS_PORT"] == "9202"
+    assert children[1].env["WORKER_PROCESS_INDEX"] == "1"
+
+    quiet = build_children(["order"], {"WORKER_PROCESSES": "1", "TEMPORAL_METRICS_PORT": "9101"})
+    assert quiet[0].metrics_ports == ()
+    assert "TEMPORAL_METRICS_PORT" not in quiet[0].env
+
+
+def test_merge_metrics_labels_samples_by_worker():
+    text = '# HELP jobs_total Jobs\n# TYPE jobs_total counter\njobs_total{queue="a"} 3.0\n'
+    (family,) = merge_metrics([("order-0", text), ("order-1", text.replace("3.0", "5.0"))])
+    assert family.type == "counter"
+    assert [(s.labels["worker"], s.value) for s in family.samples] == [("order-0", 3.0), ("order-1", 5.0)]
@@ -0,0 +1,24 @@
+import json
+
+from trellis_common import tracing
+
+
+def test_file_exporter_writes_nested_db_spans(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setenv("OTEL_TRACES_EXPORTER", "file")
+    monkeypatch.setenv("TRACE_FILE", str(path))
+    assert tracing.temporal_interceptors() == []
+    assert tracing.configure_tracing("test") is not None
+    try:
+        assert len(tracing.temporal_interceptors()) == 1
+        with tracing.tracer.start_as_current_span("activity"):
+            with tracing.db_span("get_order", "SELECT 1"):
+                pass
+    finally:
+        tracing.shutdown_tracing()
+
+    spans = {s["name"]: s for s in map(json.loads, path.read_text().splitlines())}
+    db_span = spans["db.get_order"]
+    assert db_span["attributes"]["db.query.text"] == "SELECT 1"
+    assert db_span["parent_id"] == spans["activity"]["context"]["span_id"]
+    assert db_span["resource"]["attributes"]["service.name"] == "test"
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from trellis_common.tuning import AdaptiveConfig, AdaptiveSlotSupplier, Sample, next_limit
+from trellis_common.worker_config import worker_options
+
+
+CFG = AdaptiveConfig(min_slots=4, max_slots=40, initial_slots=10, grow_step=5)
+
+
+def test_grows_when_saturated_and_healthy():
+    assert next_limit(10, Sample(saturation=0.9), CFG) == 15
+    assert next_limit(38, Sample(saturation=1.0), CFG) == 40
+
+
+def test_shrinks_on_db_wait_cpu_or_memory_pressure():
+    assert next_limit(20, Sample(saturation=1.0, pool_wait_ms=200), CFG) == 16
+    assert next_limit(20, Sample(saturation=1.0, cpu=0.95), CFG) == 16
+    assert next_limit(5, Sample(saturation=1.0, memory=0.95), CFG) == 4
+
+
+def test_drifts_down_when_idle_and_holds_in_between():
+    assert next_limit(10, Sample(saturation=0.1), CFG) == 9
+    assert next_limit(10, Sample(saturation=0.5), CFG) == 10
+
+
+class Ctx:
+    def __init__(self, permit=None) -> None:
+        self.permit = permit
+        self.slot_info = None
+
+
+@pytest.mark.asyncio
+async def test_reserve_blocks_at_limit_until_release():
+    supplier = AdaptiveSlotSupplier(AdaptiveConfig(min_slots=1, max_slots=4, initial_slots=1))
+    permit = await supplier.reserve_slot(Ctx())
+    supplier.mark_slot_used(Ctx(permit))
+    assert supplier.try_reserve_slot(Ctx()) is None
+    waiting = asyncio.create_task(supplier.reserve_slot(Ctx()))
+    await asyncio.sleep(0.01)
+    assert not waiting.done()
+    supplier.release_slot(Ctx(permit))
+    await asyncio.wait_for(waiting, 1)
+    assert supplier.reserved == 1 and supplier.used == 0
+
+
+@pytest.mark.asyncio
+async def test_raising_the_limit_wakes_waiters():
+    supplier = AdaptiveSlotSupplier(AdaptiveConfig(min_slots=1, max_slots=4, initial_slots=1, grow_step=1))
+    permit = await supplier.reserve_slot(Ctx())
+    supplier.mark_slot_used(Ctx(permit))
+    waiting = asyncio.create_task(supplier.reserve_slot(Ctx()))
+    await asyncio.sleep(0.01)
+    supplier.adjust()  # fully saturated, so the limit grows to 2
+    await asyncio.wait_for(waiting, 1)
+    assert supplier.limit == 2
+
+
+def test_worker_options_from_env(monkeypatch):
+    monkeypatch.setenv("WORKER_MAX_CONCURRENT_ACTIVITIES", "50")
+    monkeypatch.setenv("ORDER_WORKER_MAX_CONCURRENT_ACTIVITIES", "200")
+    monkeypatch.setenv("WORKER_MAX_CACHED_WORKFLOWS", "5000")
+    options, adaptive = worker_options("order")
+    assert options == {"max_concurrent_activities": 200, "max_cached_workflows": 5000}
+    assert adaptive is None
+
+    monkeypatch.setenv("ORDER_WORKER_TUNER", "adaptive")
+    monkeypatch.setenv("ORDER_WORKER_ADAPTIVE_MAX_SLOTS", "64")
+    options, adaptive = worker_options("order")
+    assert "max_concurrent_activities" not in options and "tuner" in options
+    assert adaptive is not None and adaptive.cfg.max_slots == 64
+
+
+def test_budgets_are_shared_across_shard_workers(monkeypatch):
+    monkeypatch.setenv("ORDER_WORKER_MAX_CONCURRENT_ACTIVITIES", "200")
+    monkeypatch.setenv("ORDER_WORKER_MAX_ACTIVITIES_PER_SECOND", "10")
+    monkeypatch.setenv("ORDER_WORKER_MAX_TASK_QUEUE_ACTIVITIES_PER_SECOND", "10")
+    assert worker_options("order", 1)[0]["max_concurrent_activities"] == 200
+    options, _ = worker_options("order", 4)
+    assert options["max_concurrent_activities"] == 50
+    assert options["max_cached_workflows"] == 250
+    assert options["max_activities_per_second"] == 2.5
+    # Enforced by the server per task queue, so not split
+    assert options["max_task_queue_activities_per_second"] == 10
+    # Never below what the SDK accepts
+    assert worker_options("order", 8)[0]["max_concurrent_workflow_task_polls"] == 2
+    monkeypatch.setenv("ORDER_WORKER_MAX_CACHED_WORKFLOWS", "0")
+    assert worker_options("order", 4)[0]["max_cached_workflows"] == 0
@@ -0,0 +1,86 @@
+"""OpenTelemetry tracing for the API, workers and DB layer.
+
+OTEL_TRACES_EXPORTER picks where spans go: `otlp` (OTLP/HTTP to
+OTEL_EXPORTER_OTLP_ENDPOINT, default http://localhost:4318), `file` (one JSON
+span per line appended to TRACE_FILE, default traces.jsonl), `console`, or
+`none` (default; nothing is recorded and Temporal headers are left alone).
+
+Temporal calls go through the SDK's TracingInterceptor, which carries the span
+context in workflow and activity headers, so the span opened for an HTTP
+request parents OrderWorkflow, its activities, the ShippingWorkflow child and
+the SQL they run.
+"""
+
+import os
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SpanExporter
+from temporalio.contrib.opentelemetry import TracingInterceptor
+
+
+tracer = trace.get_tracer("trellis")
+
+_provider: Optional[TracerProvider] = None
+
+
+def _exporter(kind: str) -> Optional[SpanExporter]:
+    if kind == "none":
+        return None
+    if kind == "otlp":
+        # Imported lazily so the file/console exporters work without the OTLP package
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter()
+    if kind == "file":
+        out = open(os.getenv("TRACE_FILE", "traces.jsonl"), "a", encoding="utf-8")
+        return ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    if kind == "console":
+        return ConsoleSpanExporter()
+    raise ValueError(f"unknown OTEL_TRACES_EXPORTER {kind!r}; use otlp, file, console or none")
+
+
+def configure_tracing(service: str) -> Optional[TracerProvider]:
+    """Install the global tracer provider for this process, if an exporter is configured."""
+    global _provider
+    if _provider is not None:
+        return _provider
+    exporter = _exporter(os.getenv("OTEL_TRACES_EXPORTER", "none"))
+    if exporter is None:
+        return None
+    provider = TracerProvider(resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", service)}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _provider = provider
+    return provider
+
+
+def shutdown_tracing() -> None:
+    """Flush pending spans; call once the process has stopped doing work."""
+    global _provider
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = None
+
+
+def temporal_interceptors() -> list[Any]:
+    """Client interceptors propagating trace context; they also apply to workers built on the client."""
+    return [TracingInterceptor()] if _provider is not None else []
+
+
+def _db_attributes(operation: str, statement: str) -> dict[str, str]:
+    return {"db.system": "postgresql", "db.operation.name": operation, "db.query.text": statement}
+
+
+@contextmanager
+def db_span(operation: str, statement: str) -> Iterator[None]:
+    with tracer.start_as_current_span(f"db.{operation}", kind=trace.SpanKind.CLIENT, attributes=_db_attributes(operation, statement)):
+        yield
+
+
+def start_db_span(operation: str, statement: str) -> trace.Span:
+    """A DB span that is not made current, for generators that yield while it is open; call end()."""
+    return tracer.start_span(f"db.{operation}", kind=trace.SpanKind.CLIENT, attributes=_db_attributes(operation, statement))
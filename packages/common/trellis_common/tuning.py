@@ -0,0 +1,197 @@
+"""Adaptive activity slot supplier for Temporal workers.
+
+The supplier hands out up to `limit` activity slots. A controller task samples
+slot saturation, DB pool wait time and process CPU/memory every `interval`
+seconds and moves `limit` between `min_slots` and `max_slots`: it grows while
+the slots are busy and the database and host have headroom, and shrinks as
+soon as any of them is over its target.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import structlog
+from temporalio.worker import (
+    CustomSlotSupplier,
+    SlotMarkUsedContext,
+    SlotPermit,
+    SlotReleaseContext,
+    SlotReserveContext,
+)
+
+
+logger = structlog.get_logger()
+
+
+@dataclass(frozen=True)
+class AdaptiveConfig:
+    min_slots: int = 10
+    max_slots: int = 500
+    initial_slots: int = 50
+    interval: float = 5.0
+    grow_step: int = 10
+    # Shrink by this fraction when a resource is over target
+    shrink_factor: float = 0.8
+    # Grow when at least this fraction of slots are running activities
+    high_saturation: float = 0.8
+    low_saturation: float = 0.3
+    max_pool_wait_ms: float = 50.0
+    target_cpu: float = 0.8
+    target_memory: float = 0.8
+
+
+@dataclass(frozen=True)
+class Sample:
+    saturation: float
+    pool_wait_ms: float = 0.0
+    cpu: float = 0.0
+    memory: float = 0.0
+
+
+def next_limit(limit: int, sample: Sample, cfg: AdaptiveConfig) -> int:
+    """One controller step: back off on DB/CPU/memory pressure, grow on saturation, drift down when idle."""
+    if sample.pool_wait_ms > cfg.max_pool_wait_ms or sample.cpu > cfg.target_cpu or sample.memory > cfg.target_memory:
+        target = int(limit * cfg.shrink_factor)
+    elif sample.saturation >= cfg.high_saturation:
+        target = limit + cfg.grow_step
+    elif sample.saturation < cfg.low_saturation:
+        target = limit - 1
+    else:
+        target = limit
+    return max(cfg.min_slots, min(cfg.max_slots, target))
+
+
+class ProcessStats:
+    """CPU share of the host and resident memory share, from /proc where available."""
+
+    def __init__(self) -> None:
+        self._wall = time.monotonic()
+        self._cpu = time.process_time()
+        self._cpus = os.cpu_count() or 1
+
+    def cpu(self) -> float:
+        wall, cpu = time.monotonic(), time.process_time()
+        elapsed = wall - self._wall
+        share = (cpu - self._cpu) / (elapsed * self._cpus) if elapsed > 0 else 0.0
+        self._wall, self._cpu = wall, cpu
+        return share
+
+    def memory(self) -> float:
+        try:
+            with open("/proc/self/statm") as f:
+                rss_pages = int(f.read().split()[1])
+            total = os.sysconf("SC_PHYS_PAGES")
+        except (OSError, ValueError, IndexError):
+            return 0.0
+        return rss_pages / total if total else 0.0
+
+
+class AdaptiveSlotSupplier(CustomSlotSupplier):
+    def __init__(self, cfg: AdaptiveConfig, pool_wait_ms: Optional[Callable[[], float]] = None) -> None:
+        self.cfg = cfg
+        self.limit = max(cfg.min_slots, min(cfg.max_slots, cfg.initial_slots))
+        self.reserved = 0
+        self.used = 0
+        self.pool_wait_ms = pool_wait_ms
+        self.stats = ProcessStats()
+        # Release/mark callbacks may arrive from SDK threads, so counters sit behind a thread lock
+        self._lock = threading.Lock()
+        self._waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._busy_samples: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def reserve_slot(self, ctx: SlotReserveContext) -> SlotPermit:
+        while True:
+            with self._lock:
+                if self.reserved < self.limit:
+                    self.reserved += 1
+                    return SlotPermit()
+                loop = asyncio.get_running_loop()
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            await waiter
+
+    def try_reserve_slot(self, ctx: SlotReserveContext) -> Optional[SlotPermit]:
+        with self._lock:
+            if self.reserved < self.limit:
+                self.reserved += 1
+                return SlotPermit()
+        return None
+
+    def mark_slot_used(self, ctx: SlotMarkUsedContext) -> None:
+        with self._lock:
+            self.used += 1
+            setattr(ctx.permit, "used", True)
+
+    def release_slot(self, ctx: SlotReleaseContext) -> None:
+        with self._lock:
+            self.reserved -= 1
+            if ctx.permit is not None and getattr(ctx.permit, "used", False):
+                self.used -= 1
+        self._wake(1)
+
+    def _wake(self, n: Optional[int] = None) -> None:
+        with self._lock:
+            waiters = self._waiters if n is None else self._waiters[:n]
+            self._waiters = [] if n is None else self._waiters[n:]
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(lambda w=waiter: w.done() or w.set_result(None))
+
+    def sample(self) -> Sample:
+        with self._lock:
+            busy = self.used / self.limit if self.limit else 0.0
+        self._busy_samples.append(busy)
+        saturation = sum(self._busy_samples) / len(self._busy_samples)
+        self._busy_samples.clear()
+        return Sample(
+            saturation=saturation,
+            pool_wait_ms=self.pool_wait_ms() if self.pool_wait_ms else 0.0,
+            cpu=self.stats.cpu(),
+            memory=self.stats.memory(),
+        )
+
+    def adjust(self) -> None:
+        sample = self.sample()
+        limit = next_limit(self.limit, sample, self.cfg)
+        if limit != self.limit:
+            logger.info(
+                "worker.slots.adjusted",
+                previous=self.limit,
+                limit=limit,
+                saturation=round(sample.saturation, 3),
+                pool_wait_ms=round(sample.pool_wait_ms, 1),
+                cpu=round(sample.cpu, 3),
+                memory=round(sample.memory, 3),
+            )
+        with self._lock:
+            self.limit = limit
+        # Waiters re-check against the new limit; this also recovers any wakeup lost to a cancelled waiter
+        self._wake()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="adaptive-slots")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        # Sample saturation several times per interval so short bursts are not missed
+        ticks = 5
+        while True:
+            for _ in range(ticks - 1):
+                await asyncio.sleep(self.cfg.interval / ticks)
+                with self._lock:
+                    self._busy_samples.append(self.used / self.limit if self.limit else 0.0)
+            await asyncio.sleep(self.cfg.interval / ticks)
+            self.adjust()
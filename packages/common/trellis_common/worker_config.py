@@ -0,0 +1,139 @@
+"""Temporal worker options from the environment.
+
+Every knob is read as `<SERVICE>_WORKER_<NAME>` (e.g. ORDER_WORKER_MAX_CONCURRENT_ACTIVITIES)
+and falls back to `WORKER_<NAME>`; unset knobs keep the SDK defaults.
+
+A process polling several task-queue shards runs one Worker per shard. Slot,
+cache, poller and per-worker rate knobs are budgets for the whole process, so
+each shard's Worker gets an even share of the configured value (or of the SDK
+default when unset), never less than the SDK's minimum. The adaptive activity
+supplier is shared by every shard's Worker, so its limit is already a process
+budget.
+"""
+
+import os
+from datetime import timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from temporalio.worker import (
+    FixedSizeSlotSupplier,
+    ResourceBasedSlotConfig,
+    WorkerTuner,
+)
+
+from . import db
+from .tuning import AdaptiveConfig, AdaptiveSlotSupplier
+
+
+def _seconds(value: str) -> timedelta:
+    return timedelta(seconds=float(value))
+
+
+def _flag(value: str) -> bool:
+    return value.lower() in ("1", "true", "yes")
+
+
+# Env name -> (Worker keyword argument, parser)
+KNOBS: Dict[str, Tuple[str, Callable[[str], Any]]] = {
+    "MAX_CONCURRENT_ACTIVITIES": ("max_concurrent_activities", int),
+    "MAX_CONCURRENT_WORKFLOW_TASKS": ("max_concurrent_workflow_tasks", int),
+    "MAX_CONCURRENT_LOCAL_ACTIVITIES": ("max_concurrent_local_activities", int),
+    "MAX_CACHED_WORKFLOWS": ("max_cached_workflows", int),
+    "MAX_CONCURRENT_WORKFLOW_TASK_POLLS": ("max_concurrent_workflow_task_polls", int),
+    "MAX_CONCURRENT_ACTIVITY_TASK_POLLS": ("max_concurrent_activity_task_polls", int),
+    "NONSTICKY_TO_STICKY_POLL_RATIO": ("nonsticky_to_sticky_poll_ratio", float),
+    "STICKY_QUEUE_SCHEDULE_TO_START_TIMEOUT": ("sticky_queue_schedule_to_start_timeout", _seconds),
+    "MAX_ACTIVITIES_PER_SECOND": ("max_activities_per_second", float),
+    "MAX_TASK_QUEUE_ACTIVITIES_PER_SECOND": ("max_task_queue_activities_per_second", float),
+    "GRACEFUL_SHUTDOWN_TIMEOUT": ("graceful_shutdown_timeout", _seconds),
+    "DISABLE_EAGER_ACTIVITY_EXECUTION": ("disable_eager_activity_execution", _flag),
+}
+
+# Process-wide budgets split across shard Workers, with the SDK default used when unset
+SHARED_BUDGETS: Dict[str, Optional[int]] = {
+    "max_concurrent_activities": 100,
+    "max_concurrent_workflow_tasks": 100,
+    "max_concurrent_local_activities": 100,
+    "max_cached_workflows": 1000,
+    "max_concurrent_workflow_task_polls": 5,
+    "max_concurrent_activity_task_polls": 5,
+    "max_activities_per_second": None,
+}
+
+# The SDK needs at least two workflow task slots and pollers while workflows are cached
+MIN_SHARE = {"max_concurrent_workflow_tasks": 2, "max_concurrent_workflow_task_polls": 2}
+
+
+def split_budgets(options: Dict[str, Any], shards: int) -> Dict[str, Any]:
+    """`options` with each process-wide budget divided across `shards` Workers."""
+    if shards <= 1:
+        return options
+    split = dict(options)
+    for kwarg, default in SHARED_BUDGETS.items():
+        total = options.get(kwarg, default)
+        if total is None:
+            continue
+        if isinstance(total, float):
+            split[kwarg] = total / shards
+        else:
+            split[kwarg] = max(min(MIN_SHARE.get(kwarg, 1), total), total // shards)
+    return split
+
+
+# Slot counts become tuner settings when a tuner is configured; the SDK rejects both at once
+SLOT_KNOBS = ("max_concurrent_activities", "max_concurrent_workflow_tasks", "max_concurrent_local_activities")
+
+
+def _env(service: str, name: str, default: Optional[str] = None) -> Optional[str]:
+    return os.getenv(f"{service}_WORKER_{name}", os.getenv(f"WORKER_{name}", default))
+
+
+def adaptive_config(service: str) -> AdaptiveConfig:
+    defaults = AdaptiveConfig()
+    values: Dict[str, Any] = {}
+    for field, value in vars(defaults).items():
+        raw = _env(service, f"ADAPTIVE_{field.upper()}")
+        if raw is not None:
+            values[field] = type(value)(raw)
+    return AdaptiveConfig(**values)
+
+
+def worker_options(service: str, shards: int = 1) -> Tuple[Dict[str, Any], Optional[AdaptiveSlotSupplier]]:
+    """Keyword arguments for each of `shards` `worker.Worker`s, plus the adaptive supplier to start when one is in use.
+
+    `<SERVICE>_WORKER_TUNER` / `WORKER_TUNER` selects how slots are sized:
+    `fixed` (default) uses the MAX_CONCURRENT_* knobs, `resource` uses the SDK's
+    resource-based tuner (TARGET_CPU / TARGET_MEMORY), and `adaptive` sizes
+    activity slots with `AdaptiveSlotSupplier` (ADAPTIVE_* knobs).
+    """
+    service = service.upper()
+    options: Dict[str, Any] = {}
+    for name, (kwarg, parse) in KNOBS.items():
+        raw = _env(service, name)
+        if raw is not None:
+            options[kwarg] = parse(raw)
+    options = split_budgets(options, shards)
+
+    mode = _env(service, "TUNER", "fixed")
+    if mode == "fixed":
+        return options, None
+
+    slots = {kwarg: options.pop(kwarg) for kwarg in SLOT_KNOBS if kwarg in options}
+    if mode == "resource":
+        options["tuner"] = WorkerTuner.create_resource_based(
+            target_memory_usage=float(_env(service, "TARGET_MEMORY", "0.8")),
+            target_cpu_usage=float(_env(service, "TARGET_CPU", "0.8")),
+            activity_config=ResourceBasedSlotConfig(maximum_slots=slots.get("max_concurrent_activities")),
+            workflow_config=ResourceBasedSlotConfig(maximum_slots=slots.get("max_concurrent_workflow_tasks")),
+        )
+        return options, None
+    if mode == "adaptive":
+        adaptive = AdaptiveSlotSupplier(adaptive_config(service), pool_wait_ms=db.pool_wait_tracker())
+        options["tuner"] = WorkerTuner.create_composite(
+            workflow_supplier=FixedSizeSlotSupplier(slots.get("max_concurrent_workflow_tasks", 100)),
+            activity_supplier=adaptive,
+            local_activity_supplier=FixedSizeSlotSupplier(slots.get("max_concurrent_local_activities", 100)),
+            nexus_supplier=FixedSizeSlotSupplier(100),
+        )
+        return options, adaptive
+    raise ValueError(f"unknown worker tuner {mode!r}; use fixed, resource or adaptive")
@@ -0,0 +1,138 @@
+"""Compare Temporal payload size and (de)serialization time across data converters.
+
+Encodes and decodes the payloads one OrderWorkflow run records in its history
+(workflow and activity inputs and results, the ShippingWorkflow child) with the
+SDK's default converter, on plain dicts and on the typed models, then with
+`trellis_common.serialization` with and without compression. With
+--workflow-id it also reports the size of a real history fetched from the
+server.
+
+    PYTHONPATH=.:packages/common python scripts/bench_converter.py --items 3
+    PYTHONPATH=.:packages/common python scripts/bench_converter.py --items 200 --workflow-id order-<uuid>
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import sys
+import time
+import uuid
+from typing import Any, Optional
+
+from temporalio import client
+from temporalio.converter import DataConverter
+from trellis_common.models import Address, Order, OrderItem, PaymentResult
+from trellis_common.serialization import CompressionCodec, PayloadConverter
+
+
+def sample_history(items: int) -> list[tuple[list[Any], list[Optional[type]]]]:
+    """(values, type hints) for each payload-carrying event of one order, in history order."""
+    order_id, payment_id = str(uuid.uuid4()), str(uuid.uuid4())
+    order = Order(
+        order_id=order_id,
+        items=[OrderItem(sku=f"SKU-{i:05d}", qty=1 + i % 3) for i in range(items)],
+        address=Address(street="123 Main", city="SF", postal_code="94105", country="US"),
+    )
+    payment = PaymentResult(payment_id=payment_id, amount=sum(i.qty for i in order.items))
+    return [
+        ([order_id, payment_id], [str, str]),  # OrderWorkflow input
+        ([order_id], [str]),  # ReceiveOrder input
+        ([order], [Order]),  # ReceiveOrder result
+        ([order], [Order]),  # ValidateOrder input
+        ([True], [bool]),  # ValidateOrder result
+        ([order, payment_id], [Order, str]),  # ChargePayment input
+        ([payment], [PaymentResult]),  # ChargePayment result
+        ([order], [Order]),  # ShippingWorkflow input
+        ([order], [Order]),  # PreparePackage input
+        (["Package ready"], [str]),  # PreparePackage result
+        ([order], [Order]),  # DispatchCarrier input
+        (["Dispatched"], [str]),  # DispatchCarrier result
+        (["Dispatched"], [str]),  # ShippingWorkflow result
+        (["Dispatched"], [str]),  # OrderWorkflow result
+    ]
+
+
+def as_dicts(history: list[tuple[list[Any], list[Optional[type]]]]) -> list[tuple[list[Any], list[Optional[type]]]]:
+    """The same history as the pre-model code produced it: plain dicts, decoded without type hints."""
+    plain = [[dataclasses.asdict(v) if dataclasses.is_dataclass(v) else v for v in values] for values, _ in history]
+    return [(values, [None] * len(values)) for values in plain]
+
+
+async def measure(converter: DataConverter, history: list[tuple[list[Any], list[Optional[type]]]], rounds: int) -> dict:
+    encoded = [await converter.encode(values) for values, _ in history]
+    size = sum(p.ByteSize() for payloads in encoded for p in payloads)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for values, _ in history:
+            await converter.encode(values)
+    encode_s = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for payloads, (_, hints) in zip(encoded, history):
+            await converter.decode(payloads, hints)
+    decode_s = time.perf_counter() - started
+    return {
+        "history_payload_bytes": size,
+        "encode_us_per_workflow": round(encode_s / rounds * 1e6, 1),
+        "decode_us_per_workflow": round(decode_s / rounds * 1e6, 1),
+    }
+
+
+async def fetch_history_size(target: str, workflow_id: str) -> dict:
+    c = await client.Client.connect(target)
+    history = await c.get_workflow_handle(workflow_id).fetch_history()
+    return {"workflow_id": workflow_id, "events": len(history.events), "history_bytes": history.to_proto().ByteSize()}
+
+
+async def run(args: argparse.Namespace) -> dict:
+    history = sample_history(args.items)
+    fast = dataclasses.replace(DataConverter.default, payload_converter_class=PayloadConverter)
+    converters = {
+        "sdk_default_dicts": (DataConverter.default, as_dicts(history)),
+        "sdk_default_models": (DataConverter.default, history),
+        "orjson_models": (fast, history),
+        "orjson_models_zlib": (dataclasses.replace(fast, payload_codec=CompressionCodec("zlib", args.min_bytes)), history),
+    }
+    if args.zstd:
+        converters["orjson_models_zstd"] = (dataclasses.replace(fast, payload_codec=CompressionCodec("zstd", args.min_bytes)), history)
+    report: dict[str, Any] = {"config": vars(args), "converters": {}}
+    for name, (converter, values) in converters.items():
+        report["converters"][name] = await measure(converter, values, args.rounds)
+    if args.workflow_id:
+        report["server_history"] = await fetch_history_size(args.temporal, args.workflow_id)
+    return report
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--items", type=int, default=3, help="order line items per payload")
+    p.add_argument("--rounds", type=int, default=2000, help="workflows' worth of payloads to time")
+    p.add_argument("--min-bytes", type=int, default=1024, help="compression threshold")
+    p.add_argument("--zstd", action="store_true", help="also measure zstd (needs the zstandard package)")
+    p.add_argument("--workflow-id", default=None, help="also fetch this workflow's history and report its size")
+    p.add_argument("--temporal", default="localhost:7233")
+    p.add_argument("--report", default="-", help="where to write the JSON report ('-' for stdout)")
+    return p.parse_args(argv)
+
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.report == "-":
+        print(text)
+    else:
+        with open(args.report, "w") as f:
+            f.write(text + "\n")
+        print(f"[bench] wrote {args.report}")
+    for name, stats in report["converters"].items():
+        print(
+            f"[bench] {name:20} bytes={stats['history_payload_bytes']:8} "
+            f"encode={stats['encode_us_per_workflow']:8.1f}us decode={stats['decode_us_per_workflow']:8.1f}us"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
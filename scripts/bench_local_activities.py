@@ -0,0 +1,167 @@
+"""Measure what running steps as local activities saves on the happy path.
+
+Runs the real OrderWorkflow and ShippingWorkflow on in-process workers whose
+activities are stubs that sleep --activity-ms, first with every step remote and
+then with --local-steps as local activities. For each mode it reports
+start-to-result latency percentiles plus history events and bytes per order
+(parent and child). The workflows use the fixed `order-tq`/`shipping-tq`
+queues, so point it at a Temporal server without the stack's workers, e.g.
+`temporal server start-dev`, or pass --ephemeral to have the SDK start one.
+
+    PYTHONPATH=.:packages/common python scripts/bench_local_activities.py --orders 50
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+import uuid
+from typing import Any
+
+from temporalio import activity, client, worker
+from temporalio.testing import WorkflowEnvironment
+from trellis_common.models import Order, OrderItem, PaymentResult, StepConfig, WorkflowConfig
+from trellis_common.serialization import data_converter
+
+from services.order_worker.workflows import OrderWorkflow
+from services.shipping_worker.workflows import ShippingWorkflow
+
+
+DEFAULT_LOCAL_STEPS = "ReceiveOrder,ValidateOrder,PreparePackage,DispatchCarrier"
+
+
+def stub_activities(delay: float) -> tuple[list, list]:
+    @activity.defn(name="ReceiveOrder")
+    async def receive(order_id: str) -> Order:
+        await asyncio.sleep(delay)
+        return Order(order_id=order_id, items=[OrderItem(sku="ABC", qty=1)])
+
+    @activity.defn(name="ValidateOrder")
+    async def validate(order: Order) -> bool:
+        await asyncio.sleep(delay)
+        return True
+
+    @activity.defn(name="ChargePayment")
+    async def charge(order: Order, payment_id: str) -> PaymentResult:
+        await asyncio.sleep(delay)
+        return PaymentResult(payment_id=payment_id, amount=1)
+
+    @activity.defn(name="RecordCancellation")
+    async def record_cancellation(order_id: str) -> None:
+        await asyncio.sleep(delay)
+
+    @activity.defn(name="RecordShipment")
+    async def record_shipment(order_id: str) -> None:
+        await asyncio.sleep(delay)
+
+    @activity.defn(name="PreparePackage")
+    async def prepare(order: Order, group: str | None = None) -> str:
+        await asyncio.sleep(delay)
+        return "Package ready"
+
+    @activity.defn(name="DispatchCarrier")
+    async def dispatch(order: Order, group: str | None = None) -> str:
+        await asyncio.sleep(delay)
+        return "Dispatched"
+
+    return [receive, validate, charge, record_cancellation, record_shipment], [prepare, dispatch]
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+async def history_size(c: client.Client, workflow_id: str) -> tuple[int, int]:
+    history = await c.get_workflow_handle(workflow_id).fetch_history()
+    return len(history.events), history.to_proto().ByteSize()
+
+
+async def run_mode(c: client.Client, args: argparse.Namespace, config: WorkflowConfig | None) -> dict:
+    sem = asyncio.Semaphore(args.concurrency)
+    latencies: list[float] = []
+    events: list[int] = []
+    sizes: list[int] = []
+
+    async def one() -> None:
+        async with sem:
+            order_id = str(uuid.uuid4())
+            wf_args: list[Any] = [order_id, str(uuid.uuid4())] + ([config] if config is not None else [])
+            started = time.perf_counter()
+            handle = await c.start_workflow("OrderWorkflow", args=wf_args, id=f"order-{order_id}", task_queue="order-tq")
+            await handle.result()
+            latencies.append(time.perf_counter() - started)
+            parent = await history_size(c, handle.id)
+            child = await history_size(c, f"ship-{order_id}-0")
+            events.append(parent[0] + child[0])
+            sizes.append(parent[1] + child[1])
+
+    await asyncio.gather(*(one() for _ in range(args.orders)))
+    return {
+        "orders": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "history_events_per_order": round(sum(events) / len(events), 1),
+        "history_bytes_per_order": round(sum(sizes) / len(sizes)),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    env = await WorkflowEnvironment.start_local(data_converter=data_converter()) if args.ephemeral else None
+    c = env.client if env else await client.Client.connect(args.temporal, data_converter=data_converter())
+    order_activities, shipping_activities = stub_activities(args.activity_ms / 1000)
+    local = WorkflowConfig(
+        steps={name.strip(): StepConfig(local=True, local_max_seconds=args.local_max_seconds) for name in args.local_steps.split(",")}
+    )
+    try:
+        async with worker.Worker(c, task_queue="order-tq", workflows=[OrderWorkflow], activities=order_activities), worker.Worker(
+            c, task_queue="shipping-tq", workflows=[ShippingWorkflow], activities=shipping_activities
+        ):
+            return {
+                "config": vars(args),
+                "remote": await run_mode(c, args, None),
+                "local": await run_mode(c, args, local),
+            }
+    finally:
+        if env:
+            await env.shutdown()
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--orders", type=int, default=50, help="orders per mode")
+    p.add_argument("--concurrency", type=int, default=10)
+    p.add_argument("--activity-ms", type=float, default=5.0, help="time each stub activity takes")
+    p.add_argument("--local-steps", default=DEFAULT_LOCAL_STEPS, help="activities run locally in the second mode")
+    p.add_argument("--local-max-seconds", type=float, default=2.0)
+    p.add_argument("--temporal", default="localhost:7233")
+    p.add_argument("--ephemeral", action="store_true", help="start a throwaway dev server through the SDK")
+    p.add_argument("--report", default="-", help="where to write the JSON report ('-' for stdout)")
+    return p.parse_args(argv)
+
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.report == "-":
+        print(text)
+    else:
+        with open(args.report, "w") as f:
+            f.write(text + "\n")
+        print(f"[bench] wrote {args.report}")
+    for mode in ("remote", "local"):
+        stats = report[mode]
+        print(
+            f"[bench] {mode:6} n={stats['orders']:5} p50={stats['p50_ms']:8.1f}ms p95={stats['p95_ms']:8.1f}ms "
+            f"events/order={stats['history_events_per_order']:6.1f} bytes/order={stats['history_bytes_per_order']:7}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,211 @@
+"""Measure in-process OrderWorkflow + ShippingWorkflow throughput per worker config.
+
+Runs on the SDK's time-skipping test server (no Temporal or Postgres needed):
+both workflows run on in-process workers with the real activities, fault
+injection off and `trellis_common.db` replaced by `memory_db`. The manual-review
+timer is skipped rather than waited out. For each variant it starts --orders
+workflows, --concurrency at a time, and reports:
+
+- completed workflows per second;
+- activity scheduling overhead: order latency not spent inside an activity,
+  divided by the activities the order ran (so server round trips, workflow
+  tasks and queueing per step);
+- peak Python heap while the variant ran (tracemalloc, --trace-memory, slows
+  the run) and the process RSS high-water mark.
+
+A variant is NAME or NAME:KNOB=VALUE,... using the worker knob names from
+`trellis_common.worker_config` (e.g. MAX_CACHED_WORKFLOWS=100).
+
+    PYTHONPATH=.:packages/common python scripts/bench_throughput.py --orders 2000 \\
+        --variant default --variant small-cache:MAX_CACHED_WORKFLOWS=100
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import sys
+import time
+import tracemalloc
+import uuid
+from typing import Any
+
+from temporalio import activity, worker
+from temporalio.testing import WorkflowEnvironment
+from temporalio.worker import ActivityInboundInterceptor, ExecuteActivityInput, Interceptor
+from trellis_common import faults, memory_db
+from trellis_common.faults import PROFILES, FaultInjector
+from trellis_common.serialization import data_converter
+from trellis_common.worker_config import KNOBS
+
+from services.order_worker.activities import (
+    charge_payment_activity,
+    receive_order_activity,
+    record_cancellation_activity,
+    record_shipment_activity,
+    validate_order_activity,
+)
+from services.order_worker.workflows import OrderWorkflow
+from services.shipping_worker.activities import dispatch_carrier_activity, prepare_package_activity
+from services.shipping_worker.workflows import ShippingWorkflow
+
+
+DEFAULT_VARIANTS = ["default", "small-cache:MAX_CACHED_WORKFLOWS=100", "wide:MAX_CONCURRENT_WORKFLOW_TASKS=500,MAX_CONCURRENT_ACTIVITIES=500"]
+
+
+def order_key(workflow_id: str) -> str:
+    """The order id behind order-<id> and its shipping children ship-<id>-<n>."""
+    if workflow_id.startswith("ship-"):
+        return workflow_id[len("ship-") :].rsplit("-", 1)[0]
+    return workflow_id[len("order-") :]
+
+
+class ActivityTimer(Interceptor):
+    """Adds up wall time spent inside activities, keyed by the order they belong to."""
+
+    def __init__(self) -> None:
+        self.seconds: dict[str, float] = {}
+        self.count: dict[str, int] = {}
+
+    def intercept_activity(self, next: ActivityInboundInterceptor) -> ActivityInboundInterceptor:
+        timer = self
+
+        class Inbound(ActivityInboundInterceptor):
+            async def execute_activity(self, input: ExecuteActivityInput) -> Any:
+                key = order_key(activity.info().workflow_id)
+                started = time.perf_counter()
+                try:
+                    return await super().execute_activity(input)
+                finally:
+                    timer.seconds[key] = timer.seconds.get(key, 0.0) + time.perf_counter() - started
+                    timer.count[key] = timer.count.get(key, 0) + 1
+
+        return Inbound(next)
+
+
+def parse_variant(spec: str) -> tuple[str, dict[str, Any]]:
+    name, _, knobs = spec.partition(":")
+    options: dict[str, Any] = {}
+    for pair in filter(None, knobs.split(",")):
+        knob, _, value = pair.partition("=")
+        if knob not in KNOBS:
+            raise SystemExit(f"unknown worker knob {knob!r}; use one of {sorted(KNOBS)}")
+        kwarg, parse = KNOBS[knob]
+        options[kwarg] = parse(value)
+    return name, options
+
+
+async def run_variant(env: WorkflowEnvironment, name: str, options: dict[str, Any], args: argparse.Namespace) -> dict:
+    c = env.client
+    timer = ActivityTimer()
+    sem = asyncio.Semaphore(args.concurrency)
+    latencies: dict[str, float] = {}
+
+    async def one() -> None:
+        async with sem:
+            order_id = str(uuid.uuid4())
+            started = time.perf_counter()
+            handle = await c.start_workflow(
+                "OrderWorkflow", args=[order_id, str(uuid.uuid4())], id=f"order-{order_id}", task_queue="order-tq"
+            )
+            await handle.result()
+            latencies[order_id] = time.perf_counter() - started
+
+    if args.trace_memory:
+        tracemalloc.start()
+    order_worker = worker.Worker(
+        c,
+        task_queue="order-tq",
+        workflows=[OrderWorkflow],
+        activities=[
+            receive_order_activity,
+            validate_order_activity,
+            charge_payment_activity,
+            record_cancellation_activity,
+            record_shipment_activity,
+        ],
+        interceptors=[timer],
+        **options,
+    )
+    shipping_worker = worker.Worker(
+        c,
+        task_queue="shipping-tq",
+        workflows=[ShippingWorkflow],
+        activities=[prepare_package_activity, dispatch_carrier_activity],
+        interceptors=[timer],
+        **options,
+    )
+    try:
+        with memory_db.use() as mem:
+            async with order_worker, shipping_worker:
+                started = time.perf_counter()
+                await asyncio.gather(*(one() for _ in range(args.orders)))
+                elapsed = time.perf_counter() - started
+        heap_peak = tracemalloc.get_traced_memory()[1] if args.trace_memory else None
+    finally:
+        if args.trace_memory:
+            tracemalloc.stop()
+
+    overhead = [
+        (latency - timer.seconds.get(order_id, 0.0)) / timer.count[order_id]
+        for order_id, latency in latencies.items()
+        if timer.count.get(order_id)
+    ]
+    overhead.sort()
+    return {
+        "variant": name,
+        "options": options,
+        "orders": len(latencies),
+        "seconds": round(elapsed, 3),
+        "workflows_per_second": round(len(latencies) / elapsed, 1),
+        "activities": sum(timer.count.values()),
+        "overhead_per_activity_ms_p50": round(overhead[len(overhead) // 2] * 1000, 2) if overhead else None,
+        "overhead_per_activity_ms_p95": round(overhead[int(len(overhead) * 0.95)] * 1000, 2) if overhead else None,
+        "heap_peak_mb": round(heap_peak / 2**20, 1) if heap_peak is not None else None,
+        # ru_maxrss is KiB on Linux and only ever grows, so later variants include earlier ones
+        "rss_high_water_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "events_written": len(mem.events),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    faults.configure(FaultInjector(PROFILES["off"]))
+    results = []
+    async with await WorkflowEnvironment.start_time_skipping(data_converter=data_converter()) as env:
+        for spec in args.variant or DEFAULT_VARIANTS:
+            name, options = parse_variant(spec)
+            results.append(await run_variant(env, name, options, args))
+    return {"config": {k: v for k, v in vars(args).items() if k != "variant"}, "variants": results}
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--orders", type=int, default=1000, help="orders per variant")
+    p.add_argument("--concurrency", type=int, default=500, help="workflows in flight at once")
+    p.add_argument("--variant", action="append", help=f"worker config to run (repeatable; default {DEFAULT_VARIANTS})")
+    p.add_argument("--trace-memory", action="store_true", help="record peak Python heap per variant")
+    p.add_argument("--report", default="-", help="where to write the JSON report ('-' for stdout)")
+    return p.parse_args(argv)
+
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.report == "-":
+        print(text)
+    else:
+        with open(args.report, "w") as f:
+            f.write(text + "\n")
+        print(f"[bench] wrote {args.report}")
+    for v in report["variants"]:
+        print(
+            f"[bench] {v['variant']:12} n={v['orders']:6} wf/s={v['workflows_per_second']:8.1f} "
+            f"overhead/activity p50={v['overhead_per_activity_ms_p50']}ms p95={v['overhead_per_activity_ms_p95']}ms "
+            f"rss={v['rss_high_water_mb']}MB"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -6,6 +6,8 @@ from urllib import request, error
 
 
 BASE_URL = "http://localhost:8000"
+# States an order never leaves; the stream ends after one of them
+TERMINAL_STATES = {"completed", "cancelled", "failed"}
 
 
 def http(method: str, path: str, body: dict | None = None, timeout: float = 5.0) -> tuple[int, dict]:
@@ -28,7 +30,26 @@ def http(method: str, path: str, body: dict | None = None, timeout: float = 5.0)
             return e.code, {"error": payload}
 
 
-def wait_for_status(order_id: str, want: set[str], timeout_sec: float = 20.0) -> dict:
+def stream_status(order_id: str, want: set[str], timeout_sec: float) -> dict:
+    """Follow GET /orders/{id}/stream until a wanted state arrives or the stream ends."""
+    deadline = time.time() + timeout_sec
+    last = {}
+    with request.urlopen(f"{BASE_URL}/orders/{order_id}/stream", timeout=timeout_sec) as resp:
+        for raw in resp:
+            line = raw.decode("utf-8").strip()
+            if line.startswith("data:"):
+                last = json.loads(line[len("data:"):])
+                state = last.get("status", {}).get("state")
+                if state in want:
+                    return last
+                if state in TERMINAL_STATES:
+                    raise AssertionError(f"Order ended as {state}, wanted {want}: {last}")
+            if time.time() >= deadline:
+                break
+    raise TimeoutError(f"Timed out waiting for states {want}. Last: {last}")
+
+
+def poll_status(order_id: str, want: set[str], timeout_sec: float) -> dict:
     deadline = time.time() + timeout_sec
     last = {}
     while time.time() < deadline:
@@ -38,10 +59,22 @@ def wait_for_status(order_id: str, want: set[str], timeout_sec: float = 20.0) ->
             state = payload.get("status", {}).get("state")
             if state in want:
                 return payload
+            if state in TERMINAL_STATES:
+                raise AssertionError(f"Order ended as {state}, wanted {want}: {payload}")
         time.sleep(0.5)
     raise TimeoutError(f"Timed out waiting for states {want}. Last: {last}")
 
 
+def wait_for_status(order_id: str, want: set[str], timeout_sec: float = 20.0) -> dict:
+    # Push updates instead of a status query every 0.5 s; poll against servers without the stream
+    try:
+        return stream_status(order_id, want, timeout_sec)
+    except error.HTTPError as e:
+        if e.code != 404:
+            raise
+    return poll_status(order_id, want, timeout_sec)
+
+
 def test_health() -> None:
     status, payload = http("GET", "/health")
     assert status == 200 and payload.get("status") == "ok", payload
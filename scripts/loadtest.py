@@ -0,0 +1,247 @@
+"""Asyncio load generator for the order API.
+
+Starts orders at a fixed rate or concurrency, optionally sends signals, polls
+status until each workflow finishes and writes per-endpoint latency
+percentiles plus start-to-completed workflow times as a JSON report.
+
+    python scripts/loadtest.py --orders 500 --concurrency 50 --report load.json
+    python scripts/loadtest.py --orders 2000 --rate 100 --cancel-ratio 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+
+TERMINAL_STATES = {"completed", "cancelled", "failed"}
+
+
+class HttpClient:
+    """Minimal keep-alive HTTP/1.1 client on asyncio streams, so the tool has no dependencies."""
+
+    def __init__(self, base_url: str, max_connections: int, timeout: float) -> None:
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def request(self, method: str, path: str, body: dict | None = None) -> tuple[int, dict]:
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else await asyncio.open_connection(self.host, self.port)
+            try:
+                status, payload, keep_alive = await asyncio.wait_for(self._roundtrip(conn, method, path, body), self.timeout)
+            except BaseException:
+                conn[1].close()
+                raise
+            if keep_alive:
+                self._idle.append(conn)
+            else:
+                conn[1].close()
+            return status, payload
+
+    async def _roundtrip(self, conn, method: str, path: str, body: dict | None) -> tuple[int, dict, bool]:
+        reader, writer = conn
+        data = json.dumps(body).encode() if body is not None else b""
+        head = (
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\nConnection: keep-alive\r\n\r\n"
+        )
+        writer.write(head.encode() + data)
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by server")
+        status = int(status_line.split()[1])
+        headers: dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode().partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding") == "chunked":
+            raw = b""
+            while True:
+                size = int((await reader.readline()).strip(), 16)
+                chunk = await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                raw += chunk[:-2]
+        else:
+            raw = await reader.readexactly(int(headers.get("content-length", "0")))
+        keep_alive = headers.get("connection", "").lower() != "close"
+        try:
+            payload = json.loads(raw) if raw else {}
+        except ValueError:
+            payload = {"raw": raw.decode(errors="replace")}
+        return status, payload, keep_alive
+
+    def close(self) -> None:
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.workflow_times: list[float] = []
+        self.outcomes: dict[str, int] = defaultdict(int)
+
+    async def call(self, http: HttpClient, endpoint: str, method: str, path: str, body: dict | None = None) -> tuple[int, dict]:
+        started = time.perf_counter()
+        try:
+            status, payload = await http.request(method, path, body)
+        except Exception as e:
+            self.errors[endpoint] += 1
+            return 0, {"error": str(e)}
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        if status >= 400:
+            self.errors[endpoint] += 1
+        return status, payload
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def histogram(values: list[float]) -> dict[str, int]:
+    """Counts per power-of-two millisecond bucket, keyed by the bucket's upper bound."""
+    buckets: dict[str, int] = defaultdict(int)
+    for v in values:
+        ms = v * 1000
+        bound = 1 if ms <= 1 else 2 ** math.ceil(math.log2(ms))
+        buckets[f"le_{bound}ms"] += 1
+    return dict(sorted(buckets.items(), key=lambda kv: int(kv[0][3:-2])))
+
+
+def summarize(values: list[float]) -> dict:
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(1000 * sum(ordered) / len(ordered), 3) if ordered else 0.0,
+        "p50_ms": round(1000 * percentile(ordered, 50), 3),
+        "p95_ms": round(1000 * percentile(ordered, 95), 3),
+        "p99_ms": round(1000 * percentile(ordered, 99), 3),
+        "max_ms": round(1000 * ordered[-1], 3) if ordered else 0.0,
+        "histogram": histogram(ordered),
+    }
+
+
+async def run_order(http: HttpClient, rec: Recorder, args: argparse.Namespace) -> None:
+    order_id = str(uuid.uuid4())
+    payment_id = str(uuid.uuid4())
+    started = time.perf_counter()
+    status, _ = await rec.call(http, "start", "POST", f"/orders/{order_id}/start?payment_id={payment_id}")
+    if status != 200:
+        rec.outcomes["start_failed"] += 1
+        return
+    if random.random() < args.address_ratio:
+        await rec.call(http, "update_address", "POST", f"/orders/{order_id}/signals/update_address", {"street": "123 Main", "city": "SF"})
+    if random.random() < args.cancel_ratio:
+        await rec.call(http, "cancel", "POST", f"/orders/{order_id}/signals/cancel")
+    query = "?consistent=true" if args.consistent else ""
+    deadline = started + args.workflow_timeout
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(args.poll_interval)
+        status, payload = await rec.call(http, "status", "GET", f"/orders/{order_id}/status{query}")
+        state = payload.get("status", {}).get("state") if status == 200 else None
+        if state in TERMINAL_STATES:
+            # Failed runs stop early, so their times would flatter the percentiles
+            if state != "failed":
+                rec.workflow_times.append(time.perf_counter() - started)
+            rec.outcomes[state] += 1
+            return
+    rec.outcomes["timed_out"] += 1
+
+
+async def drive(args: argparse.Namespace) -> dict:
+    http = HttpClient(args.base_url, max_connections=args.connections, timeout=args.request_timeout)
+    rec = Recorder()
+    began = time.perf_counter()
+    tasks: list[asyncio.Task] = []
+    try:
+        if args.rate:
+            # Open model: start orders on a fixed schedule regardless of how fast they finish
+            for i in range(args.orders):
+                delay = began + i / args.rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(run_order(http, rec, args)))
+            await asyncio.gather(*tasks)
+        else:
+            # Closed model: keep `concurrency` orders in flight
+            remaining = iter(range(args.orders))
+
+            async def lane() -> None:
+                for _ in remaining:
+                    await run_order(http, rec, args)
+
+            await asyncio.gather(*(lane() for _ in range(args.concurrency)))
+    finally:
+        http.close()
+    elapsed = time.perf_counter() - began
+    finished = sum(rec.outcomes.get(s, 0) for s in TERMINAL_STATES)
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "report"},
+        "elapsed_s": round(elapsed, 3),
+        "orders": args.orders,
+        "outcomes": dict(rec.outcomes),
+        "throughput_orders_per_s": round(finished / elapsed, 3) if elapsed else 0.0,
+        "endpoints": {name: {**summarize(vals), "errors": rec.errors[name]} for name, vals in rec.latencies.items()},
+        "workflow_start_to_terminal": summarize(rec.workflow_times),
+    }
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--base-url", default="http://localhost:8000")
+    p.add_argument("--orders", type=int, default=200, help="total orders to start")
+    p.add_argument("--concurrency", type=int, default=20, help="orders in flight (closed model, ignored with --rate)")
+    p.add_argument("--rate", type=float, default=0.0, help="orders started per second (open model)")
+    p.add_argument("--connections", type=int, default=100, help="max open HTTP connections")
+    p.add_argument("--address-ratio", type=float, default=0.5, help="fraction of orders sent update_address")
+    p.add_argument("--cancel-ratio", type=float, default=0.0, help="fraction of orders sent cancel")
+    p.add_argument("--poll-interval", type=float, default=0.5)
+    p.add_argument("--consistent", action="store_true", help="poll with ?consistent=true (live workflow query)")
+    p.add_argument("--workflow-timeout", type=float, default=30.0, help="seconds to wait for a terminal state")
+    p.add_argument("--request-timeout", type=float, default=10.0)
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--report", default="loadtest-report.json", help="where to write the JSON report ('-' for stdout)")
+    return p.parse_args(argv)
+
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+    random.seed(args.seed)
+    report = asyncio.run(drive(args))
+    text = json.dumps(report, indent=2)
+    if args.report == "-":
+        print(text)
+    else:
+        with open(args.report, "w") as f:
+            f.write(text + "\n")
+        print(f"[load] wrote {args.report}")
+    for name, stats in report["endpoints"].items():
+        print(f"[load] {name:15} n={stats['count']:6} p50={stats['p50_ms']:9.1f}ms p95={stats['p95_ms']:9.1f}ms p99={stats['p99_ms']:9.1f}ms errors={stats['errors']}")
+    wf = report["workflow_start_to_terminal"]
+    print(f"[load] workflow        n={wf['count']:6} p50={wf['p50_ms']:9.1f}ms p95={wf['p95_ms']:9.1f}ms p99={wf['p99_ms']:9.1f}ms")
+    print(f"[load] outcomes {report['outcomes']} throughput={report['throughput_orders_per_s']}/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,182 @@
+"""Record workflow history fixtures and benchmark replaying them.
+
+`record` runs each scenario end to end on in-process workers with stub
+activities and writes the parent and shipping-child histories to
+services/order_worker/histories/<scenario>.json. The workflows use the fixed
+`order-tq`/`shipping-tq` queues, so point it at a Temporal server without the
+stack's workers (`temporal server start-dev`), or pass --ephemeral.
+
+`bench` replays every fixture with the current workflow code and reports replay
+time and peak Python heap per workflow against REPLAY_BUDGET_MS/REPLAY_BUDGET_KB;
+it exits non-zero on nondeterminism or a blown budget. It needs no server.
+
+    PYTHONPATH=.:packages/common python scripts/replay_histories.py record --ephemeral
+    PYTHONPATH=.:packages/common python scripts/replay_histories.py bench
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from temporalio import activity, client, worker
+from temporalio.exceptions import ApplicationError
+from temporalio.service import RPCError, RPCStatusCode
+from temporalio.testing import WorkflowEnvironment
+from trellis_common.models import Address, Order, OrderItem, PaymentResult
+from trellis_common.serialization import data_converter
+
+from services.order_worker.replay import HISTORIES_DIR, SCENARIO_NAMES, fixture_paths, load_fixture, measure, replay_budget, replayer, write_fixture
+from services.order_worker.workflows import OrderWorkflow
+from services.shipping_worker.workflows import ShippingWorkflow
+
+
+# Fixed ids keep re-recorded fixtures diffable
+ORDER_IDS = {name: str(uuid.uuid5(uuid.NAMESPACE_URL, f"trellis-replay/{name}")) for name in ("happy", "cancel", "address", "dispatch_retry")}
+MAX_SHIPPING_CHILDREN = 4
+SPLIT_ITEMS = [OrderItem(sku="ABC", qty=1, warehouse="west"), OrderItem(sku="XYZ", qty=2, warehouse="east")]
+
+
+def stub_activities() -> tuple[list, list]:
+    @activity.defn(name="ReceiveOrder")
+    async def receive(order_id: str) -> Order:
+        items = SPLIT_ITEMS if order_id == ORDER_IDS["dispatch_retry"] else [OrderItem(sku="ABC", qty=1)]
+        return Order(order_id=order_id, items=items)
+
+    @activity.defn(name="ValidateOrder")
+    async def validate(order: Order) -> bool:
+        return True
+
+    @activity.defn(name="ChargePayment")
+    async def charge(order: Order, payment_id: str) -> PaymentResult:
+        return PaymentResult(payment_id=payment_id, amount=1)
+
+    @activity.defn(name="RecordCancellation")
+    async def record_cancellation(order_id: str) -> None:
+        return None
+
+    @activity.defn(name="RecordShipment")
+    async def record_shipment(order_id: str) -> None:
+        return None
+
+    @activity.defn(name="PreparePackage")
+    async def prepare(order: Order, group: str | None = None) -> str:
+        return "Package ready"
+
+    @activity.defn(name="DispatchCarrier")
+    async def dispatch(order: Order, group: str | None = None) -> str:
+        # The east shipment fails in the first shipping child only, so the parent retries just that one
+        if group == "east-1" and activity.info().workflow_id.endswith("-0"):
+            raise ApplicationError("carrier unavailable", non_retryable=True)
+        return "Dispatched"
+
+    return [receive, validate, charge, record_cancellation, record_shipment], [prepare, dispatch]
+
+
+async def scenario(c: client.Client, name: str, after_start: Callable[[client.WorkflowHandle], Awaitable[None]]) -> list:
+    order_id = ORDER_IDS[name]
+    handle = await c.start_workflow(
+        "OrderWorkflow", args=[order_id, str(uuid.uuid5(uuid.NAMESPACE_URL, order_id))], id=f"order-{order_id}", task_queue="order-tq"
+    )
+    await after_start(handle)
+    await handle.result()
+    histories = [await handle.fetch_history()]
+    # Shipping children are numbered by retry; collect every one that ran
+    for retry in range(MAX_SHIPPING_CHILDREN):
+        try:
+            histories.append(await c.get_workflow_handle(f"ship-{order_id}-{retry}").fetch_history())
+        except RPCError as e:
+            if e.status != RPCStatusCode.NOT_FOUND:
+                raise
+            break
+    return histories
+
+
+async def nothing(handle: client.WorkflowHandle) -> None:
+    return None
+
+
+async def cancel(handle: client.WorkflowHandle) -> None:
+    await handle.signal("CancelOrder")
+
+
+async def update_address(handle: client.WorkflowHandle) -> None:
+    await handle.signal("UpdateAddress", Address(street="1 Main St", city="Springfield", country="US"))
+
+
+SCENARIOS = {"happy": nothing, "cancel": cancel, "address": update_address, "dispatch_retry": nothing}
+assert set(SCENARIOS) == set(SCENARIO_NAMES)
+
+
+async def record(args: argparse.Namespace) -> int:
+    env = await WorkflowEnvironment.start_local(data_converter=data_converter()) if args.ephemeral else None
+    c = env.client if env else await client.Client.connect(args.temporal, data_converter=data_converter())
+    order_activities, shipping_activities = stub_activities()
+    try:
+        async with worker.Worker(c, task_queue="order-tq", workflows=[OrderWorkflow], activities=order_activities), worker.Worker(
+            c, task_queue="shipping-tq", workflows=[ShippingWorkflow], activities=shipping_activities
+        ):
+            for name in args.scenarios.split(","):
+                histories = await scenario(c, name, SCENARIOS[name])
+                path = Path(args.dir) / f"{name}.json"
+                write_fixture(path, name, histories)
+                print(f"[replay] recorded {path} ({len(histories)} workflows, {sum(len(h.events) for h in histories)} events)")
+    finally:
+        if env:
+            await env.shutdown()
+    return 0
+
+
+async def bench(args: argparse.Namespace) -> int:
+    max_seconds, max_bytes = replay_budget()
+    r = replayer()
+    report = []
+    failed = False
+    for path in fixture_paths(Path(args.dir)):
+        for history in load_fixture(path):
+            try:
+                stats = await measure(r, path.stem, history, args.repeat)
+            except Exception as e:
+                print(f"[replay] {path.stem:15} {history.workflow_id}: FAILED {e}")
+                failed = True
+                continue
+            over = stats.seconds > max_seconds or stats.peak_bytes > max_bytes
+            failed = failed or over
+            report.append({**stats._asdict(), "over_budget": over})
+            print(
+                f"[replay] {stats.scenario:15} {stats.workflow_id[:44]:44} events={stats.events:4} "
+                f"time={stats.seconds * 1000:7.2f}ms peak={stats.peak_bytes / 1024:8.0f}KiB{'  OVER BUDGET' if over else ''}"
+            )
+    if not report and not failed:
+        print(f"[replay] no fixtures in {args.dir}; run the record command first")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"budget_ms": max_seconds * 1000, "budget_kb": max_bytes // 1024, "workflows": report}, f, indent=2)
+            f.write("\n")
+    return 1 if failed else 0
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--dir", default=str(HISTORIES_DIR), help="fixture directory")
+    sub = p.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="run the scenarios and write fixtures")
+    rec.add_argument("--scenarios", default=",".join(SCENARIOS))
+    rec.add_argument("--temporal", default="localhost:7233")
+    rec.add_argument("--ephemeral", action="store_true", help="start a throwaway dev server through the SDK")
+    b = sub.add_parser("bench", help="replay the fixtures and report cost per workflow")
+    b.add_argument("--repeat", type=int, default=5, help="timed replays per workflow; the fastest is reported")
+    b.add_argument("--report", help="also write the results as JSON here")
+    return p.parse_args(argv)
+
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+    return asyncio.run(record(args) if args.command == "record" else bench(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,124 @@
+import asyncio
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+from trellis_common import serialization
+
+
+NDJSON = "application/x-ndjson"
+
+
+def batch_concurrency() -> int:
+    return int(os.getenv("BATCH_CONCURRENCY", "100"))
+
+
+def batch_max_items() -> int:
+    return int(os.getenv("BATCH_MAX_ITEMS", "50000"))
+
+
+def _parse_line(line: bytes) -> Any:
+    try:
+        return serialization.loads(line)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="invalid NDJSON line")
+
+
+def _as_item(value: Any, key: str) -> Dict[str, Any]:
+    """Accept either a bare id string or an object with `key`."""
+    if isinstance(value, str):
+        return {key: value}
+    if isinstance(value, dict) and isinstance(value.get(key), str):
+        return value
+    raise HTTPException(status_code=422, detail=f"each item must be a string or an object with '{key}'")
+
+
+async def read_items(request: Request, key: str = "order_id") -> AsyncIterator[Dict[str, Any]]:
+    """Yield items from a JSON array body, or line by line from an NDJSON stream."""
+    limit = batch_max_items()
+    count = 0
+    if request.headers.get("content-type", "").split(";")[0].strip() == NDJSON:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    count += 1
+                    if count > limit:
+                        raise HTTPException(status_code=413, detail=f"batch exceeds {limit} items")
+                    yield _as_item(_parse_line(line), key)
+        if buffer.strip():
+            if count + 1 > limit:
+                raise HTTPException(status_code=413, detail=f"batch exceeds {limit} items")
+            yield _as_item(_parse_line(buffer), key)
+        return
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=422, detail="invalid JSON body")
+    if isinstance(body, dict):
+        body = body.get("orders")
+    if not isinstance(body, list):
+        raise HTTPException(status_code=422, detail="expected a JSON array of items")
+    if len(body) > limit:
+        raise HTTPException(status_code=413, detail=f"batch exceeds {limit} items")
+    for value in body:
+        yield _as_item(value, key)
+
+
+async def bounded_map(
+    items: AsyncIterator[Dict[str, Any]],
+    fn: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+    concurrency: int,
+) -> List[Dict[str, Any]]:
+    """Run `fn` over `items` with at most `concurrency` calls in flight; results keep input order.
+
+    Work starts as items arrive, so an NDJSON upload is processed while it streams in.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(item: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            return await fn(item)
+
+    tasks: List[asyncio.Task] = []
+    try:
+        async for item in items:
+            tasks.append(asyncio.create_task(run(item)))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    return list(await asyncio.gather(*tasks))
+
+
+async def bounded_as_completed(
+    items: List[Dict[str, Any]],
+    fn: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+    concurrency: int,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Run `fn` over `items` with at most `concurrency` calls in flight, yielding results as they finish."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(item: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            return await fn(item)
+
+    tasks = [asyncio.create_task(run(item)) for item in items]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The client went away mid-stream; stop the remaining calls
+        for task in tasks:
+            task.cancel()
+
+
+def ndjson_response(results: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    async def lines() -> AsyncIterator[bytes]:
+        async for result in results:
+            yield serialization.dumps(result, default=str) + b"\n"
+
+    return StreamingResponse(lines(), media_type=NDJSON)
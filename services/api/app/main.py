@@ -1,14 +1,90 @@
+import asyncio
 import os
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
 from datetime import timedelta
+from dataclasses import asdict
+from typing import Any
 import uuid
 import structlog
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from temporalio import client
+from temporalio.exceptions import WorkflowAlreadyStartedError
+from trellis_common import db
+from trellis_common.admission import DEFER, Admission, AdmissionConfig, drain_pending_starts
+from trellis_common.latency import AdaptiveTimeouts, TimeoutBounds, adaptive_enabled
+from trellis_common.metrics import HTTP_REQUEST_SECONDS, ClientMetricsInterceptor
+from trellis_common.models import Address
+from trellis_common.serialization import data_converter
+from trellis_common.sharding import ORDER_QUEUE, all_queues, route
+from trellis_common.steps import workflow_config
+from trellis_common.tracing import configure_tracing, shutdown_tracing, temporal_interceptors
+
+from services.api.app.batch import batch_concurrency, bounded_as_completed, bounded_map, ndjson_response, read_items
+from services.api.app.projection import (
+    FAILED_CLOSE_STATUSES,
+    TERMINAL_STATES,
+    failed_status,
+    get_projected_status,
+    invalidate_projected_status,
+)
+from services.api.app.stream import hub, sse_response, status_updates
+from services.api.app.timeline import decode_cursor, page_max, timeline_response
 
 
 logger = structlog.get_logger()
-app = FastAPI(title="Trellis Temporal Order Lifecycle API")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # FastAPI opens the request span (honouring traceparent); Temporal calls made in a handler join it
+    configure_tracing("api")
+    admission.start(get_temporal)
+    if adaptive_enabled():
+        timeouts.start()
+    drainer = None
+    if admission.cfg.overload == DEFER:
+        drainer = asyncio.create_task(drain_pending_starts(admission, start_pending), name="admission-drain")
+    yield
+    if drainer is not None:
+        drainer.cancel()
+        try:
+            await drainer
+        except asyncio.CancelledError:
+            pass
+    await admission.stop()
+    await timeouts.stop()
+    await hub.stop()
+    await db.close_pool()
+    shutdown_tracing()
+
+
+app = FastAPI(title="Trellis Temporal Order Lifecycle API", lifespan=lifespan)
 _temporal: client.Client | None = None
+# Per-step options (e.g. local activities, timeouts) handed to every new OrderWorkflow,
+# with start-to-close timeouts tightened from observed latency when ADAPTIVE_TIMEOUTS is on
+timeouts = AdaptiveTimeouts(workflow_config(), TimeoutBounds.from_env())
+# Rate limit and order-tq backlog checks in front of every start
+admission = Admission(AdmissionConfig.from_env(), all_queues(ORDER_QUEUE))
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not the raw path, to keep cardinality bounded
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(request.method, getattr(route, "path", "unmatched"), str(status)).observe(
+            time.perf_counter() - started
+        )
 
 
 async def get_temporal() -> client.Client:
@@ -16,7 +92,11 @@ async def get_temporal() -> client.Client:
     if _temporal is None:
         target = os.getenv("TEMPORAL_SERVER", "localhost:7233")
         logger.info("temporal.connect", target=target)
-        _temporal = await client.Client.connect(target)
+        _temporal = await client.Client.connect(
+            target,
+            interceptors=[ClientMetricsInterceptor(), *temporal_interceptors()],
+            data_converter=data_converter(),
+        )
     return _temporal
 
 
@@ -25,14 +105,17 @@ async def health() -> dict:
     return {"status": "ok"}
 
 
-@app.post("/orders/{order_id}/start")
-async def start_order(order_id: str, payment_id: str | None = None) -> dict:
-    c = await get_temporal()
+@app.get("/metrics")
+async def metrics() -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def normalize_start_ids(order_id: str, payment_id: str | None) -> tuple[str, str]:
     # Validate/generate UUIDs
     try:
-        order_uuid = uuid.UUID(order_id)
+        order_uuid = str(uuid.UUID(order_id))
     except ValueError:
-        order_uuid = uuid.uuid4()
+        order_uuid = str(uuid.uuid4())
     if payment_id is None:
         payment_id = str(uuid.uuid4())
     else:
@@ -40,58 +123,270 @@ async def start_order(order_id: str, payment_id: str | None = None) -> dict:
             uuid.UUID(payment_id)
         except ValueError:
             payment_id = str(uuid.uuid4())
+    return order_uuid, payment_id
+
+
+async def start_order_workflow(
+    c: client.Client, order_uuid: str, payment_id: str, tenant: str | None = None
+) -> client.WorkflowHandle:
+    config = timeouts.config
+    args = [order_uuid, payment_id] if config is None else [order_uuid, payment_id, config]
     handle = await c.start_workflow(
         "OrderWorkflow",
-        str(order_uuid),
-        payment_id,
+        args=args,
         id=f"order-{order_uuid}",
-        task_queue="order-tq",
+        task_queue=route(order_uuid, tenant),
         run_timeout=timedelta(seconds=15),
     )
-    logger.info("workflow.started", workflow_id=handle.id, order_id=str(order_uuid))
-    return {"order_id": str(order_uuid), "payment_id": payment_id, "workflow_id": handle.id}
+    logger.info("workflow.started", workflow_id=handle.id, order_id=order_uuid)
+    return handle
 
 
-@app.post("/orders/{order_id}/signals/cancel")
-async def cancel_order(order_id: str) -> dict:
+async def start_pending(order_uuid: str, payment_id: str, tenant: str | None) -> None:
+    try:
+        await start_order_workflow(await get_temporal(), order_uuid, payment_id, tenant)
+    except WorkflowAlreadyStartedError:
+        pass
+
+
+async def defer_start(order_uuid: str, payment_id: str, tenant: str | None = None) -> None:
+    await db.enqueue_pending_start(order_uuid, payment_id, tenant)
+    logger.info("workflow.start_deferred", order_id=order_uuid)
+
+
+# Declared before /orders/{order_id}/start so "batch" is not taken as an order id
+@app.post("/orders/batch/start")
+async def start_orders_batch(request: Request) -> dict:
+    """Start one OrderWorkflow per item of a JSON array or NDJSON stream.
+
+    Items are order id strings or {"order_id": ..., "payment_id": ..., "tenant": ...} objects.
+    Starts run concurrently, bounded by BATCH_CONCURRENCY, and each item gets
+    its own result so one conflict or failure does not fail the batch. Items
+    that admission control turns away are reported as rejected or deferred.
+    """
+    c = await get_temporal()
+
+    async def start_one(item: dict) -> dict:
+        order_uuid, payment_id = normalize_start_ids(item["order_id"], item.get("payment_id"))
+        result = {"requested_id": item["order_id"], "order_id": order_uuid, "payment_id": payment_id}
+        wait = admission.check()
+        if wait > 0:
+            if admission.cfg.overload != DEFER:
+                return {**result, "status": "rejected", "retry_after": admission.retry_after(wait)}
+            await defer_start(order_uuid, payment_id, item.get("tenant"))
+            return {**result, "workflow_id": f"order-{order_uuid}", "status": "deferred"}
+        try:
+            handle = await start_order_workflow(c, order_uuid, payment_id, item.get("tenant"))
+            return {**result, "workflow_id": handle.id, "status": "started"}
+        except WorkflowAlreadyStartedError:
+            return {**result, "workflow_id": f"order-{order_uuid}", "status": "already_started"}
+        except Exception as e:
+            logger.warning("workflow.start_failed", order_id=order_uuid, error=str(e))
+            return {**result, "status": "error", "error": str(e)}
+
+    results = await bounded_map(read_items(request), start_one, batch_concurrency())
+    counts = Counter(r["status"] for r in results)
+    logger.info("workflow.batch_started", total=len(results), **counts)
+    return {
+        "results": results,
+        "started": counts["started"],
+        "already_started": counts["already_started"],
+        "deferred": counts["deferred"],
+        "rejected": counts["rejected"],
+        "failed": counts["error"],
+    }
+
+
+@app.post("/orders/{order_id}/start")
+async def start_order(order_id: str, payment_id: str | None = None, tenant: str | None = None) -> Any:
+    """Start an OrderWorkflow, unless admission control turns the request away.
+
+    `tenant`, when given, picks the task-queue shard instead of the order id.
+
+    When the start is not admitted the response is a 429 with Retry-After, or
+    with ADMISSION_OVERLOAD=defer a 202 once the start is queued in pending_starts.
+    """
+    order_uuid, payment_id = normalize_start_ids(order_id, payment_id)
+    wait = admission.check()
+    if wait > 0:
+        if admission.cfg.overload != DEFER:
+            logger.info("workflow.start_rejected", order_id=order_uuid, retry_after=wait)
+            raise HTTPException(
+                status_code=429, detail="order starts are being throttled", headers={"Retry-After": admission.retry_after(wait)}
+            )
+        await defer_start(order_uuid, payment_id, tenant)
+        return JSONResponse(
+            {"order_id": order_uuid, "payment_id": payment_id, "workflow_id": f"order-{order_uuid}", "deferred": True},
+            status_code=202,
+        )
     c = await get_temporal()
+    handle = await start_order_workflow(c, order_uuid, payment_id, tenant)
+    return {"order_id": order_uuid, "payment_id": payment_id, "workflow_id": handle.id}
+
+
+# Signal endpoint names mapped to OrderWorkflow signal names
+ORDER_SIGNALS = {"cancel": "CancelOrder", "update_address": "UpdateAddress"}
+
+
+def workflow_order_id(order_id: str) -> str:
     # Accept either raw UUID or previous prefix format
+    try:
+        return str(uuid.UUID(order_id))
+    except ValueError:
+        return order_id
+
+
+def parse_address(value: Any, order_id: str) -> dict:
+    """The address as the workflow will apply it; 422 rather than silently dropping fields Address lacks."""
+    try:
+        return asdict(Address.parse(value))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"invalid address for order {order_id}: {e}")
+
+
+async def send_order_signal(c: client.Client, order_id: str, signal: str, *args: Any) -> None:
+    handle = c.get_workflow_handle(f"order-{workflow_order_id(order_id)}")
+    await handle.signal(ORDER_SIGNALS[signal], *args)
+    logger.info("workflow.signal.sent", workflow_id=handle.id, signal=ORDER_SIGNALS[signal])
+
+
+async def record_address(order_id: str, address: dict) -> None:
+    """Mirror an accepted UpdateAddress into the orders projection; the workflow keeps it if this fails."""
     try:
         order_uuid = str(uuid.UUID(order_id))
     except ValueError:
-        order_uuid = order_id
+        # Legacy non-UUID ids have no orders row
+        return
+    try:
+        # No row yet means ReceiveOrder is still running; ValidateOrder records the address then
+        await db.update_order_address(order_uuid, address)
+        invalidate_projected_status(order_uuid)
+    except Exception as e:
+        logger.warning("projection.address_write_failed", order_id=order_id, error=str(e))
+
+
+async def workflow_close_status(order_uuid: str) -> client.WorkflowExecutionStatus | None:
+    c = await get_temporal()
+    return (await c.get_workflow_handle(f"order-{order_uuid}").describe()).status
+
+
+async def resolve_status(order_id: str, consistent: bool) -> dict:
+    order_uuid = workflow_order_id(order_id)
+    # Serve from the DB projection unless the caller asks for the live workflow state
+    if not consistent:
+        status = await get_projected_status(order_uuid, lambda: workflow_close_status(order_uuid))
+        if status is not None:
+            return {"order_id": order_id, "status": status, "source": "projection"}
+    c = await get_temporal()
     handle = c.get_workflow_handle(f"order-{order_uuid}")
-    await handle.signal("CancelOrder")
-    logger.info("workflow.signal.sent", workflow_id=handle.id, signal="CancelOrder")
+    status = await handle.query("status")
+    if status.get("state") not in TERMINAL_STATES:
+        # A closed run still answers the query with the state it had reached
+        close_status = (await handle.describe()).status
+        if close_status in FAILED_CLOSE_STATUSES:
+            status = failed_status(status, close_status)
+    logger.info("workflow.status", workflow_id=handle.id, status=status)
+    return {"order_id": order_id, "status": status, "source": "workflow"}
+
+
+@app.post("/orders/status:batch")
+async def get_status_batch(request: Request, consistent: bool = False) -> StreamingResponse:
+    """Status for many orders, streamed as NDJSON lines in completion order.
+
+    A lookup that fails yields {"order_id", "error"} for that id only.
+    """
+    items = [item async for item in read_items(request)]
+
+    async def status_one(item: dict) -> dict:
+        try:
+            return await resolve_status(item["order_id"], item.get("consistent", consistent))
+        except Exception as e:
+            return {"order_id": item["order_id"], "error": str(e)}
+
+    return ndjson_response(bounded_as_completed(items, status_one, batch_concurrency()))
+
+
+@app.post("/orders/signals:batch")
+async def signal_batch(request: Request, signal: str | None = None) -> StreamingResponse:
+    """Send cancel/update_address to many orders, streamed as NDJSON lines in completion order.
+
+    Items are order id strings or {"order_id", "signal", "address"} objects; the
+    `signal` query parameter applies to items that do not name their own.
+    """
+    c = await get_temporal()
+    items = [item async for item in read_items(request)]
+    for item in items:
+        name = item.get("signal", signal)
+        if name not in ORDER_SIGNALS:
+            raise HTTPException(status_code=422, detail=f"unknown signal {name!r} for order {item['order_id']}")
+        if name == "update_address":
+            if "address" not in item:
+                raise HTTPException(status_code=422, detail=f"update_address needs an address for order {item['order_id']}")
+            item["address"] = parse_address(item["address"], item["order_id"])
+
+    async def signal_one(item: dict) -> dict:
+        name = item.get("signal", signal)
+        args = (item["address"],) if name == "update_address" else ()
+        try:
+            await send_order_signal(c, item["order_id"], name, *args)
+            if name == "update_address":
+                await record_address(item["order_id"], item["address"])
+            return {"order_id": item["order_id"], "signal": name, "sent": True}
+        except Exception as e:
+            return {"order_id": item["order_id"], "signal": name, "sent": False, "error": str(e)}
+
+    return ndjson_response(bounded_as_completed(items, signal_one, batch_concurrency()))
+
+
+@app.post("/orders/{order_id}/signals/cancel")
+async def cancel_order(order_id: str) -> dict:
+    c = await get_temporal()
+    await send_order_signal(c, order_id, "cancel")
     return {"order_id": order_id, "signal": "cancel", "sent": True}
 
 
 @app.post("/orders/{order_id}/signals/update_address")
 async def update_address(order_id: str, address: dict) -> dict:
+    address = parse_address(address, order_id)
     c = await get_temporal()
-    try:
-        order_uuid = str(uuid.UUID(order_id))
-    except ValueError:
-        order_uuid = order_id
-    handle = c.get_workflow_handle(f"order-{order_uuid}")
-    await handle.signal("UpdateAddress", address)
-    logger.info("workflow.signal.sent", workflow_id=handle.id, signal="UpdateAddress")
+    await send_order_signal(c, order_id, "update_address", address)
+    await record_address(order_id, address)
     return {"order_id": order_id, "signal": "update_address", "address": address, "sent": True}
 
 
 @app.get("/orders/{order_id}/status")
-async def get_status(order_id: str) -> dict:
-    c = await get_temporal()
+async def get_status(order_id: str, consistent: bool = False) -> dict:
     try:
-        try:
-            order_uuid = str(uuid.UUID(order_id))
-        except ValueError:
-            order_uuid = order_id
-        handle = c.get_workflow_handle(f"order-{order_uuid}")
-        status = await handle.query("status")
-        logger.info("workflow.status", workflow_id=handle.id, status=status)
-        return {"order_id": order_id, "status": status}
+        return await resolve_status(order_id, consistent)
     except Exception as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 
+@app.get("/orders/{order_id}/stream")
+async def stream_status(order_id: str) -> StreamingResponse:
+    """Server-Sent Events: the current status, then one `status` event per state change.
+
+    The stream ends after a terminal state (completed/cancelled); a lookup
+    failure ends it with an `error` event.
+    """
+    order_uuid = workflow_order_id(order_id)
+    return sse_response(order_id, status_updates(order_uuid, lambda: resolve_status(order_id, consistent=False)))
+
+
+@app.get("/orders/{order_id}/events")
+async def get_events(order_id: str, after: str | None = None, limit: int = 100) -> StreamingResponse:
+    """An order's events, oldest first, one page per call.
+
+    Pass the returned `next_after` as `after` for the next page; it is null on the last page.
+    """
+    try:
+        order_uuid = str(uuid.UUID(order_id))
+    except ValueError:
+        raise HTTPException(status_code=422, detail="order_id must be a UUID")
+    if not 1 <= limit <= page_max():
+        raise HTTPException(status_code=422, detail=f"limit must be between 1 and {page_max()}")
+    try:
+        cursor = decode_cursor(after) if after else None
+    except ValueError:
+        raise HTTPException(status_code=422, detail="invalid after cursor")
+    return timeline_response(order_uuid, cursor, limit)
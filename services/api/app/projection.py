@@ -0,0 +1,101 @@
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import structlog
+from temporalio.client import WorkflowExecutionStatus
+from trellis_common import db
+from trellis_common.cache import TTLCache
+
+
+logger = structlog.get_logger()
+
+# orders.state is written by activities; translate it to the OrderWorkflow.status vocabulary.
+# Each DB state is recorded as a step completes, so the workflow has already moved on to the next one.
+WORKFLOW_STATES = {
+    "received": "validating",
+    "validated": "manual_review",
+    "paid": "shipping",
+    "shipped": "completed",
+    "cancelled": "cancelled",
+}
+
+# Runs that closed without completing or cancelling; no activity records these in orders.state
+FAILED_CLOSE_STATUSES = frozenset(
+    {WorkflowExecutionStatus.FAILED, WorkflowExecutionStatus.TERMINATED, WorkflowExecutionStatus.TIMED_OUT}
+)
+TERMINAL_STATES = frozenset({"completed", "cancelled", "failed"})
+
+
+def close_check_after() -> float:
+    """Seconds a non-terminal row may sit unchanged before the workflow's close status is checked."""
+    return float(os.getenv("STATUS_CLOSE_CHECK_AFTER", "30"))
+
+
+_cache = TTLCache(
+    ttl=float(os.getenv("STATUS_CACHE_TTL", "1.0")),
+    max_entries=int(os.getenv("STATUS_CACHE_MAX_ENTRIES", "10000")),
+)
+
+
+def to_status(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape an orders row like the OrderWorkflow.status query result."""
+    state = WORKFLOW_STATES.get(row["state"], row["state"])
+    return {
+        "state": state,
+        "order": {"order_id": row["order_id"]},
+        "address": row["address"],
+        "cancelled": state == "cancelled",
+        "updated_at": row["updated_at"].isoformat() if row["updated_at"] else None,
+    }
+
+
+def failed_status(status: Dict[str, Any], close_status: WorkflowExecutionStatus) -> Dict[str, Any]:
+    """`status` for a run that closed with one of FAILED_CLOSE_STATUSES."""
+    return {**status, "state": "failed", "close_status": close_status.name.lower()}
+
+
+async def get_projected_status(
+    order_uuid: str, close_status: Optional[Callable[[], Awaitable[Optional[WorkflowExecutionStatus]]]] = None
+) -> Optional[Dict[str, Any]]:
+    """Status from the orders read model, or None if the order has no row yet.
+
+    A row that is not terminal and has not changed for `close_check_after()`
+    seconds may belong to a run that failed, was terminated or timed out;
+    `close_status` is then asked how the run ended.
+    """
+    try:
+        uuid.UUID(order_uuid)
+    except ValueError:
+        return None
+    cached = _cache.get(order_uuid)
+    if cached is not None:
+        return cached
+    try:
+        row = await db.get_order(order_uuid)
+    except Exception as e:
+        logger.warning("projection.read_failed", order_id=order_uuid, error=str(e))
+        return None
+    if row is None:
+        return None
+    status = to_status(row)
+    if close_status is not None and status["state"] not in TERMINAL_STATES and _stale(row):
+        try:
+            ended = await close_status()
+        except Exception as e:
+            logger.warning("projection.close_status_failed", order_id=order_uuid, error=str(e))
+        else:
+            if ended in FAILED_CLOSE_STATUSES:
+                status = failed_status(status, ended)
+    _cache.set(order_uuid, status)
+    return status
+
+
+def _stale(row: Dict[str, Any]) -> bool:
+    updated_at = row["updated_at"]
+    return updated_at is None or (datetime.now(timezone.utc) - updated_at).total_seconds() >= close_check_after()
+
+
+def invalidate_projected_status(order_uuid: str) -> None:
+    _cache.invalidate(order_uuid)
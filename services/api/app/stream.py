@@ -0,0 +1,140 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+import psycopg
+import structlog
+from fastapi.responses import StreamingResponse
+from trellis_common import db, serialization
+
+from services.api.app.projection import TERMINAL_STATES, get_projected_status, invalidate_projected_status
+
+
+logger = structlog.get_logger()
+
+
+def heartbeat_interval() -> float:
+    return float(os.getenv("STATUS_STREAM_HEARTBEAT", "15"))
+
+
+class StatusHub:
+    """Fans event notifications out to this process's status subscribers.
+
+    One LISTEN connection serves every subscriber: each notification is turned
+    into a single projection read, published to everyone watching that order.
+    Notifications also drop the order's cached status so polled reads see it.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @asynccontextmanager
+    async def subscribe(self, order_uuid: str) -> AsyncIterator[asyncio.Queue]:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen(), name="status-hub")
+        # Only the latest status matters, so a slow reader keeps one pending update
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self._subscribers.setdefault(order_uuid, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(order_uuid)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[order_uuid]
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self) -> None:
+        delay = 1.0
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(db.database_url(), autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {db.EVENTS_CHANNEL}")
+                    logger.info("status_hub.listening", channel=db.EVENTS_CHANNEL)
+                    delay = 1.0
+                    # Anything sent while we were not listening is lost; refresh current subscribers
+                    for order_uuid in list(self._subscribers):
+                        await self._publish(order_uuid)
+                    async for notify in conn.notifies():
+                        await self._dispatch(notify.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("status_hub.listen_failed", error=str(e), retry_in=delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+    async def _dispatch(self, payload: str) -> None:
+        try:
+            order_uuid = serialization.loads(payload)["order_id"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning("status_hub.bad_payload", payload=payload)
+            return
+        invalidate_projected_status(order_uuid)
+        if order_uuid in self._subscribers:
+            await self._publish(order_uuid)
+
+    async def _publish(self, order_uuid: str) -> None:
+        status = await get_projected_status(order_uuid)
+        if status is None:
+            return
+        update = {"order_id": order_uuid, "status": status, "source": "projection"}
+        for queue in self._subscribers.get(order_uuid, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(update)
+
+
+hub = StatusHub()
+
+
+async def status_updates(
+    order_uuid: str, initial: Callable[[], Awaitable[Dict[str, Any]]]
+) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """The current status, then each change of state until a terminal one; None marks a heartbeat."""
+    async with hub.subscribe(order_uuid) as queue:
+        update = await initial()
+        yield update
+        state = update["status"].get("state")
+        while state not in TERMINAL_STATES:
+            try:
+                update = await asyncio.wait_for(queue.get(), heartbeat_interval())
+            except asyncio.TimeoutError:
+                # A run that fails, is terminated or times out writes no event, so nothing is notified
+                update = await initial()
+                if update["status"].get("state") == state:
+                    yield None
+                    continue
+            if update["status"].get("state") != state:
+                state = update["status"].get("state")
+                yield update
+
+
+def sse_response(order_id: str, updates: AsyncIterator[Optional[Dict[str, Any]]]) -> StreamingResponse:
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            async for update in updates:
+                if update is None:
+                    yield b": keepalive\n\n"
+                else:
+                    yield b"event: status\ndata: " + serialization.dumps(update) + b"\n\n"
+        except Exception as e:
+            yield b"event: error\ndata: " + serialization.dumps({"order_id": order_id, "error": str(e)}) + b"\n\n"
+
+    # X-Accel-Buffering stops nginx-style proxies from holding events back
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
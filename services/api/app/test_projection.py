@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from temporalio.client import WorkflowExecutionStatus
+from trellis_common import db
+
+from services.api.app import projection
+
+
+ORDER_ID = "6f1c1b4e-8d1a-4c53-9d0e-2a4c7c1e9b10"
+
+
+@pytest.fixture
+def order_row(monkeypatch):
+    row = {"order_id": ORDER_ID, "state": "paid", "address": None, "updated_at": datetime.now(timezone.utc)}
+
+    async def get_order(order_id):
+        return dict(row)
+
+    monkeypatch.setattr(db, "get_order", get_order)
+    projection.invalidate_projected_status(ORDER_ID)
+    yield row
+    projection.invalidate_projected_status(ORDER_ID)
+
+
+def close_status(status):
+    calls = []
+
+    async def describe():
+        calls.append(status)
+        return status
+
+    return describe, calls
+
+
+def test_db_states_map_to_workflow_states():
+    now = datetime.now(timezone.utc)
+    row = {"order_id": ORDER_ID, "address": None, "updated_at": now}
+    assert projection.to_status({**row, "state": "paid"})["state"] == "shipping"
+    assert projection.to_status({**row, "state": "shipped"})["state"] == "completed"
+    assert projection.to_status({**row, "state": "cancelled"})["cancelled"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "ended", [WorkflowExecutionStatus.FAILED, WorkflowExecutionStatus.TERMINATED, WorkflowExecutionStatus.TIMED_OUT]
+)
+async def test_stale_row_of_a_failed_run_is_failed(order_row, ended):
+    order_row["updated_at"] -= timedelta(seconds=projection.close_check_after())
+    describe, _ = close_status(ended)
+    status = await projection.get_projected_status(ORDER_ID, describe)
+    assert (status["state"], status["close_status"]) == ("failed", ended.name.lower())
+    assert "failed" in projection.TERMINAL_STATES
+
+
+@pytest.mark.asyncio
+async def test_recent_or_running_rows_keep_their_state(order_row):
+    describe, calls = close_status(WorkflowExecutionStatus.FAILED)
+    assert (await projection.get_projected_status(ORDER_ID, describe))["state"] == "shipping"
+    assert not calls
+    projection.invalidate_projected_status(ORDER_ID)
+    order_row["updated_at"] -= timedelta(seconds=projection.close_check_after())
+    describe, calls = close_status(WorkflowExecutionStatus.RUNNING)
+    assert (await projection.get_projected_status(ORDER_ID, describe))["state"] == "shipping"
+    assert calls
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from services.api.app import stream
+
+
+ORDER_ID = "6f1c1b4e-8d1a-4c53-9d0e-2a4c7c1e9b10"
+
+
+def update(state):
+    return {"order_id": ORDER_ID, "status": {"state": state}, "source": "projection"}
+
+
+async def collect(updates):
+    # Bounded, so a stream that never ends fails the test instead of hanging it
+    async def drain():
+        return [u async for u in updates]
+
+    return await asyncio.wait_for(drain(), 5)
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    async def listen(self):
+        await asyncio.Event().wait()
+
+    # No Postgres here: the hub only fans out what the test puts on subscriber queues
+    monkeypatch.setattr(stream.StatusHub, "_listen", listen)
+    monkeypatch.setenv("STATUS_STREAM_HEARTBEAT", "0.01")
+    return stream.hub
+
+
+@pytest.mark.asyncio
+async def test_stream_ends_on_a_failed_order(hub):
+    async def resolve():
+        return update("shipping")
+
+    async def fail():
+        while ORDER_ID not in hub._subscribers:
+            await asyncio.sleep(0)
+        for queue in hub._subscribers[ORDER_ID]:
+            queue.put_nowait(update("failed"))
+
+    failing = asyncio.create_task(fail())
+    updates = [u for u in await collect(stream.status_updates(ORDER_ID, resolve)) if u is not None]
+    await failing
+    await hub.stop()
+    assert updates == [update("shipping"), update("failed")]
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_notices_a_failure_that_wrote_no_event(hub):
+    states = iter(["shipping", "shipping", "failed"])
+
+    async def resolve():
+        return update(next(states))
+
+    updates = await collect(stream.status_updates(ORDER_ID, resolve))
+    await hub.stop()
+    assert updates == [update("shipping"), None, update("failed")]
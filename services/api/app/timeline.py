@@ -0,0 +1,39 @@
+import base64
+import os
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from fastapi.responses import StreamingResponse
+from trellis_common import db, serialization
+
+
+def page_max() -> int:
+    return int(os.getenv("EVENTS_PAGE_MAX", "1000"))
+
+
+def encode_cursor(ts: datetime, event_id: uuid.UUID | str) -> str:
+    return base64.urlsafe_b64encode(f"{ts.isoformat()}|{event_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """Inverse of encode_cursor; raises ValueError for anything it did not produce."""
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    ts, _, event_id = raw.partition("|")
+    return datetime.fromisoformat(ts), str(uuid.UUID(event_id))
+
+
+async def _timeline(order_id: str, after: Optional[tuple[datetime, str]], limit: int) -> AsyncIterator[bytes]:
+    # One JSON document written row by row; the cursor is only known once the page is done
+    yield b'{"order_id":' + serialization.dumps(order_id) + b',"events":['
+    count, last = 0, None
+    async for event_id, event_type, payload, ts in db.stream_order_events(order_id, after, limit):
+        event = {"id": str(event_id), "type": event_type, "payload": payload, "ts": ts.isoformat()}
+        yield (b"," if count else b"") + serialization.dumps(event)
+        count, last = count + 1, (ts, event_id)
+    next_after = encode_cursor(*last) if last is not None and count == limit else None
+    yield b'],"next_after":' + serialization.dumps(next_after) + b"}"
+
+
+def timeline_response(order_id: str, after: Optional[tuple[datetime, str]], limit: int) -> StreamingResponse:
+    return StreamingResponse(_timeline(order_id, after, limit), media_type="application/json")
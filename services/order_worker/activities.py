@@ -1,46 +1,107 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Any, Dict
-
+import os
+from dataclasses import asdict
+from datetime import timedelta
 from temporalio import activity
+from temporalio.exceptions import ApplicationError
 from trellis_common.business_logic import (
     order_received,
     order_validated,
     payment_charged,
 )
 from trellis_common import db
+from trellis_common.cache import LRUCache
+from trellis_common.models import Order, PaymentResult
 
 
 @activity.defn(name="ReceiveOrder")
-async def receive_order_activity(order_id: str) -> Dict[str, Any]:
+async def receive_order_activity(order_id: str, hedged: bool = False) -> Order:
     result = await order_received(order_id)
-    oid = result.get("order_id", order_id)
-    db.upsert_order(oid, state="received")
-    db.insert_event(oid, "order_received", {"result": result})
+    try:
+        async with db.unit_of_work() as uow:
+            if hedged:
+                # Whichever of the two attempts commits second writes nothing
+                uow.claim_step(result.order_id, activity.info().workflow_run_id, "ReceiveOrder")
+            uow.upsert_order(result.order_id, state="received")
+            uow.insert_event(result.order_id, "order_received", {"result": result})
+    except db.StepAlreadyCompleted:
+        pass
     return result
 
 
 @activity.defn(name="ValidateOrder")
-async def validate_order_activity(order: Dict[str, Any]) -> bool:
+async def validate_order_activity(order: Order, hedged: bool = False) -> bool:
+    # Unhedged calls leave out the flag, and the SDK then drops every type hint
+    if isinstance(order, dict):
+        order = Order.from_dict(order)
     ok = await order_validated(order)
-    db.update_order_state(order["order_id"], state="validated")
-    db.insert_event(order["order_id"], "order_validated", {"ok": ok})
+    try:
+        async with db.unit_of_work() as uow:
+            if hedged:
+                uow.claim_step(order.order_id, activity.info().workflow_run_id, "ValidateOrder")
+            uow.update_order_state(order.order_id, state="validated")
+            if order.address is not None:
+                # An address signalled before ReceiveOrder finished, which the API could not record yet
+                uow.update_order_address(order.order_id, asdict(order.address))
+            uow.insert_event(order.order_id, "order_validated", {"ok": ok})
+    except db.StepAlreadyCompleted:
+        pass
     return ok
 
 
+# Payment ids this worker has seen charged; a retry after a timeout returns without a DB round trip
+_charged_payments = LRUCache(int(os.getenv("PAYMENT_CACHE_MAX_ENTRIES", "10000")))
+
+
 @activity.defn(name="ChargePayment")
-async def charge_payment_activity(order: Dict[str, Any], payment_id: str) -> Dict[str, Any]:
-    # Idempotency via payments.payment_id unique key
-    existing = db.get_payment_status(payment_id)
-    if existing == "charged":
-        amount = sum(i.get("qty", 1) for i in order.get("items", []))
-        return {"status": "charged", "amount": amount, "idempotent": True}
-    result = await payment_charged(order, payment_id)
-    amount = int(result.get("amount", 0))
-    db.upsert_payment(payment_id, order_id=order["order_id"], status="charged", amount=amount)
-    db.update_order_state(order["order_id"], state="paid")
-    db.insert_event(order["order_id"], "payment_charged", {"payment_id": payment_id, "amount": amount})
+async def charge_payment_activity(order: Order, payment_id: str) -> PaymentResult:
+    amount = _charged_payments.get(payment_id)
+    if amount is not None:
+        return PaymentResult(payment_id=payment_id, amount=amount, idempotent=True)
+    # Idempotency via the payments ledger: only the attempt holding the claim may charge
+    lease = activity.info().start_to_close_timeout or timedelta(seconds=float(os.getenv("PAYMENT_CLAIM_LEASE", "30")))
+    claim = await db.claim_payment(payment_id, order.order_id, lease.total_seconds())
+    if claim.prior_status == "charged":
+        _charged_payments.set(payment_id, claim.amount)
+        return PaymentResult(payment_id=payment_id, amount=claim.amount, idempotent=True)
+    if not claim.claimed:
+        raise ApplicationError(f"payment {payment_id} is being charged by another attempt", type="PaymentClaimHeld")
+    try:
+        result = await payment_charged(order, payment_id)
+    except Exception:
+        # Nothing was charged: let the retry claim it now rather than fail with PaymentClaimHeld until the lease ends
+        try:
+            await db.release_payment(payment_id)
+        except Exception as e:
+            activity.logger.warning("Could not release the claim on payment %s: %s", payment_id, e)
+        raise
+    _charged_payments.set(payment_id, result.amount)
+    try:
+        async with db.unit_of_work() as uow:
+            uow.complete_payment(payment_id, result.amount)
+            uow.update_order_state(order.order_id, state="paid")
+            uow.insert_event(order.order_id, "payment_charged", {"payment_id": payment_id, "amount": result.amount})
+    except Exception:
+        # The charge went through, so record just that; the retry then sees prior_status instead of charging again
+        try:
+            await db.complete_payment(payment_id, result.amount)
+        except Exception as e:
+            activity.logger.warning("Could not mark payment %s charged: %s", payment_id, e)
+        raise
     return result
 
 
+@activity.defn(name="RecordShipment")
+async def record_shipment_activity(order_id: str) -> None:
+    async with db.unit_of_work() as uow:
+        uow.update_order_state(order_id, state="shipped")
+        uow.insert_event(order_id, "order_shipped", {})
+
+
+@activity.defn(name="RecordCancellation")
+async def record_cancellation_activity(order_id: str) -> None:
+    async with db.unit_of_work() as uow:
+        uow.update_order_state(order_id, state="cancelled")
+        uow.insert_event(order_id, "order_cancelled", {})
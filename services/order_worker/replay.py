@@ -0,0 +1,88 @@
+"""Replay recorded OrderWorkflow/ShippingWorkflow histories and measure the cost.
+
+Fixtures in `histories/` are written by `scripts/replay_histories.py record`, one
+JSON file per scenario holding the parent's and every shipping child's history.
+Replaying them with the current workflow code catches nondeterministic changes.
+The time and Python heap a replay takes approximate the workflow-task cost of
+rebuilding a workflow after it drops out of the sticky cache. The Rust core's
+own memory is not seen by tracemalloc.
+"""
+
+import json
+import os
+import time
+import tracemalloc
+from pathlib import Path
+from typing import NamedTuple
+
+from temporalio.client import WorkflowHistory
+from temporalio.worker import Replayer
+from trellis_common.serialization import data_converter
+
+from services.order_worker.workflows import OrderWorkflow
+from services.shipping_worker.workflows import ShippingWorkflow
+
+
+HISTORIES_DIR = Path(__file__).parent / "histories"
+
+# Scenarios `scripts/replay_histories.py record` writes; test_replay fails when one is missing
+SCENARIO_NAMES = ("happy", "cancel", "address", "dispatch_retry")
+
+
+class ReplayStats(NamedTuple):
+    scenario: str
+    workflow_id: str
+    events: int
+    seconds: float
+    peak_bytes: int
+
+
+def replay_budget() -> tuple[float, int]:
+    """Per-workflow ceilings from REPLAY_BUDGET_MS (250) and REPLAY_BUDGET_KB (16384)."""
+    return float(os.getenv("REPLAY_BUDGET_MS", "250")) / 1000, int(os.getenv("REPLAY_BUDGET_KB", "16384")) * 1024
+
+
+def replayer() -> Replayer:
+    return Replayer(workflows=[OrderWorkflow, ShippingWorkflow], data_converter=data_converter())
+
+
+def fixture_paths(directory: Path = HISTORIES_DIR) -> list[Path]:
+    return sorted(directory.glob("*.json"))
+
+
+def load_fixture(path: Path) -> list[WorkflowHistory]:
+    with open(path) as f:
+        recorded = json.load(f)
+    return [WorkflowHistory.from_json(w["workflow_id"], w["history"]) for w in recorded["workflows"]]
+
+
+def write_fixture(path: Path, scenario: str, histories: list[WorkflowHistory]) -> None:
+    recorded = {
+        "scenario": scenario,
+        "workflows": [{"workflow_id": h.workflow_id, "history": json.loads(h.to_json())} for h in histories],
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(recorded, f, indent=1)
+        f.write("\n")
+
+
+async def measure(r: Replayer, scenario: str, history: WorkflowHistory, repeat: int = 5) -> ReplayStats:
+    """Replay `history` once to warm the sandbox, then keep the fastest of `repeat` timed runs.
+
+    Memory is taken from a separate traced run, since tracing slows the replay.
+    Raises on nondeterminism or any other replay failure.
+    """
+    await r.replay_workflow(history)
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await r.replay_workflow(history)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        await r.replay_workflow(history)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return ReplayStats(scenario, history.workflow_id, len(history.events), best, peak)
@@ -0,0 +1,131 @@
+from contextlib import asynccontextmanager
+
+import pytest
+from temporalio.testing import ActivityEnvironment
+from trellis_common import db, faults, memory_db
+from trellis_common.cache import LRUCache
+from trellis_common.faults import PROFILES, FaultInjector, FaultProfile
+from trellis_common.models import Address, PaymentResult
+from trellis_common.serialization import dumps, loads
+
+from services.order_worker import activities
+from services.order_worker.activities import charge_payment_activity, receive_order_activity, validate_order_activity
+
+
+ORDER_ID = "6f1c1b4e-8d1a-4c53-9d0e-2a4c7c1e9b10"
+
+
+@pytest.fixture
+def mem():
+    faults.configure(FaultInjector(PROFILES["off"]))
+    try:
+        with memory_db.use() as mem:
+            yield mem
+    finally:
+        faults.configure(None)
+
+
+@pytest.mark.asyncio
+async def test_activities_record_state_and_events(mem):
+    env = ActivityEnvironment()
+    order = await env.run(receive_order_activity, ORDER_ID)
+    assert await env.run(validate_order_activity, order)
+    result = await env.run(charge_payment_activity, order, "pay-1")
+    assert (result.amount, result.idempotent) == (1, False)
+    assert mem.orders[ORDER_ID]["state"] == "paid"
+    assert mem.payments["pay-1"]["status"] == "charged"
+    assert [e[2] for e in mem.events] == ["order_received", "order_validated", "payment_charged"]
+
+
+@pytest.mark.asyncio
+async def test_validate_records_the_address_the_workflow_applied(mem):
+    env = ActivityEnvironment()
+    order = await env.run(receive_order_activity, ORDER_ID)
+    assert mem.orders[ORDER_ID]["address_json"] is None
+    order.address = Address(city="SF")
+    await env.run(validate_order_activity, order)
+    assert mem.orders[ORDER_ID]["address_json"]["city"] == "SF"
+    # A later ReceiveOrder upsert leaves it in place
+    await env.run(receive_order_activity, ORDER_ID)
+    assert mem.orders[ORDER_ID]["address_json"]["city"] == "SF"
+
+
+@pytest.mark.asyncio
+async def test_failed_charge_releases_its_claim(mem):
+    env = ActivityEnvironment()
+    order = await env.run(receive_order_activity, ORDER_ID)
+    faults.configure(FaultInjector(PROFILES["off"], steps={"payment_charged": FaultProfile(failure_rate=1.0)}))
+    with pytest.raises(RuntimeError):
+        await env.run(charge_payment_activity, order, "pay-3")
+    assert mem.payments["pay-3"]["claimed_until"] is None
+    # The retry charges instead of failing with PaymentClaimHeld
+    faults.configure(FaultInjector(PROFILES["off"]))
+    result = await env.run(charge_payment_activity, order, "pay-3")
+    assert (result.amount, result.idempotent) == (1, False)
+
+
+@pytest.mark.asyncio
+async def test_charge_is_not_repeated_when_its_commit_fails(mem, monkeypatch):
+    env = ActivityEnvironment()
+    order = await env.run(receive_order_activity, ORDER_ID)
+    charges = []
+
+    async def charge(order, payment_id):
+        charges.append(payment_id)
+        return PaymentResult(payment_id=payment_id, amount=1)
+
+    @asynccontextmanager
+    async def failing_unit_of_work():
+        yield memory_db.MemoryUnitOfWork(mem)
+        raise ConnectionError("connection lost during commit")
+
+    monkeypatch.setattr(activities, "payment_charged", charge)
+    monkeypatch.setattr(db, "unit_of_work", failing_unit_of_work)
+    with pytest.raises(ConnectionError):
+        await env.run(charge_payment_activity, order, "pay-4")
+    # The retry runs on another worker with the database back
+    monkeypatch.setattr(db, "unit_of_work", mem.unit_of_work)
+    monkeypatch.setattr(activities, "_charged_payments", LRUCache())
+    result = await env.run(charge_payment_activity, order, "pay-4")
+    assert (result.amount, result.idempotent) == (1, True)
+    assert charges == ["pay-4"]
+
+
+@pytest.mark.asyncio
+async def test_claim_held_by_another_attempt(mem):
+    claim = await mem.claim_payment("pay-2", ORDER_ID, 30)
+    assert claim.claimed
+    assert not (await mem.claim_payment("pay-2", ORDER_ID, 30)).claimed
+    async with mem.unit_of_work() as uow:
+        uow.complete_payment("pay-2", 5)
+    assert await mem.claim_payment("pay-2", ORDER_ID, 30) == ("charged", 5, False)
+
+
+@pytest.mark.asyncio
+async def test_second_hedged_attempt_of_a_step_writes_nothing(mem):
+    env = ActivityEnvironment()
+    order = await env.run(receive_order_activity, ORDER_ID, True)
+    # The hedge of a step that already committed
+    assert await env.run(receive_order_activity, ORDER_ID, True) == order
+    assert await env.run(validate_order_activity, order, True)
+    assert await env.run(validate_order_activity, order, True)
+    assert [e[2] for e in mem.events] == ["order_received", "order_validated"]
+    assert mem.completed_steps == {(ORDER_ID, "test-run", "ReceiveOrder"), (ORDER_ID, "test-run", "ValidateOrder")}
+
+
+@pytest.mark.asyncio
+async def test_unhedged_steps_claim_nothing(mem):
+    env = ActivityEnvironment()
+    await env.run(receive_order_activity, ORDER_ID)
+    await env.run(receive_order_activity, ORDER_ID)
+    assert not mem.completed_steps
+    assert [e[2] for e in mem.events] == ["order_received", "order_received"]
+
+
+@pytest.mark.asyncio
+async def test_validate_rebuilds_an_order_decoded_without_hints(mem):
+    env = ActivityEnvironment()
+    order = await env.run(receive_order_activity, ORDER_ID)
+    order.address = Address(city="SF")
+    await env.run(validate_order_activity, loads(dumps(order)))
+    assert mem.orders[ORDER_ID]["address_json"]["city"] == "SF"
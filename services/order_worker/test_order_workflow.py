@@ -1,24 +1,33 @@
 import pytest
 from temporalio.testing import WorkflowEnvironment
 from temporalio import client, worker
+from trellis_common.serialization import data_converter
 
 from services.order_worker.workflows import OrderWorkflow
 from services.order_worker.activities import (
     receive_order_activity,
     validate_order_activity,
     charge_payment_activity,
+    record_cancellation_activity,
+    record_shipment_activity,
 )
 
 
 @pytest.mark.asyncio
 async def test_order_workflow_happy_path():
-    async with await WorkflowEnvironment.start_time_skipping() as env:
+    async with await WorkflowEnvironment.start_time_skipping(data_converter=data_converter()) as env:
         c = await env.client()
         async with worker.Worker(
             c,
             task_queue="test-order-tq",
             workflows=[OrderWorkflow],
-            activities=[receive_order_activity, validate_order_activity, charge_payment_activity],
+            activities=[
+                receive_order_activity,
+                validate_order_activity,
+                charge_payment_activity,
+                record_cancellation_activity,
+                record_shipment_activity,
+            ],
         ):
             handle = await c.start_workflow(
                 OrderWorkflow.run,
@@ -0,0 +1,19 @@
+import pytest
+
+from services.order_worker.replay import HISTORIES_DIR, SCENARIO_NAMES, fixture_paths, load_fixture, measure, replay_budget, replayer
+
+
+# Expected scenarios are listed even when unrecorded, so a missing fixture fails instead of skipping
+FIXTURES = sorted({HISTORIES_DIR / f"{name}.json" for name in SCENARIO_NAMES} | set(fixture_paths()))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", FIXTURES, ids=[p.stem for p in FIXTURES])
+async def test_recorded_histories_replay_within_budget(path):
+    assert path.exists(), f"{path} is missing; record it with scripts/replay_histories.py record"
+    max_seconds, max_bytes = replay_budget()
+    r = replayer()
+    for history in load_fixture(path):
+        stats = await measure(r, path.stem, history, repeat=3)
+        assert stats.seconds <= max_seconds, stats
+        assert stats.peak_bytes <= max_bytes, stats
@@ -1,98 +1,138 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+import asyncio
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
 
 from temporalio import workflow
+from temporalio.common import RetryPolicy
+from temporalio.exceptions import ChildWorkflowError
 
-ManualReviewApproved = workflow.SignalChannel[str]
-CancelOrderSignal = workflow.SignalChannel[str]
+with workflow.unsafe.imports_passed_through():
+    from trellis_common.models import Address, Order, OrderItem, PaymentResult, WorkflowConfig
+    from trellis_common.sharding import SHIPPING_QUEUE, sibling_queue
+    from trellis_common.steps import run_step
 
 
 @workflow.defn(name="OrderWorkflow")
 class OrderWorkflow:
     def __init__(self) -> None:
         self.state: str = "starting"
-        self.order: Dict[str, Any] | None = None
-        self.address: Optional[Dict[str, Any]] = None
+        self.order: Optional[Order] = None
+        self.address: Optional[Address] = None
         self.cancelled: bool = False
         self.approved: bool = False
         self.dispatch_failures: int = 0
+        # Shipments the last shipping child reported as failed
+        self.failed_groups: List[Dict[str, Any]] = []
+        self.config: Optional[WorkflowConfig] = None
 
     @workflow.signal
     def CancelOrder(self) -> None:
         self.cancelled = True
 
     @workflow.signal
-    def UpdateAddress(self, address: Dict[str, Any]) -> None:
+    def UpdateAddress(self, address: Address) -> None:
         self.address = address
 
     @workflow.query
     def status(self) -> Dict[str, Any]:
-        return {"state": self.state, "order": self.order, "address": self.address, "cancelled": self.cancelled, "dispatch_failures": self.dispatch_failures}
+        return {"state": self.state, "order": self.order, "address": self.address, "cancelled": self.cancelled, "dispatch_failures": self.dispatch_failures, "failed_groups": self.failed_groups}
 
     @workflow.signal
     def DispatchFailed(self, payload: Dict[str, Any]) -> None:
         self.dispatch_failures += 1
+        self.failed_groups = payload.get("groups", [])
 
     @workflow.run
-    async def run(self, order_id: str, payment_id: str) -> str:
+    async def run(self, order_id: str, payment_id: str, config: Optional[WorkflowConfig] = None) -> str:
+        self.config = config
+        # Activities run on the (possibly sharded) queue this workflow was started on
+        task_queue = workflow.info().task_queue
         self.state = "receiving"
-        order = await workflow.execute_activity(
+        order = await run_step(
+            self.config,
             "ReceiveOrder",
             order_id,
-            schedule_to_close_timeout=5,
-            start_to_close_timeout=5,
-            retry_policy=workflow.RetryPolicy(maximum_attempts=3),
-            task_queue="order-tq",
+            schedule_to_close_timeout=timedelta(seconds=5),
+            start_to_close_timeout=timedelta(seconds=5),
+            retry_policy=RetryPolicy(maximum_attempts=3),
+            task_queue=task_queue,
+            result_type=Order,
         )
-        order["order_id"] = order.get("order_id", order_id)
         if self.address:
-            order["address"] = self.address
+            order.address = self.address
         self.order = order
 
         self.state = "validating"
-        await workflow.execute_activity(
+        await run_step(
+            self.config,
             "ValidateOrder",
             order,
-            schedule_to_close_timeout=5,
-            start_to_close_timeout=5,
-            retry_policy=workflow.RetryPolicy(maximum_attempts=3),
-            task_queue="order-tq",
+            schedule_to_close_timeout=timedelta(seconds=5),
+            start_to_close_timeout=timedelta(seconds=5),
+            retry_policy=RetryPolicy(maximum_attempts=3),
+            task_queue=task_queue,
         )
 
         # Manual review timer and approval window
         self.state = "manual_review"
-        timer = workflow.start_timer(2)
-        await timer
+        await asyncio.sleep(2)
         if self.cancelled:
+            # Older histories ended here without recording the cancellation in the DB
+            if workflow.patched("record-cancellation"):
+                await run_step(
+                    self.config,
+                    "RecordCancellation",
+                    order.order_id,
+                    schedule_to_close_timeout=timedelta(seconds=5),
+                    start_to_close_timeout=timedelta(seconds=5),
+                    retry_policy=RetryPolicy(maximum_attempts=3),
+                    task_queue=task_queue,
+                )
             self.state = "cancelled"
             return "cancelled"
 
         # Assume approval after timer for MVP
         self.state = "charging"
-        await workflow.execute_activity(
+        await run_step(
+            self.config,
             "ChargePayment",
             order,
             payment_id,
-            schedule_to_close_timeout=3,
-            start_to_close_timeout=3,
-            retry_policy=workflow.RetryPolicy(maximum_attempts=1),
-            task_queue="order-tq",
+            schedule_to_close_timeout=timedelta(seconds=3),
+            start_to_close_timeout=timedelta(seconds=3),
+            retry_policy=RetryPolicy(maximum_attempts=1),
+            task_queue=task_queue,
+            result_type=PaymentResult,
         )
 
         # Child workflow for shipping on separate task queue
         self.state = "shipping"
         # Retry shipping child once if it fails via our signal notification
         retries = 0
+        shipment = order
         while True:
-            result = await workflow.execute_child_workflow(
-                "ShippingWorkflow",
-                order,
-                id=f"ship-{order['order_id']}-{retries}",
-                task_queue="shipping-tq",
-                retry_policy=workflow.RetryPolicy(maximum_attempts=1),
-                execution_timeout=5,
-            )
+            try:
+                result = await workflow.execute_child_workflow(
+                    "ShippingWorkflow",
+                    # The config is only passed when set, so default runs keep the one-argument input
+                    args=[shipment, self.config] if self.config is not None else [shipment],
+                    id=f"ship-{order.order_id}-{retries}",
+                    task_queue=sibling_queue(task_queue, SHIPPING_QUEUE),
+                    retry_policy=RetryPolicy(maximum_attempts=1),
+                    execution_timeout=timedelta(seconds=5),
+                )
+            except ChildWorkflowError:
+                # Ship only what failed again; shipments that went out are not repeated
+                if retries >= 1 or not self.failed_groups or not workflow.patched("retry-failed-shipments"):
+                    raise
+                items = [OrderItem.from_dict(i) for g in self.failed_groups for i in g["items"]]
+                shipment = Order(order_id=order.order_id, items=items, address=order.address)
+                self.failed_groups = []
+                self.dispatch_failures = 0
+                retries += 1
+                continue
             if self.dispatch_failures == 0:
                 break
             # reset signal counter and retry once
@@ -101,6 +141,17 @@ class OrderWorkflow:
             if retries > 1:
                 break
 
+        # Older histories had DispatchCarrier mark the order shipped
+        if workflow.patched("record-shipment"):
+            await run_step(
+                self.config,
+                "RecordShipment",
+                order.order_id,
+                schedule_to_close_timeout=timedelta(seconds=5),
+                start_to_close_timeout=timedelta(seconds=5),
+                retry_policy=RetryPolicy(maximum_attempts=3),
+                task_queue=task_queue,
+            )
         self.state = "completed"
         return result
 
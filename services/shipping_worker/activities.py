@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+from typing import Optional
 
 from temporalio import activity
 from trellis_common.business_logic import (
@@ -9,20 +9,31 @@ from trellis_common.business_logic import (
     order_shipped,
 )
 from trellis_common import db
+from trellis_common.models import Order
 
 
 @activity.defn(name="PreparePackage")
-async def prepare_package_activity(order: Dict[str, Any]) -> str:
+async def prepare_package_activity(order: Order, group: Optional[str] = None, hedged: bool = False) -> str:
+    # Unhedged calls leave out the flag, and the SDK then drops every type hint
+    if isinstance(order, dict):
+        order = Order.from_dict(order)
     result = await package_prepared(order)
-    db.insert_event(order["order_id"], "package_prepared", {"result": result})
+    try:
+        async with db.unit_of_work() as uow:
+            if hedged:
+                # Whichever of the two attempts for this group commits second writes nothing
+                uow.claim_step(order.order_id, activity.info().workflow_run_id, f"PreparePackage:{group or ''}")
+            uow.insert_event(order.order_id, "package_prepared", {"result": result, "group": group})
+    except db.StepAlreadyCompleted:
+        pass
     return result
 
 
 @activity.defn(name="DispatchCarrier")
-async def dispatch_carrier_activity(order: Dict[str, Any]) -> str:
+async def dispatch_carrier_activity(order: Order, group: Optional[str] = None) -> str:
     result = await carrier_dispatched(order)
-    db.insert_event(order["order_id"], "carrier_dispatched", {"result": result})
-    db.update_order_state(order["order_id"], state="shipped")
+    # The order is marked shipped by OrderWorkflow once every shipment has gone out
+    await db.insert_event(order.order_id, "carrier_dispatched", {"result": result, "group": group})
     return result
 
 
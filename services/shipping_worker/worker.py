@@ -1,7 +1,15 @@
 import asyncio
 import os
+from contextlib import AsyncExitStack
 import structlog
 from temporalio import worker, client
+from trellis_common import db, latency
+from trellis_common.lifecycle import shutdown_event
+from trellis_common.metrics import ActivityMetricsInterceptor, start_metrics_server, temporal_runtime
+from trellis_common.serialization import data_converter
+from trellis_common.sharding import SHIPPING_QUEUE, worker_queues
+from trellis_common.tracing import configure_tracing, shutdown_tracing, temporal_interceptors
+from trellis_common.worker_config import worker_options
 
 
 logger = structlog.get_logger()
@@ -9,29 +17,67 @@ logger = structlog.get_logger()
 
 async def main() -> None:
     temporal_target = os.getenv("TEMPORAL_SERVER", "localhost:7233")
-    task_queue = os.getenv("SHIPPING_TASK_QUEUE", "shipping-tq")
-    c = await client.Client.connect(temporal_target)
-
-    # Register shipping workflows and activities
-    async with worker.Worker(
-        c,
-        task_queue=task_queue,
-        workflows=[
-            __import__("services.shipping_worker.workflows", fromlist=["ShippingWorkflow"]).ShippingWorkflow,
-        ],
-        activities=[
-            __import__("services.shipping_worker.activities", fromlist=[
-                "prepare_package_activity",
-                "dispatch_carrier_activity",
-            ]).prepare_package_activity,
-            __import__("services.shipping_worker.activities", fromlist=[
-                "prepare_package_activity",
-                "dispatch_carrier_activity",
-            ]).dispatch_carrier_activity,
-        ],
-    ):
-        logger.info("shipping-worker.started", task_queue=task_queue, target=temporal_target)
-        await asyncio.Event().wait()
+    # One Worker per polled shard of SHIPPING_TASK_QUEUE (see trellis_common.sharding)
+    task_queues = worker_queues("SHIPPING", os.getenv("SHIPPING_TASK_QUEUE", SHIPPING_QUEUE))
+    # SDK metrics (TEMPORAL_METRICS_PORT) and our own histograms (METRICS_PORT) are separate listeners
+    runtime = temporal_runtime()
+    configure_tracing("shipping-worker")
+    # The tracing interceptor on the client also covers workflows and activities run by this worker
+    c = await client.Client.connect(
+        temporal_target,
+        interceptors=temporal_interceptors(),
+        data_converter=data_converter(),
+        **({"runtime": runtime} if runtime else {}),
+    )
+    metrics_port = start_metrics_server()
+    # One shared connection pool per worker process, reused by every activity
+    await db.init_pool()
+    db.start_event_sink()
+    # Latency percentiles for the API's adaptive timeouts (trellis_common.latency)
+    publisher = None
+    if latency.adaptive_enabled():
+        publisher = asyncio.create_task(latency.publish(float(os.getenv("ADAPTIVE_TIMEOUT_PUBLISH_INTERVAL", "15"))))
+    stop = shutdown_event()
+    # Slot, cache and poller budgets are per process, shared out across the shard Workers
+    options, adaptive_slots = worker_options("SHIPPING", len(task_queues))
+    if adaptive_slots is not None:
+        adaptive_slots.start()
+
+    try:
+        # Register shipping workflows and activities
+        workflows = [__import__("services.shipping_worker.workflows", fromlist=["ShippingWorkflow"]).ShippingWorkflow]
+        activities_module = __import__("services.shipping_worker.activities", fromlist=[
+            "prepare_package_activity",
+            "dispatch_carrier_activity",
+        ])
+        activities = [
+            activities_module.prepare_package_activity,
+            activities_module.dispatch_carrier_activity,
+        ]
+        async with AsyncExitStack() as stack:
+            for task_queue in task_queues:
+                await stack.enter_async_context(
+                    worker.Worker(
+                        c,
+                        task_queue=task_queue,
+                        workflows=workflows,
+                        activities=activities,
+                        interceptors=[ActivityMetricsInterceptor()],
+                        **options,
+                    )
+                )
+            logger.info("shipping-worker.started", task_queues=task_queues, target=temporal_target, options=sorted(options), metrics_port=metrics_port)
+            await stop.wait()
+        logger.info("shipping-worker.stopped", task_queues=task_queues)
+    finally:
+        if publisher is not None:
+            publisher.cancel()
+        if adaptive_slots is not None:
+            await adaptive_slots.stop()
+        # Flush buffered events before the pool goes away
+        await db.stop_event_sink()
+        await db.close_pool()
+        shutdown_tracing()
 
 
 if __name__ == "__main__":